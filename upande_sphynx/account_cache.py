@@ -0,0 +1,81 @@
+"""Cached Account metadata for the capital controllers and APIs.
+
+Share Transfer validation, the Journal Entry builders and the Share Movement
+Report each looked Account rows up one at a time, uncached — and a Share
+Transfer save runs validate_accounts twice (validate and before_submit).
+`get_account_meta` / `get_account_meta_map` answer from, in order:
+
+1. a per-request memo on frappe.local,
+2. a site-wide Redis hash (ACCOUNT_META_KEY, one field per account),
+3. a single `tabAccount` query for whatever is still missing, which then
+   fills both tiers.
+
+`clear_account_meta` is hooked on Account update, delete and rename (see
+hooks.py), so an edited account is never served stale. Accounts that do not
+exist are only remembered for the current request, so creating one needs no
+invalidation.
+"""
+
+import frappe
+
+ACCOUNT_META_KEY = "capital_account_meta"
+ACCOUNT_META_FIELDS = (
+	"name",
+	"account_name",
+	"account_number",
+	"is_group",
+	"company",
+	"account_currency",
+	"root_type",
+	"account_type",
+)
+
+
+def get_account_meta(account):
+	"""Metadata for one account as a frappe._dict, or None if it does not exist."""
+	if not account:
+		return None
+	return get_account_meta_map([account]).get(account)
+
+
+def get_account_meta_map(accounts):
+	"""{account: metadata} for every existing account in `accounts`."""
+	memo = get_memo()
+	wanted = {account for account in accounts if account}
+
+	for account in wanted - memo.keys():
+		meta = frappe.cache().hget(ACCOUNT_META_KEY, account)
+		if meta:
+			memo[account] = meta
+
+	missing = wanted - memo.keys()
+	if missing:
+		# Misses are memoised as None for the rest of the request (reports
+		# format free-text against_account values that are not accounts),
+		# but never written to Redis.
+		memo.update(dict.fromkeys(missing))
+		for meta in frappe.get_all(
+			"Account", filters={"name": ("in", list(missing))}, fields=list(ACCOUNT_META_FIELDS)
+		):
+			memo[meta.name] = meta
+			frappe.cache().hset(ACCOUNT_META_KEY, meta.name, meta)
+
+	return {account: memo[account] for account in wanted if memo.get(account)}
+
+
+def get_memo():
+	if not hasattr(frappe.local, "capital_account_meta"):
+		frappe.local.capital_account_meta = {}
+	return frappe.local.capital_account_meta
+
+
+def clear_account_meta(doc, method=None, *args):
+	"""doc_events handler for Account. A rename clears the whole hash,
+	since the cached row is still filed under the old name."""
+	if method == "after_rename":
+		frappe.cache().delete_value(ACCOUNT_META_KEY)
+		get_memo().clear()
+		return
+
+	frappe.cache().hdel(ACCOUNT_META_KEY, doc.name)
+	get_memo().pop(doc.name, None)
@@ -1,6 +1,20 @@
 import frappe
 from frappe import _
-from frappe.utils import flt, get_datetime
+from frappe.utils import add_days, add_months, flt, get_datetime, getdate
+
+from upande_sphynx import slow_query
+from upande_sphynx.account_cache import get_account_meta_map
+from upande_sphynx.instrumentation import instrumented
+from upande_sphynx.report_cache import bump_data_version, get_cached_report
+from upande_sphynx.upande_sphynx.doctype.capital_event.capital_event import (
+    record_cln_accrued,
+    record_cln_issued,
+    record_cln_repaid,
+)
+from upande_sphynx.upande_sphynx.doctype.share_certificate.share_certificate import get_certificate_shares
+from upande_sphynx.upande_sphynx.doctype.share_certificate_range.share_certificate_range import (
+    parse_certificate_number,
+)
 
 # ============================================
 # SHAREHOLDER TOTALS
@@ -21,7 +35,7 @@ def recalculate_shareholder_totals(shareholder_name):
 	if not shareholder_name:
 		return
 
-	totals = frappe.db.sql("""
+	totals = slow_query.sql("""
 		SELECT
 			SUM(CASE WHEN to_shareholder = %(shareholder)s THEN number_of_shares ELSE 0 END)
 			- SUM(CASE WHEN from_shareholder = %(shareholder)s THEN number_of_shares ELSE 0 END) AS shares_held,
@@ -41,6 +55,7 @@ def recalculate_shareholder_totals(shareholder_name):
 
 
 @frappe.whitelist()
+@instrumented
 def recompute_shareholder_totals(shareholder_name=None):
 	"""Recompute Total Shares Held / Total Investment for one Shareholder, or
 	every Shareholder if none is given. Use this once to backfill existing
@@ -57,6 +72,7 @@ def recompute_shareholder_totals(shareholder_name=None):
 # ============================================
 
 @frappe.whitelist()
+@instrumented
 def issue_shares_from_agreement(share_agreement_name):
     """Create Share Movement from Share Agreement (NO Journal Entry here)"""
     agreement = frappe.get_doc("Share Agreement", share_agreement_name)
@@ -78,6 +94,28 @@ def issue_shares_from_agreement(share_agreement_name):
     
     # Get company base currency
     company_currency = frappe.get_cached_value("Company", agreement.company, "default_currency")
+    sm = make_share_movement_from_agreement(agreement, company_shareholder, company_currency)
+    
+    sm.insert(ignore_permissions=True)
+    sm.save()
+    
+    # Update Share Agreement using db_set (works for submitted documents)
+    frappe.db.set_value("Share Agreement", agreement.name, {
+        "share_movement_ref": sm.name,
+        "status": "Shares Issued"
+    })
+    
+    frappe.db.commit()
+    
+    frappe.msgprint(_("Share Movement {0} created successfully. Please create Journal Entry from Share Movement to record payment.").format(sm.name))
+
+    return sm.name
+
+
+def make_share_movement_from_agreement(agreement, company_shareholder, company_currency, exchange_rate=None):
+    """Unsaved Share Movement issuing a submitted Share Agreement's shares.
+    `exchange_rate` overrides the lookup when the agreement has none (the
+    round close looks rates up once per currency and date)."""
     transaction_currency = agreement.transaction_currency or "USD"
     
     # Calculate amounts
@@ -86,8 +124,11 @@ def issue_shares_from_agreement(share_agreement_name):
     share_premium = total_amount - share_capital
     
     # Get exchange rate
-    exchange_rate = agreement.exchange_rate or 1.0
-    if not agreement.exchange_rate and transaction_currency != company_currency:
+    if agreement.exchange_rate:
+        exchange_rate = agreement.exchange_rate
+    elif transaction_currency == company_currency:
+        exchange_rate = 1.0
+    elif not exchange_rate:
         exchange_rate = get_exchange_rate(transaction_currency, company_currency, agreement.agreement_date)
     
     # Create Share Movement (without Journal Entry)
@@ -121,24 +162,11 @@ def issue_shares_from_agreement(share_agreement_name):
         "is_opening_entry": agreement.is_opening_entry or "No",
         "auto_create_journal_entry": 0 if agreement.is_opening_entry == "Yes" else 1
     })
-    
-    sm.insert(ignore_permissions=True)
-    sm.save()
-    
-    # Update Share Agreement using db_set (works for submitted documents)
-    frappe.db.set_value("Share Agreement", agreement.name, {
-        "share_movement_ref": sm.name,
-        "status": "Shares Issued"
-    })
-    
-    frappe.db.commit()
-    
-    frappe.msgprint(_("Share Movement {0} created successfully. Please create Journal Entry from Share Movement to record payment.").format(sm.name))
-
-    return sm.name
+    return sm
 
 
 @frappe.whitelist()
+@instrumented
 def cancel_share_agreement(share_agreement_name):
     """Cancel a submitted Share Agreement and its linked Share Movement/Journal Entry.
 
@@ -156,6 +184,7 @@ def cancel_share_agreement(share_agreement_name):
 
 
 @frappe.whitelist()
+@instrumented
 def delete_share_agreement(share_agreement_name):
     """Permanently delete a cancelled Share Agreement and its linked documents.
 
@@ -177,6 +206,7 @@ def delete_share_agreement(share_agreement_name):
 # ============================================
 
 @frappe.whitelist()
+@instrumented
 def create_journal_entry_from_share_movement(share_movement_name):
     """Create Journal Entry from Share Movement to record payment
     
@@ -186,6 +216,9 @@ def create_journal_entry_from_share_movement(share_movement_name):
             Cr: Share Capital Account (Equity increases)
             Cr: Share Premium Account (if premium > 0) (Equity increases)
     """
+    # Lock the movement first: the Capital JE Posting worker and the manual
+    # button can both get here, and only one of them may post.
+    frappe.db.get_value("Share Movement", share_movement_name, "journal_entry_ref", for_update=True)
     sm = frappe.get_doc("Share Movement", share_movement_name)
     
     if sm.docstatus != 1:
@@ -325,6 +358,7 @@ def create_journal_entry_from_share_movement(share_movement_name):
 
 
 @frappe.whitelist()
+@instrumented
 def cancel_share_movement(share_movement_name):
     """Cancel a submitted Share Movement and its linked Journal Entry.
 
@@ -343,6 +377,7 @@ def cancel_share_movement(share_movement_name):
 
 
 @frappe.whitelist()
+@instrumented
 def delete_share_movement(share_movement_name):
     """Permanently delete a cancelled Share Movement and its linked Journal Entry.
 
@@ -364,6 +399,7 @@ def delete_share_movement(share_movement_name):
 # ============================================
 
 @frappe.whitelist()
+@instrumented
 def record_cln_disbursement(cln_name):
     """Create Journal Entry to record CLN loan disbursement
     
@@ -384,6 +420,10 @@ def record_cln_disbursement(cln_name):
         # The loan balance already exists in the opening balance accounts —
         # just activate the loan, no Journal Entry.
         frappe.db.set_value("Convertible Loan Note", cln.name, "status", "Active")
+        record_cln_issued(cln)
+        # No Journal Entry is posted here, so nothing else invalidates the
+        # capital reports' cache for this status change.
+        bump_data_version(cln)
 
         shareholder = frappe.get_doc("Shareholder", cln.lender)
         shareholder.custom_has_convertible_loans = 1
@@ -470,6 +510,7 @@ def record_cln_disbursement(cln_name):
         "disbursement_journal_entry_ref": je.name,
         "status": "Active"
     })
+    record_cln_issued(cln)
     
     # Update Shareholder
     shareholder = frappe.get_doc("Shareholder", cln.lender)
@@ -488,11 +529,9 @@ def record_cln_disbursement(cln_name):
     
     return je.name
 
-import frappe
-from frappe import _
-from frappe.utils import flt, getdate
 
 @frappe.whitelist()
+@instrumented
 def accrue_cln_interest(cln_name, accrual_date=None, exchange_rate=None):
     """
     Accrue interest for Convertible Loan Note with user-specified date and exchange rate
@@ -564,8 +603,9 @@ def accrue_cln_interest(cln_name, accrual_date=None, exchange_rate=None):
     interest_payable_account = cln.interest_payable_account or cln.loan_liability_account
     
     # Get account currencies
-    interest_expense_account_currency = frappe.get_cached_value("Account", cln.interest_expense_account, "account_currency")
-    interest_payable_account_currency = frappe.get_cached_value("Account", interest_payable_account, "account_currency")
+    account_meta = get_account_meta_map([cln.interest_expense_account, interest_payable_account])
+    interest_expense_account_currency = (account_meta.get(cln.interest_expense_account) or {}).get("account_currency")
+    interest_payable_account_currency = (account_meta.get(interest_payable_account) or {}).get("account_currency")
     
     # Build accounts list
     accounts = []
@@ -682,6 +722,7 @@ def accrue_cln_interest(cln_name, accrual_date=None, exchange_rate=None):
     cln_doc.flags.ignore_validate = True
     cln_doc.flags.ignore_mandatory = True
     cln_doc.save(ignore_permissions=True)
+    record_cln_accrued(cln, end_date, interest, interest_base)
     
     frappe.db.commit()
     
@@ -721,6 +762,7 @@ def accrue_cln_interest(cln_name, accrual_date=None, exchange_rate=None):
 
 
 @frappe.whitelist()
+@instrumented
 def get_cln_outstanding_balance(cln_name):
     """Return what's still owed on a CLN after any prior repayment installments."""
     cln = frappe.get_doc("Convertible Loan Note", cln_name)
@@ -733,6 +775,7 @@ def get_cln_outstanding_balance(cln_name):
 
 
 @frappe.whitelist()
+@instrumented
 def record_cln_repayment(cln_name, repayment_date=None, principal_amount=None, interest_amount=None,
                           penalty_amount=None, exchange_rate=None):
     """Repay a Convertible Loan Note in cash instead of converting it to shares.
@@ -905,6 +948,10 @@ def record_cln_repayment(cln_name, repayment_date=None, principal_amount=None, i
     cln_doc.flags.ignore_validate = True
     cln_doc.flags.ignore_mandatory = True
     cln_doc.save(ignore_permissions=True)
+    record_cln_repaid(
+        cln, repayment_date, principal_amount, interest_amount,
+        flt((principal_amount + interest_amount) * final_exchange_rate, 2),
+    )
 
     # Update Shareholder — only drops out of the "Active" total once fully repaid
     shareholder = frappe.get_doc("Shareholder", cln.lender)
@@ -954,6 +1001,7 @@ def get_exchange_rate(from_currency, to_currency, transaction_date):
         ))
 
 @frappe.whitelist()
+@instrumented
 def convert_cln_to_shares(cln_name, next_round_price=None, fully_diluted_shares=None):
     """Convert Convertible Loan Note to shares - Creates both JE and Share Movement
     
@@ -1191,40 +1239,42 @@ def create_cln_conversion_journal_entry(cln, total_amount, share_capital_amount,
 # ============================================
 
 @frappe.whitelist()
+@instrumented
 def get_share_register(company, as_on_date=None, share_class=None):
-    """Get share register showing current shareholdings"""
+    """Get share register showing current shareholdings.
+
+    Reads the signed Share Movement Leg rows (one per holder per submitted
+    movement) rather than grouping Share Movement by to_shareholder, so
+    shares a holder gave up — a buyback, or a transfer out — come off that
+    holder's own balance.
+    """
     if not as_on_date:
         as_on_date = frappe.utils.today()
     
-    conditions = ["sm.company = %(company)s", "sm.docstatus = 1", "sm.transaction_date <= %(as_on_date)s"]
+    conditions = ["leg.company = %(company)s", "leg.transaction_date <= %(as_on_date)s"]
     
     if share_class:
-        conditions.append("sm.share_class = %(share_class)s")
+        conditions.append("leg.share_class = %(share_class)s")
     
     query = """
         SELECT
-            sm.to_shareholder,
+            leg.shareholder as to_shareholder,
             sh.title as shareholder_name,
-            sm.share_class,
-            SUM(CASE WHEN sm.movement_type IN ('Equity Capital Injection', 'Share Purchase', 'Loan Equity Injection')
-                THEN sm.number_of_shares ELSE 0 END) as shares_acquired,
-            SUM(CASE WHEN sm.movement_type = 'Share Buyback'
-                THEN -sm.number_of_shares ELSE 0 END) as shares_transferred,
-            SUM(CASE WHEN sm.movement_type IN ('Equity Capital Injection', 'Share Purchase', 'Loan Equity Injection')
-                THEN sm.number_of_shares
-                WHEN sm.movement_type = 'Share Buyback'
-                THEN -sm.number_of_shares
-                ELSE 0 END) as current_holding,
-            SUM(sm.total_amount_base_currency) as total_investment
-        FROM `tabShare Movement` sm
-        LEFT JOIN `tabShareholder` sh ON sm.to_shareholder = sh.name
+            leg.share_class,
+            SUM(CASE WHEN leg.qty > 0 THEN leg.qty ELSE 0 END) as shares_acquired,
+            SUM(CASE WHEN leg.qty < 0 THEN leg.qty ELSE 0 END) as shares_transferred,
+            SUM(leg.qty) as current_holding,
+            SUM(CASE WHEN leg.qty > 0 AND leg.movement_type != 'Share Buyback'
+                THEN leg.total_amount_base_currency ELSE 0 END) as total_investment
+        FROM `tabShare Movement Leg` leg
+        LEFT JOIN `tabShareholder` sh ON leg.shareholder = sh.name
         WHERE {conditions}
-        GROUP BY sm.to_shareholder, sm.share_class
+        GROUP BY leg.shareholder, leg.share_class
         HAVING current_holding > 0
         ORDER BY current_holding DESC
     """.format(conditions=" AND ".join(conditions))
     
-    data = frappe.db.sql(query, {
+    data = slow_query.sql(query, {
         "company": company,
         "as_on_date": as_on_date,
         "share_class": share_class
@@ -1238,3 +1288,353 @@ def get_share_register(company, as_on_date=None, share_class=None):
     
     return data
 
+
+
+@frappe.whitelist()
+@instrumented
+def get_certificate_holder(company, share_class, certificate):
+    """Who holds a share certificate, from the Share Certificate ledger.
+
+    `certificate` can be the number (4711) or the full certificate id
+    ("CERT-Ordinary-04711"). Every number belongs to exactly one Live or
+    Retired ledger row (Split rows are covered by their children), so the
+    row holding it is the one with the greatest cert_start <= the number —
+    a single descending probe of the (company, share_class, cert_start)
+    index — and a hit only if that row's cert_end reaches the number.
+    A Retired certificate is returned with the holder it was retired from.
+    """
+    number = parse_certificate_number(certificate)
+    if not number:
+        frappe.throw(_("Could not read a certificate number from {0}").format(certificate))
+
+    cert = slow_query.sql("""
+        SELECT name, shareholder, status, cert_start, cert_end, shares,
+            issued_by, issue_date, retired_by, retire_date
+        FROM `tabShare Certificate`
+        WHERE company = %(company)s
+        AND share_class = %(share_class)s
+        AND status IN ('Live', 'Retired')
+        AND cert_start <= %(number)s
+        ORDER BY cert_start DESC
+        LIMIT 1
+    """, {"company": company, "share_class": share_class, "number": number}, as_dict=1)
+
+    if not cert or cert[0].cert_end < number:
+        return None
+
+    cert = cert[0]
+    cert.certificate_number = number
+    cert.certificate_shares = get_certificate_shares(cert, number)
+    return cert
+
+
+@frappe.whitelist()
+@instrumented
+def get_live_certificates(company, share_class=None, shareholder=None):
+    """Live certificate ranges, per holder and class, straight off the
+    ledger's (company, share_class, shareholder, status) index."""
+    filters = {"company": company, "status": "Live"}
+    if share_class:
+        filters["share_class"] = share_class
+    if shareholder:
+        filters["shareholder"] = shareholder
+
+    return frappe.get_all(
+        "Share Certificate",
+        filters=filters,
+        fields=["name", "title", "shareholder", "share_class", "cert_start", "cert_end", "shares",
+                "issued_by", "issue_date"],
+        order_by="share_class, shareholder, cert_start",
+    )
+
+
+# ============================================
+# HOLDINGS HISTORY
+# ============================================
+
+# Start of the period a date falls in, per resampling frequency.
+HOLDINGS_PERIODS = {
+    "day": "{date}",
+    "month": "DATE_SUB({date}, INTERVAL DAYOFMONTH({date}) - 1 DAY)",
+    "quarter": "MAKEDATE(YEAR({date}), 1) + INTERVAL QUARTER({date}) - 1 QUARTER",
+}
+
+DEFAULT_HISTORY_MONTHS = 36
+MAX_HISTORY_POINTS = 3660
+
+
+@frappe.whitelist()
+@instrumented
+def get_holdings_history(company, shareholders=None, from_date=None, to_date=None, frequency="month",
+                         share_class=None):
+    """Holdings and investment over time, per shareholder and share class.
+
+    Returns one point per `frequency` period ("day", "month" or "quarter")
+    from from_date to to_date — the position at the end of the period — for
+    one shareholder, a list of them, or every holder in the company.
+
+    One query over the Share Movement Leg index: legs are summed per
+    (holder, class, period) and turned into running positions with a
+    cumulative window sum, everything before from_date folded into the
+    first period as the opening balance. Periods without activity carry the
+    previous position forward. Cached on the company's data version, like
+    the capital reports.
+    """
+    if frequency not in HOLDINGS_PERIODS:
+        frappe.throw(_("Frequency must be one of: {0}").format(", ".join(HOLDINGS_PERIODS)))
+
+    to_date = getdate(to_date or frappe.utils.today())
+    from_date = getdate(from_date or add_months(to_date, -DEFAULT_HISTORY_MONTHS))
+    if from_date > to_date:
+        frappe.throw(_("From Date cannot be after To Date"))
+
+    periods = get_holdings_periods(from_date, to_date, frequency)
+    if len(periods) > MAX_HISTORY_POINTS:
+        frappe.throw(_("{0} points requested. Narrow the date range or use a coarser frequency.").format(
+            len(periods)))
+
+    filters = frappe._dict({
+        "company": company,
+        "shareholders": parse_shareholder_list(shareholders),
+        "from_date": from_date,
+        "to_date": to_date,
+        "frequency": frequency,
+        "share_class": share_class,
+    })
+    return get_cached_report("Holdings History", filters, lambda: build_holdings_history(filters, periods))
+
+
+def parse_shareholder_list(shareholders):
+    if not shareholders:
+        return []
+    if isinstance(shareholders, str):
+        shareholders = frappe.parse_json(shareholders) if shareholders.startswith("[") else [shareholders]
+    return sorted(set(shareholders))
+
+
+def get_period_start(date, frequency):
+    date = getdate(date)
+    if frequency == "month":
+        return date.replace(day=1)
+    if frequency == "quarter":
+        return date.replace(month=(date.month - 1) // 3 * 3 + 1, day=1)
+    return date
+
+
+def get_holdings_periods(from_date, to_date, frequency):
+    periods = []
+    period = get_period_start(from_date, frequency)
+    while period <= to_date:
+        periods.append(period)
+        if frequency == "day":
+            period = getdate(add_days(period, 1))
+        else:
+            period = getdate(add_months(period, 3 if frequency == "quarter" else 1))
+    return periods
+
+
+def build_holdings_history(filters, periods):
+    conditions = ["leg.company = %(company)s", "leg.transaction_date <= %(to_date)s"]
+    if filters.shareholders:
+        conditions.append("leg.shareholder IN %(shareholders)s")
+    if filters.share_class:
+        conditions.append("leg.share_class = %(share_class)s")
+
+    period = HOLDINGS_PERIODS[filters.frequency].format(date="leg.transaction_date")
+    rows = slow_query.sql("""
+        SELECT
+            buckets.shareholder,
+            buckets.share_class,
+            buckets.period,
+            SUM(buckets.qty) OVER (
+                PARTITION BY buckets.shareholder, buckets.share_class ORDER BY buckets.period
+            ) AS holding,
+            SUM(buckets.investment) OVER (
+                PARTITION BY buckets.shareholder, buckets.share_class ORDER BY buckets.period
+            ) AS investment
+        FROM (
+            SELECT
+                leg.shareholder,
+                leg.share_class,
+                CASE WHEN leg.transaction_date < %(from_date)s THEN %(first_period)s ELSE {period} END AS period,
+                SUM(leg.qty) AS qty,
+                SUM(CASE WHEN leg.qty > 0 AND leg.movement_type != 'Share Buyback'
+                    THEN leg.total_amount_base_currency ELSE 0 END) AS investment
+            FROM `tabShare Movement Leg` leg
+            WHERE {conditions}
+            GROUP BY leg.shareholder, leg.share_class, period
+        ) buckets
+        ORDER BY buckets.shareholder, buckets.share_class, buckets.period
+    """.format(period=period, conditions=" AND ".join(conditions)), {
+        "company": filters.company,
+        "shareholders": tuple(filters.shareholders),
+        "share_class": filters.share_class,
+        "from_date": filters.from_date,
+        "to_date": filters.to_date,
+        "first_period": periods[0],
+    }, as_dict=1)
+
+    series = {}
+    for row in rows:
+        series.setdefault((row.shareholder, row.share_class), {})[getdate(row.period)] = row
+
+    return {
+        "frequency": filters.frequency,
+        "periods": periods,
+        "series": [
+            resample_holdings(shareholder, share_class, points, periods)
+            for (shareholder, share_class), points in series.items()
+        ],
+    }
+
+
+def resample_holdings(shareholder, share_class, points, periods):
+    """Position at every period, carrying the last known one forward."""
+    holding, investment = [], []
+    current = None
+    for period in periods:
+        current = points.get(period, current)
+        holding.append(flt(current.holding) if current else 0)
+        investment.append(flt(current.investment) if current else 0)
+
+    return {
+        "shareholder": shareholder,
+        "share_class": share_class,
+        "holding": holding,
+        "investment": investment,
+    }
+
+
+# ============================================
+# CAP TABLE DIFF
+# ============================================
+
+@frappe.whitelist()
+@instrumented
+def get_cap_table_diff(company, from_date, to_date=None, share_class=None):
+    """What changed in the cap table between two dates, per shareholder:
+    shares and ownership at the close of from_date and of to_date, the
+    change in each, new investment in the window, and whether the holder
+    is New, Exited or Changed.
+
+    Only the window's legs (from_date, to_date] are aggregated — a range on
+    the (company, transaction_date) index — and added to a baseline of
+    positions as of from_date, which is cached on the company's data
+    version. Repeated board-pack runs against the same baseline cost what
+    the window's activity costs, not what the whole history costs.
+    """
+    to_date = getdate(to_date or frappe.utils.today())
+    from_date = getdate(from_date)
+    if from_date > to_date:
+        frappe.throw(_("From Date cannot be after To Date"))
+
+    opening = get_cap_table_baseline(company, from_date, share_class)
+
+    conditions = [
+        "leg.company = %(company)s",
+        "leg.transaction_date > %(from_date)s",
+        "leg.transaction_date <= %(to_date)s",
+    ]
+    if share_class:
+        conditions.append("leg.share_class = %(share_class)s")
+
+    window = slow_query.sql("""
+        SELECT
+            leg.shareholder,
+            SUM(leg.qty) AS change_shares,
+            SUM(CASE WHEN leg.qty > 0 AND leg.movement_type != 'Share Buyback'
+                THEN leg.total_amount_base_currency ELSE 0 END) AS new_investment
+        FROM `tabShare Movement Leg` leg
+        WHERE {conditions}
+        GROUP BY leg.shareholder
+    """.format(conditions=" AND ".join(conditions)), {
+        "company": company,
+        "from_date": from_date,
+        "to_date": to_date,
+        "share_class": share_class,
+    }, as_dict=1)
+    window = {row.shareholder: row for row in window}
+
+    closing = dict(opening)
+    for shareholder, row in window.items():
+        closing[shareholder] = closing.get(shareholder, 0) + flt(row.change_shares)
+
+    # Issuances take their shares from the company's own shareholder record,
+    # which therefore carries a negative position. Like get_share_register
+    # (HAVING current_holding > 0), only positive positions count as holdings
+    # and towards the totals ownership is measured against; the signed
+    # positions are still what the window's legs are added to.
+    opening = {shareholder: shares for shareholder, shares in opening.items() if shares > 0}
+    closing = {shareholder: shares for shareholder, shares in closing.items() if shares > 0}
+
+    opening_total = sum(opening.values())
+    closing_total = sum(closing.values())
+    holders = set(opening) | set(closing)
+    names = dict(frappe.get_all(
+        "Shareholder", filters={"name": ("in", list(holders))}, fields=["name", "title"], as_list=1
+    )) if holders else {}
+
+    rows = []
+    for shareholder in holders:
+        opening_shares = flt(opening.get(shareholder))
+        closing_shares = flt(closing.get(shareholder))
+
+        opening_ownership = opening_shares / opening_total * 100 if opening_total else 0
+        closing_ownership = closing_shares / closing_total * 100 if closing_total else 0
+        rows.append(frappe._dict({
+            "shareholder": shareholder,
+            "shareholder_name": names.get(shareholder),
+            "status": get_cap_table_change(opening_shares, closing_shares),
+            "opening_shares": opening_shares,
+            "closing_shares": closing_shares,
+            "change_shares": closing_shares - opening_shares,
+            "opening_ownership": opening_ownership,
+            "closing_ownership": closing_ownership,
+            "change_ownership": closing_ownership - opening_ownership,
+            "new_investment": flt(window[shareholder].new_investment) if shareholder in window else 0,
+        }))
+
+    rows.sort(key=lambda row: (-row.closing_shares, row.shareholder))
+    return {
+        "from_date": from_date,
+        "to_date": to_date,
+        "opening_shares": opening_total,
+        "closing_shares": closing_total,
+        "rows": rows,
+    }
+
+
+def get_cap_table_change(opening_shares, closing_shares):
+    if opening_shares <= 0 < closing_shares:
+        return "New"
+    if closing_shares <= 0 < opening_shares:
+        return "Exited"
+    if closing_shares != opening_shares:
+        return "Changed"
+    return "Unchanged"
+
+
+def get_cap_table_baseline(company, as_on_date, share_class=None):
+    """{shareholder: signed position} at the close of as_on_date, for
+    holders with a non-zero position. Negative positions (the company's own
+    shareholder record) are kept so the window's legs add up correctly;
+    get_cap_table_diff leaves them out of holdings and totals."""
+    filters = frappe._dict({"company": company, "as_on_date": getdate(as_on_date), "share_class": share_class})
+
+    def build():
+        conditions = ["leg.company = %(company)s", "leg.transaction_date <= %(as_on_date)s"]
+        if share_class:
+            conditions.append("leg.share_class = %(share_class)s")
+
+        return {
+            shareholder: flt(holding)
+            for shareholder, holding in slow_query.sql("""
+                SELECT leg.shareholder, SUM(leg.qty) AS holding
+                FROM `tabShare Movement Leg` leg
+                WHERE {conditions}
+                GROUP BY leg.shareholder
+                HAVING holding != 0
+            """.format(conditions=" AND ".join(conditions)), filters)
+        }
+
+    return get_cached_report("Cap Table Baseline", filters, build)
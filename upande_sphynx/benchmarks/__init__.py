@@ -0,0 +1,2 @@
+"""Synthetic dataset generator (`generate`) and benchmark harness (`run`)
+for the capital reports and APIs. Not imported by the app at runtime."""
@@ -0,0 +1,516 @@
+"""Deterministic synthetic cap-table dataset for benchmarking.
+
+Seeds one company with shareholders, share classes, submitted Share
+Movements (with their Share Movement Legs), Convertible Loan Notes with
+monthly interest accrual histories, and submitted Purchase Invoices with
+their GL and Payment Ledger entries — enough volume to make the capital
+reports' performance measurable.
+
+Rows are written with bulk inserts, bypassing controllers: this is load,
+not a functional fixture, and going through `doc.submit()` for millions of
+movements would take days. Everything generated is named with PREFIX so
+`purge()` can remove it again without touching real data.
+
+	bench --site <site> execute upande_sphynx.benchmarks.generate.generate \\
+		--kwargs "{'company': '<company>', 'size': 'small'}"
+
+Dates are laid out over the HISTORY_YEARS ending today, so that the
+benchmark and query-budget windows (which also end today) always cover the
+data. The same (size, seed) therefore produces the same rows only when
+generated on the same day; on another day the dates shift and can fall
+differently across months.
+"""
+
+import random
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, add_months, flt, getdate, now, nowdate
+
+PREFIX = "BENCH-"
+
+SIZES = {
+	"small": {
+		"shareholders": 200,
+		"share_classes": 3,
+		"movements": 20_000,
+		"clns": 100,
+		"accrual_months": 12,
+		"suppliers": 50,
+		"invoices": 5_000,
+	},
+	"medium": {
+		"shareholders": 2_000,
+		"share_classes": 5,
+		"movements": 500_000,
+		"clns": 1_000,
+		"accrual_months": 24,
+		"suppliers": 500,
+		"invoices": 50_000,
+	},
+	"large": {
+		"shareholders": 20_000,
+		"share_classes": 8,
+		"movements": 2_000_000,
+		"clns": 5_000,
+		"accrual_months": 36,
+		"suppliers": 2_000,
+		"invoices": 200_000,
+	},
+}
+
+# Years of history the generated dates are spread over, ending today.
+HISTORY_YEARS = 8
+
+BATCH_SIZE = 10_000
+
+# Share of movements by type. Transfers and buybacks only ever move shares
+# a holder actually has, so running balances never go negative.
+MOVEMENT_MIX = (
+	("Equity Capital Injection", 0.55),
+	("Share Purchase", 0.35),
+	("Share Buyback", 0.10),
+)
+
+BASE_FIELDS = ("name", "creation", "modified", "owner", "modified_by", "docstatus", "idx")
+
+
+def generate(company, size="small", seed=42, **overrides):
+	"""Purge any earlier benchmark data for the company, then seed a fresh
+	dataset. `overrides` replace individual counts from SIZES, e.g.
+	`movements=100_000`. Returns the row counts written."""
+	if size not in SIZES:
+		frappe.throw(_("Unknown benchmark size {0}. Use one of: {1}").format(size, ", ".join(SIZES)))
+
+	counts = dict(SIZES[size], **overrides)
+	ctx = get_context(company, seed)
+
+	purge(company)
+
+	written = {}
+	written["Share Type"] = make_share_classes(ctx, counts["share_classes"])
+	written["Shareholder"] = make_shareholders(ctx, counts["shareholders"])
+	written["Share Movement"] = make_movements(ctx, counts["movements"])
+	written["Convertible Loan Note"] = make_clns(ctx, counts["clns"], counts["accrual_months"])
+	written["Supplier"] = make_suppliers(ctx, counts["suppliers"])
+	written["Purchase Invoice"] = make_invoices(ctx, counts["invoices"])
+
+	frappe.db.commit()
+	return written
+
+
+def get_context(company, seed):
+	company_doc = frappe.get_cached_doc("Company", company)
+	missing = [
+		label
+		for fieldname, label in (
+			("default_payable_account", _("Default Payable Account")),
+			("default_expense_account", _("Default Cost of Goods Sold Account")),
+		)
+		if not company_doc.get(fieldname)
+	]
+	if missing:
+		frappe.throw(_("Set {0} on Company {1} before generating benchmark data").format(
+			", ".join(missing), company))
+
+	today = getdate(nowdate())
+	return frappe._dict({
+		"company": company,
+		"currency": company_doc.default_currency,
+		"payable_account": company_doc.default_payable_account,
+		"expense_account": company_doc.default_expense_account,
+		"rng": random.Random(seed),
+		"start_date": add_months(today, -12 * HISTORY_YEARS),
+		"days": (today - add_months(today, -12 * HISTORY_YEARS)).days,
+		"timestamp": now(),
+		"user": frappe.session.user,
+		"share_classes": [],
+		"shareholders": [],
+		"suppliers": [],
+	})
+
+
+def base_values(ctx, name, docstatus=0, idx=0):
+	return (name, ctx.timestamp, ctx.timestamp, ctx.user, ctx.user, docstatus, idx)
+
+
+def random_dates(ctx, count):
+	"""`count` dates across the history window, in ascending order."""
+	return sorted(add_days(ctx.start_date, ctx.rng.randrange(ctx.days)) for i in range(count))
+
+
+# ── Masters ───────────────────────────────────────────────────────────────────
+def make_share_classes(ctx, count):
+	for i in range(count):
+		ctx.share_classes.append(f"{PREFIX}Class {chr(ord('A') + i)}")
+
+	frappe.db.bulk_insert(
+		"Share Type",
+		(*BASE_FIELDS, "title"),
+		[(*base_values(ctx, title), title) for title in ctx.share_classes],
+		ignore_duplicates=True,
+	)
+	return count
+
+
+def make_shareholders(ctx, count):
+	values = []
+	for i in range(count):
+		name = f"{PREFIX}SH-{i:06d}"
+		ctx.shareholders.append(name)
+		values.append((*base_values(ctx, name), f"Benchmark Shareholder {i:06d}", ctx.company))
+
+	# Buybacks move shares back to the company's own register entry.
+	ctx.treasury = f"{PREFIX}SH-TREASURY"
+	values.append((*base_values(ctx, ctx.treasury), "Benchmark Treasury", ctx.company))
+
+	frappe.db.bulk_insert("Shareholder", (*BASE_FIELDS, "title", "company"), values, ignore_duplicates=True)
+	return count + 1
+
+
+def make_suppliers(ctx, count):
+	supplier_group = frappe.db.get_value("Supplier Group", {"is_group": 0}, "name")
+	values = []
+	for i in range(count):
+		name = f"{PREFIX}SUP-{i:05d}"
+		ctx.suppliers.append(name)
+		values.append((*base_values(ctx, name), f"Benchmark Supplier {i:05d}", supplier_group, "Company"))
+
+	frappe.db.bulk_insert(
+		"Supplier",
+		(*BASE_FIELDS, "supplier_name", "supplier_group", "supplier_type"),
+		values,
+		ignore_duplicates=True,
+	)
+	return count
+
+
+# ── Share Movements and their legs ───────────────────────────────────────────
+SM_FIELDS = (
+	*BASE_FIELDS,
+	"transaction_date",
+	"movement_type",
+	"status",
+	"company",
+	"from_shareholder",
+	"to_shareholder",
+	"share_class",
+	"number_of_shares",
+	"par_value_per_share",
+	"par_value_currency",
+	"price_per_share",
+	"transaction_currency",
+	"total_amount",
+	"exchange_rate",
+	"base_currency",
+	"total_amount_base_currency",
+	"is_opening_entry",
+)
+
+LEG_FIELDS = (
+	*BASE_FIELDS,
+	"share_movement",
+	"company",
+	"shareholder",
+	"share_class",
+	"transaction_date",
+	"movement_type",
+	"qty",
+	"balance_after",
+	"transaction_currency",
+	"total_amount",
+	"total_amount_base_currency",
+)
+
+
+def make_movements(ctx, count):
+	"""Movements in date order, with legs and their running balances worked
+	out as we go (the same rows make_legs + update_running_balance would
+	produce, without one UPDATE per partition)."""
+	holdings = {}
+	movement_types = [movement_type for movement_type, weight in MOVEMENT_MIX]
+	weights = [weight for movement_type, weight in MOVEMENT_MIX]
+
+	movements, legs = [], []
+	for i, transaction_date in enumerate(random_dates(ctx, count)):
+		share_class = ctx.rng.choice(ctx.share_classes)
+		movement_type = ctx.rng.choices(movement_types, weights)[0]
+		to_shareholder = ctx.rng.choice(ctx.shareholders)
+		from_shareholder = None
+		qty = ctx.rng.randint(1, 50) * 100
+
+		if movement_type != "Equity Capital Injection":
+			from_shareholder = ctx.rng.choice(ctx.shareholders)
+			available = holdings.get((from_shareholder, share_class), 0)
+			if available <= 0 or from_shareholder == to_shareholder:
+				movement_type, from_shareholder = "Equity Capital Injection", None
+			else:
+				qty = min(qty, available)
+				if movement_type == "Share Buyback":
+					to_shareholder = ctx.treasury
+
+		price = round(ctx.rng.uniform(1, 20), 2)
+		amount = flt(qty * price, 2)
+		name = f"{PREFIX}SM-{i:08d}"
+		movements.append((
+			*base_values(ctx, name, docstatus=1),
+			transaction_date, movement_type, "Issued", ctx.company, from_shareholder, to_shareholder,
+			share_class, qty, 1, ctx.currency, price, ctx.currency, amount, 1, ctx.currency, amount, "No",
+		))
+
+		signed = [(to_shareholder, qty, "IN")]
+		if from_shareholder:
+			signed.append((from_shareholder, -qty, "OUT"))
+		for shareholder, leg_qty, suffix in signed:
+			key = (shareholder, share_class)
+			holdings[key] = holdings.get(key, 0) + leg_qty
+			legs.append((
+				*base_values(ctx, f"{name}-{suffix}"),
+				name, ctx.company, shareholder, share_class, transaction_date, movement_type,
+				leg_qty, holdings[key], ctx.currency, amount, amount,
+			))
+
+		if len(movements) >= BATCH_SIZE:
+			flush_movements(movements, legs)
+
+	flush_movements(movements, legs)
+	return count
+
+
+def flush_movements(movements, legs):
+	frappe.db.bulk_insert("Share Movement", SM_FIELDS, movements, ignore_duplicates=True)
+	frappe.db.bulk_insert("Share Movement Leg", LEG_FIELDS, legs, ignore_duplicates=True)
+	frappe.db.commit()
+	movements.clear()
+	legs.clear()
+
+
+# ── Convertible Loan Notes with accrual history ──────────────────────────────
+CLN_FIELDS = (
+	*BASE_FIELDS,
+	"issue_date",
+	"maturity_date",
+	"lender",
+	"lender_type",
+	"company_shareholder",
+	"company",
+	"principal_amount",
+	"interest_rate",
+	"interest_calculation_method",
+	"accrued_interest",
+	"last_interest_accrual_date",
+	"conversion_trigger",
+	"conversion_share_type",
+	"par_value_per_share",
+	"loan_currency",
+	"exchange_rate",
+	"status",
+	"is_opening_entry",
+)
+
+ACCRUAL_FIELDS = (
+	*BASE_FIELDS,
+	"parent",
+	"parenttype",
+	"parentfield",
+	"accrual_date",
+	"from_date",
+	"to_date",
+	"days",
+	"interest_amount",
+	"exchange_rate",
+	"interest_amount_base",
+	"cumulative_interest",
+	"currency",
+)
+
+
+def make_clns(ctx, count, accrual_months):
+	clns, accruals = [], []
+	for i, issue_date in enumerate(random_dates(ctx, count)):
+		name = f"{PREFIX}CLN-{i:06d}"
+		principal = ctx.rng.randint(10, 500) * 1000
+		rate = ctx.rng.choice((6, 8, 10, 12))
+
+		cumulative = 0
+		from_date = issue_date
+		for month in range(1, accrual_months + 1):
+			to_date = add_months(issue_date, month)
+			days = (getdate(to_date) - getdate(from_date)).days
+			interest = flt(principal * rate / 100 * days / 365, 2)
+			cumulative += interest
+			accruals.append((
+				*base_values(ctx, f"{name}-ACR-{month:03d}", docstatus=1, idx=month),
+				name, "Convertible Loan Note", "interest_accruals",
+				to_date, from_date, to_date, days, interest, 1, interest, flt(cumulative, 2), ctx.currency,
+			))
+			from_date = to_date
+
+		clns.append((
+			*base_values(ctx, name, docstatus=1),
+			issue_date, add_months(issue_date, 60), ctx.rng.choice(ctx.shareholders), "Individual",
+			ctx.treasury, ctx.company, principal, rate, "Simple", flt(cumulative, 2), from_date,
+			"At Maturity", ctx.rng.choice(ctx.share_classes), 1, ctx.currency, 1, "Active", "No",
+		))
+
+		if len(accruals) >= BATCH_SIZE:
+			flush_clns(clns, accruals)
+
+	flush_clns(clns, accruals)
+	return count
+
+
+def flush_clns(clns, accruals):
+	frappe.db.bulk_insert("Convertible Loan Note", CLN_FIELDS, clns, ignore_duplicates=True)
+	frappe.db.bulk_insert("CLN Interest Accrual", ACCRUAL_FIELDS, accruals, ignore_duplicates=True)
+	frappe.db.commit()
+	clns.clear()
+	accruals.clear()
+
+
+# ── Purchase Invoices with GL and Payment Ledger entries ─────────────────────
+PI_FIELDS = (
+	*BASE_FIELDS,
+	"company",
+	"supplier",
+	"posting_date",
+	"due_date",
+	"currency",
+	"conversion_rate",
+	"credit_to",
+	"grand_total",
+	"base_grand_total",
+	"outstanding_amount",
+	"status",
+)
+
+GL_FIELDS = (
+	*BASE_FIELDS,
+	"company",
+	"posting_date",
+	"account",
+	"party_type",
+	"party",
+	"debit",
+	"credit",
+	"debit_in_account_currency",
+	"credit_in_account_currency",
+	"account_currency",
+	"voucher_type",
+	"voucher_no",
+	"against_voucher_type",
+	"against_voucher",
+	"is_cancelled",
+)
+
+PLE_FIELDS = (
+	*BASE_FIELDS,
+	"company",
+	"posting_date",
+	"account_type",
+	"account",
+	"party_type",
+	"party",
+	"voucher_type",
+	"voucher_no",
+	"against_voucher_type",
+	"against_voucher_no",
+	"amount",
+	"amount_in_account_currency",
+	"account_currency",
+	"delinked",
+)
+
+
+def make_invoices(ctx, count):
+	"""Each invoice posts its payable; about two thirds also get a payment
+	(full or partial) 10-120 days later, posted as a Payment Entry voucher
+	against the invoice."""
+	invoices, gl_entries, ledger = [], [], []
+	for i, posting_date in enumerate(random_dates(ctx, count)):
+		name = f"{PREFIX}PINV-{i:07d}"
+		supplier = ctx.rng.choice(ctx.suppliers)
+		due_date = add_days(posting_date, ctx.rng.choice((15, 30, 45, 60)))
+		total = flt(ctx.rng.uniform(100, 50_000), 2)
+
+		paid = 0
+		payment_date = None
+		if ctx.rng.random() < 0.66:
+			paid = total if ctx.rng.random() < 0.7 else flt(total * ctx.rng.uniform(0.1, 0.9), 2)
+			payment_date = add_days(posting_date, ctx.rng.randint(10, 120))
+
+		outstanding = flt(total - paid, 2)
+		invoices.append((
+			*base_values(ctx, name, docstatus=1),
+			ctx.company, supplier, posting_date, due_date, ctx.currency, 1, ctx.payable_account,
+			total, total, outstanding, "Paid" if not outstanding else "Unpaid",
+		))
+
+		gl_entries.extend((
+			(*base_values(ctx, f"{name}-GL1", docstatus=1), ctx.company, posting_date, ctx.payable_account,
+				"Supplier", supplier, 0, total, 0, total, ctx.currency, "Purchase Invoice", name,
+				"Purchase Invoice", name, 0),
+			(*base_values(ctx, f"{name}-GL2", docstatus=1), ctx.company, posting_date, ctx.expense_account,
+				None, None, total, 0, total, 0, ctx.currency, "Purchase Invoice", name, None, None, 0),
+		))
+		ledger.append((
+			*base_values(ctx, f"{name}-PLE1", docstatus=1), ctx.company, posting_date, "Payable",
+			ctx.payable_account, "Supplier", supplier, "Purchase Invoice", name, "Purchase Invoice", name,
+			total, total, ctx.currency, 0,
+		))
+
+		if paid:
+			payment = f"{PREFIX}PAY-{i:07d}"
+			gl_entries.append((
+				*base_values(ctx, f"{payment}-GL1", docstatus=1), ctx.company, payment_date,
+				ctx.payable_account, "Supplier", supplier, paid, 0, paid, 0, ctx.currency, "Payment Entry",
+				payment, "Purchase Invoice", name, 0,
+			))
+			ledger.append((
+				*base_values(ctx, f"{payment}-PLE1", docstatus=1), ctx.company, payment_date, "Payable",
+				ctx.payable_account, "Supplier", supplier, "Payment Entry", payment, "Purchase Invoice",
+				name, -paid, -paid, ctx.currency, 0,
+			))
+
+		if len(invoices) >= BATCH_SIZE:
+			flush_invoices(invoices, gl_entries, ledger)
+
+	flush_invoices(invoices, gl_entries, ledger)
+	return count
+
+
+def flush_invoices(invoices, gl_entries, ledger):
+	frappe.db.bulk_insert("Purchase Invoice", PI_FIELDS, invoices, ignore_duplicates=True)
+	frappe.db.bulk_insert("GL Entry", GL_FIELDS, gl_entries, ignore_duplicates=True)
+	frappe.db.bulk_insert("Payment Ledger Entry", PLE_FIELDS, ledger, ignore_duplicates=True)
+	frappe.db.commit()
+	invoices.clear()
+	gl_entries.clear()
+	ledger.clear()
+
+
+# ── Cleanup ───────────────────────────────────────────────────────────────────
+# (doctype, column matched against PREFIX%), children before parents.
+PURGE_ORDER = (
+	("Share Movement Leg", "share_movement"),
+	("Share Movement", "name"),
+	("CLN Interest Accrual", "parent"),
+	("Convertible Loan Note", "name"),
+	("Payment Ledger Entry", "against_voucher_no"),
+	("GL Entry", "voucher_no"),
+	("GL Entry", "against_voucher"),
+	("Purchase Invoice", "name"),
+	("Supplier", "name"),
+	("Shareholder", "name"),
+	("Share Type", "name"),
+)
+
+
+def purge(company=None):
+	"""Delete every row generate() created (for one company, or all)."""
+	for doctype, column in PURGE_ORDER:
+		filters = {column: ("like", f"{PREFIX}%")}
+		if company and frappe.get_meta(doctype).has_field("company"):
+			filters["company"] = company
+		frappe.db.delete(doctype, filters)
+		frappe.db.commit()
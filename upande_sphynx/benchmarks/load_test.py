@@ -0,0 +1,418 @@
+"""Concurrent load test for the capital transaction endpoints.
+
+Reproduces a funding-round day: many worker processes, each with its own
+database connection, issuing Share Agreements, submitting Share Movements,
+converting CLNs and looking up certificates at the same time, through the
+same whitelisted functions in `upande_sphynx.api.capital_management` the
+desk calls. The interesting contention is on the certificate counter
+(Share Certificate Series) and the holders' total fields.
+
+	bench --site <site> execute upande_sphynx.benchmarks.load_test.run \\
+		--kwargs "{'company': '<company>', 'workers': 8, 'operations': 400}"
+
+CLN conversions post a Journal Entry, so they only run when `accounts` names
+the Share Capital, Share Premium and Loan Liability accounts to use, e.g.
+`'accounts': {'share_capital': '...', 'share_premium': '...',
+'loan_liability': '...'}`; without them the conversions are left out of the
+mix.
+
+Reported per operation and overall: throughput, latency percentiles, and
+failures split into deadlocks, lock wait timeouts, validation errors and
+anything else; plus the server's InnoDB deadlock and row-lock-wait
+counters over the run, and any certificate number handed out twice.
+Results are written as JSON next to the `run.py` results.
+
+Fixtures (shareholders, a share class, agreements, CLNs) are bulk-inserted
+with PREFIX names and purged afterwards together with everything the run
+created in that share class, unless `keep_data` is set. Journal Entries
+posted by conversions are left in place.
+"""
+
+import json
+import multiprocessing
+import random
+import time
+
+import frappe
+from frappe.utils import add_months, flt, now, nowdate
+
+from upande_sphynx.benchmarks.run import get_commit, get_output_path
+
+PREFIX = "LOAD-"
+
+DEFAULT_WORKERS = 8
+DEFAULT_OPERATIONS = 400
+
+# Share of operations by kind.
+DEFAULT_MIX = {
+	"issue_agreement": 0.45,
+	"share_movement": 0.25,
+	"convert_cln": 0.15,
+	"certificate_lookup": 0.15,
+}
+
+HOLDERS = 50
+PERCENTILES = (50, 90, 95, 99)
+INNODB_COUNTERS = ("Innodb_deadlocks", "Innodb_row_lock_waits", "Innodb_row_lock_time")
+
+BASE_FIELDS = ("name", "creation", "modified", "owner", "modified_by", "docstatus", "idx")
+
+
+def run(company, workers=DEFAULT_WORKERS, operations=DEFAULT_OPERATIONS, mix=None, accounts=None,
+		seed=42, keep_data=False, output=None):
+	"""Seed fixtures, drive `operations` calls from `workers` processes, and
+	return the path of the JSON results file."""
+	mix = dict(mix or DEFAULT_MIX)
+	if mix.get("convert_cln") and not has_conversion_accounts(accounts):
+		print("No conversion accounts given: leaving convert_cln out of the mix.")
+		mix.pop("convert_cln")
+
+	rng = random.Random(seed)
+	purge(company)
+	ctx = seed_fixtures(company, count_kind(mix, operations), accounts or {}, rng)
+	tasks = make_tasks(ctx, mix, operations, rng)
+	frappe.db.commit()
+
+	counters_before = get_innodb_counters()
+	start = time.perf_counter()
+
+	pool = multiprocessing.get_context("spawn").Pool(
+		workers,
+		initializer=init_worker,
+		initargs=(frappe.local.site, frappe.local.sites_path, frappe.session.user),
+	)
+	try:
+		samples = list(pool.imap_unordered(execute_task, tasks, chunksize=1))
+	finally:
+		pool.close()
+		pool.join()
+
+	elapsed = time.perf_counter() - start
+	counters_after = get_innodb_counters()
+
+	results = {
+		"meta": {
+			"site": frappe.local.site,
+			"company": company,
+			"started_at": now(),
+			"commit": get_commit(),
+			"seed": seed,
+			"workers": workers,
+			"operations": operations,
+			"mix": mix,
+		},
+		"elapsed_s": round(elapsed, 3),
+		"throughput_ops": round(len(samples) / elapsed, 2) if elapsed else None,
+		"overall": summarize(samples, elapsed),
+		"operations": {
+			kind: summarize([s for s in samples if s["kind"] == kind], elapsed) for kind in mix
+		},
+		"innodb": {key: counters_after[key] - counters_before[key] for key in INNODB_COUNTERS},
+		"duplicate_certificates": find_duplicate_certificates(company, ctx.share_class),
+	}
+
+	if not keep_data:
+		purge(company)
+
+	path = output or get_output_path("load")
+	with open(path, "w") as f:
+		json.dump(results, f, indent=1, default=str)
+
+	print(format_results(results))
+	print(f"\nResults written to {path}")
+	return path
+
+
+def has_conversion_accounts(accounts):
+	return bool(accounts) and all(
+		accounts.get(key) for key in ("share_capital", "share_premium", "loan_liability")
+	)
+
+
+def count_kind(mix, operations):
+	total = sum(mix.values())
+	return {kind: int(operations * weight / total) + 1 for kind, weight in mix.items()}
+
+
+# ── Fixtures ──────────────────────────────────────────────────────────────────
+def seed_fixtures(company, counts, accounts, rng):
+	company_currency = frappe.get_cached_value("Company", company, "default_currency")
+	timestamp, user = now(), frappe.session.user
+	today = nowdate()
+
+	def base(name, docstatus=0):
+		return (name, timestamp, timestamp, user, user, docstatus, 0)
+
+	ctx = frappe._dict({
+		"company": company,
+		"share_class": f"{PREFIX}Class A",
+		"holders": [f"{PREFIX}SH-{i:04d}" for i in range(HOLDERS)],
+		"agreements": [],
+		"clns": [],
+	})
+
+	frappe.db.bulk_insert(
+		"Share Type", (*BASE_FIELDS, "title"), [(*base(ctx.share_class), ctx.share_class)], ignore_duplicates=True
+	)
+	frappe.db.bulk_insert(
+		"Shareholder",
+		(*BASE_FIELDS, "title", "company"),
+		[(*base(name), name, company) for name in ctx.holders],
+		ignore_duplicates=True,
+	)
+
+	agreements = []
+	for i in range(counts.get("issue_agreement", 0)):
+		name = f"{PREFIX}SA-{i:06d}"
+		ctx.agreements.append(name)
+		shares = rng.randint(1, 20) * 100
+		agreements.append((
+			*base(name, docstatus=1),
+			today, rng.choice(ctx.holders), "Subscription Agreement", "Approved", company, ctx.share_class,
+			shares, 2, 1, shares * 2, shares, company_currency, 1, "Yes",
+		))
+	frappe.db.bulk_insert(
+		"Share Agreement",
+		(
+			*BASE_FIELDS, "agreement_date", "shareholder", "agreement_type", "status", "company", "share_type",
+			"number_of_shares", "rate_per_share", "par_value_per_share", "total_consideration",
+			"premium_amount", "transaction_currency", "exchange_rate", "is_opening_entry",
+		),
+		agreements,
+		ignore_duplicates=True,
+	)
+
+	clns = []
+	for i in range(counts.get("convert_cln", 0)):
+		name = f"{PREFIX}CLN-{i:06d}"
+		ctx.clns.append(name)
+		clns.append((
+			*base(name, docstatus=1),
+			add_months(today, -12), add_months(today, 24), rng.choice(ctx.holders), "Individual", company,
+			rng.randint(10, 100) * 1000, 8, "Simple", 0, "Qualified Financing Round", 20, ctx.share_class, 1,
+			company_currency, 1, "Active", "No", accounts.get("loan_liability"),
+			accounts.get("share_capital"), accounts.get("share_premium"),
+		))
+	frappe.db.bulk_insert(
+		"Convertible Loan Note",
+		(
+			*BASE_FIELDS, "issue_date", "maturity_date", "lender", "lender_type", "company", "principal_amount",
+			"interest_rate", "interest_calculation_method", "accrued_interest", "conversion_trigger",
+			"conversion_discount_rate", "conversion_share_type", "par_value_per_share", "loan_currency",
+			"exchange_rate", "status", "is_opening_entry", "loan_liability_account",
+			"share_capital_account", "share_premium_account",
+		),
+		clns,
+		ignore_duplicates=True,
+	)
+
+	return ctx
+
+
+def make_tasks(ctx, mix, operations, rng):
+	"""One (kind, kwargs) per operation, in a shuffled order. Agreements and
+	CLNs are each used once; lookups ask for certificate numbers the
+	issuances will have handed out by then."""
+	kinds = rng.choices(list(mix), weights=list(mix.values()), k=operations)
+	agreements, clns = iter(ctx.agreements), iter(ctx.clns)
+	company_shareholder = frappe.db.get_value("Shareholder", {"company": ctx.company}, "name")
+
+	tasks = []
+	for kind in kinds:
+		if kind == "issue_agreement":
+			kwargs = {"share_agreement_name": next(agreements)}
+		elif kind == "convert_cln":
+			kwargs = {"cln_name": next(clns), "next_round_price": 5}
+		elif kind == "share_movement":
+			kwargs = {
+				"company": ctx.company,
+				"from_shareholder": company_shareholder,
+				"to_shareholder": rng.choice(ctx.holders),
+				"share_class": ctx.share_class,
+				"number_of_shares": rng.randint(1, 20) * 100,
+			}
+		else:
+			kwargs = {"company": ctx.company, "share_class": ctx.share_class, "certificate": rng.randint(1, operations)}
+		tasks.append((kind, kwargs))
+	return tasks
+
+
+# ── Workers ───────────────────────────────────────────────────────────────────
+def init_worker(site, sites_path, user):
+	frappe.init(site=site, sites_path=sites_path)
+	frappe.connect()
+	frappe.set_user(user)
+	frappe.flags.mute_messages = True
+
+
+def execute_task(task):
+	kind, kwargs = task
+	start = time.perf_counter()
+	outcome = "ok"
+	try:
+		OPERATIONS[kind](**kwargs)
+		frappe.db.commit()
+	except Exception as e:
+		frappe.db.rollback()
+		outcome = classify_error(e)
+	finally:
+		frappe.local.message_log = []
+
+	return {"kind": kind, "outcome": outcome, "ms": (time.perf_counter() - start) * 1000}
+
+
+def classify_error(e):
+	if isinstance(e, frappe.QueryDeadlockError) or frappe.db.is_deadlocked(e):
+		return "deadlock"
+	if isinstance(e, frappe.QueryTimeoutError) or frappe.db.is_timedout(e):
+		return "lock_timeout"
+	if isinstance(e, frappe.ValidationError):
+		return "rejected"
+	return "error"
+
+
+def issue_agreement(share_agreement_name):
+	"""Issue Shares, then submit the Share Movement — the two clicks a user
+	makes on the agreement."""
+	from upande_sphynx.api.capital_management import issue_shares_from_agreement
+
+	sm_name = issue_shares_from_agreement(share_agreement_name)
+	frappe.get_doc("Share Movement", sm_name).submit()
+
+
+def submit_share_movement(company, from_shareholder, to_shareholder, share_class, number_of_shares):
+	frappe.get_doc({
+		"doctype": "Share Movement",
+		"transaction_date": nowdate(),
+		"movement_type": "Equity Capital Injection",
+		"company": company,
+		"from_shareholder": from_shareholder,
+		"to_shareholder": to_shareholder,
+		"share_class": share_class,
+		"number_of_shares": number_of_shares,
+		"par_value_per_share": 1,
+		"price_per_share": 2,
+		"total_amount": number_of_shares * 2,
+		"exchange_rate": 1,
+		"total_amount_base_currency": number_of_shares * 2,
+		"is_opening_entry": "Yes",
+	}).insert(ignore_permissions=True).submit()
+
+
+def convert_cln(cln_name, next_round_price):
+	from upande_sphynx.api.capital_management import convert_cln_to_shares
+
+	convert_cln_to_shares(cln_name, next_round_price=next_round_price)
+
+
+def certificate_lookup(company, share_class, certificate):
+	from upande_sphynx.api.capital_management import get_certificate_holder
+
+	get_certificate_holder(company, share_class, certificate)
+
+
+OPERATIONS = {
+	"issue_agreement": issue_agreement,
+	"share_movement": submit_share_movement,
+	"convert_cln": convert_cln,
+	"certificate_lookup": certificate_lookup,
+}
+
+
+# ── Measurements ──────────────────────────────────────────────────────────────
+def summarize(samples, elapsed):
+	outcomes = {}
+	for sample in samples:
+		outcomes[sample["outcome"]] = outcomes.get(sample["outcome"], 0) + 1
+
+	latencies = sorted(sample["ms"] for sample in samples if sample["outcome"] == "ok")
+	summary = {
+		"count": len(samples),
+		"outcomes": outcomes,
+		"throughput_ops": round(outcomes.get("ok", 0) / elapsed, 2) if elapsed else None,
+		"max_ms": round(latencies[-1], 2) if latencies else None,
+	}
+	for p in PERCENTILES:
+		summary[f"p{p}_ms"] = round(percentile(latencies, p), 2) if latencies else None
+	return summary
+
+
+def percentile(values, p):
+	"""Nearest-rank percentile of an already sorted list."""
+	rank = max(1, -(-len(values) * p // 100))
+	return values[int(rank) - 1]
+
+
+def get_innodb_counters():
+	rows = frappe.db.sql(
+		"SHOW GLOBAL STATUS WHERE Variable_name IN %(names)s", {"names": INNODB_COUNTERS}
+	)
+	counters = {name: flt(value) for name, value in rows}
+	return {name: counters.get(name, 0) for name in INNODB_COUNTERS}
+
+
+def find_duplicate_certificates(company, share_class):
+	"""Pairs of live Share Movements whose certificate ranges overlap — a
+	certificate number handed out twice."""
+	return frappe.db.sql(
+		"""
+		SELECT a.parent AS share_movement, b.parent AS other_share_movement,
+			a.cert_start, a.cert_end, b.cert_start AS other_cert_start, b.cert_end AS other_cert_end
+		FROM `tabShare Certificate Range` a
+		INNER JOIN `tabShare Certificate Range` b
+			ON b.company = a.company AND b.share_class = a.share_class AND b.parent > a.parent
+			AND a.cert_start <= b.cert_end AND b.cert_start <= a.cert_end
+		INNER JOIN `tabShare Movement` sa ON sa.name = a.parent AND sa.docstatus < 2
+		INNER JOIN `tabShare Movement` sb ON sb.name = b.parent AND sb.docstatus < 2
+		WHERE a.company = %s AND a.share_class = %s
+		AND a.parenttype = 'Share Movement' AND b.parenttype = 'Share Movement'
+		""",
+		(company, share_class),
+		as_dict=True,
+	)
+
+
+def format_results(results):
+	lines = [
+		f"{results['meta']['operations']} operations, {results['meta']['workers']} workers, "
+		f"{results['elapsed_s']} s, {results['throughput_ops']} ops/s",
+		f"{'operation':<20} {'count':>6} {'ok/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  failures",
+	]
+	for kind, summary in [*results["operations"].items(), ("overall", results["overall"])]:
+		failures = ", ".join(f"{k}={v}" for k, v in summary["outcomes"].items() if k != "ok") or "-"
+		lines.append(
+			f"{kind:<20} {summary['count']:>6} {summary['throughput_ops'] or '-':>8} "
+			f"{summary['p50_ms'] or '-':>9} {summary['p95_ms'] or '-':>9} {summary['p99_ms'] or '-':>9} "
+			f"{summary['max_ms'] or '-':>9}  {failures}"
+		)
+	lines.append("InnoDB over the run: " + ", ".join(f"{k}={v:g}" for k, v in results["innodb"].items()))
+	lines.append(f"Duplicate certificate ranges: {len(results['duplicate_certificates'])}")
+	return "\n".join(lines)
+
+
+# ── Cleanup ───────────────────────────────────────────────────────────────────
+# (doctype, column, pattern), children before parents. Everything the run
+# created hangs off the PREFIX share class or a PREFIX document.
+PURGE_ORDER = (
+	("Capital Event", "share_class"),
+	("Capital Event", "reference_name"),
+	("Share Movement Leg", "share_class"),
+	("Share Certificate", "share_class"),
+	("Share Certificate Range", "share_class"),
+	("Share Certificate Series", "share_class"),
+	("Share Movement", "share_class"),
+	("Share Agreement", "name"),
+	("Convertible Loan Note", "name"),
+	("Shareholder", "name"),
+	("Share Type", "name"),
+)
+
+
+def purge(company):
+	"""Delete every row a load test created for the company."""
+	for doctype, column in PURGE_ORDER:
+		filters = {column: ("like", f"{PREFIX}%")}
+		if frappe.get_meta(doctype).has_field("company"):
+			filters["company"] = company
+		frappe.db.delete(doctype, filters)
+	frappe.db.commit()
@@ -0,0 +1,240 @@
+"""Benchmark harness for the capital reports and whitelisted APIs.
+
+Times each report's `execute()` and the read-side whitelisted APIs against
+the dataset from `upande_sphynx.benchmarks.generate`, at one or more data
+sizes, and records wall time and query count per case. Results are written
+as JSON so two runs (e.g. before and after a change) can be compared:
+
+	bench --site <site> execute upande_sphynx.benchmarks.run.run \\
+		--kwargs "{'company': '<company>', 'sizes': ['small', 'medium']}"
+
+	bench --site <site> execute upande_sphynx.benchmarks.run.compare \\
+		--kwargs "{'baseline': '<before.json>', 'current': '<after.json>'}"
+
+The report cache and background generation are switched off for the
+duration, so every timing is a cold run of the real query path. Calls that
+write are not isolated: recompute_shareholder_totals commits, so run the
+benchmark on a scratch copy of the site, not production. It only rewrites
+a Shareholder's stored totals from its movements, so repeating it does not
+change what later cases measure.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import add_months, get_datetime_str, now, nowdate
+
+from upande_sphynx.benchmarks.generate import PREFIX, generate, purge
+
+DEFAULT_REPEAT = 3
+
+
+def get_cases(company):
+	"""(name, kind, target, kwargs, writes) for every benchmarked call."""
+	today = nowdate()
+	three_years_ago = add_months(today, -36)
+	cln = frappe.db.get_value("Convertible Loan Note", {"name": ("like", f"{PREFIX}%"), "company": company})
+	shareholder = frappe.db.get_value("Shareholder", {"name": ("like", f"{PREFIX}SH-%"), "company": company})
+
+	return [
+		("Shareholder Balance", "report", "Shareholder Balance",
+			{"company": company, "as_on_date": today}, False),
+		("Share Transactions Report", "report", "Share Transactions Report",
+			{"company": company, "from_date": three_years_ago, "to_date": today}, False),
+		("Share Transactions Report (one holder)", "report", "Share Transactions Report",
+			{"company": company, "shareholder": shareholder, "to_date": today}, False),
+		("Share Movement Report", "report", "Share Movement Report", {}, False),
+		("Accounts Payable Aging", "report", "Accounts Payable Aging",
+			{"company": company, "from_date": three_years_ago, "to_date": today}, False),
+		("Accounts Payable Aging (Supplier Summary)", "report", "Accounts Payable Aging",
+			{"company": company, "from_date": three_years_ago, "to_date": today,
+			"report_view": "Supplier Summary"}, False),
+		("Cap Table Diff", "report", "Cap Table Diff",
+			{"company": company, "from_date": add_months(today, -3), "to_date": today}, False),
+		("get_share_register", "api", "upande_sphynx.api.capital_management.get_share_register",
+			{"company": company, "as_on_date": today}, False),
+		("get_holdings_history", "api", "upande_sphynx.api.capital_management.get_holdings_history",
+			{"company": company, "from_date": three_years_ago, "to_date": today, "frequency": "month"}, False),
+		("get_cln_outstanding_balance", "api", "upande_sphynx.api.capital_management.get_cln_outstanding_balance",
+			{"cln_name": cln}, False),
+		("recompute_shareholder_totals", "api", "upande_sphynx.api.capital_management.recompute_shareholder_totals",
+			{"shareholder_name": shareholder}, True),
+	]
+
+
+def run(company, sizes=None, repeat=DEFAULT_REPEAT, seed=42, output=None, keep_data=False):
+	"""Benchmark every case at each size in `sizes` (generating that size's
+	dataset first), or against whatever data is already there if `sizes` is
+	empty. Returns the path of the JSON results file."""
+	results = {
+		"meta": {
+			"site": frappe.local.site,
+			"company": company,
+			"started_at": now(),
+			"commit": get_commit(),
+			"seed": seed,
+			"repeat": repeat,
+		},
+		"sizes": {},
+	}
+
+	with benchmark_conf():
+		for size in sizes or [None]:
+			generated = generate(company, size=size, seed=seed) if size else None
+			results["sizes"][size or "existing"] = {
+				"generated": generated,
+				"cases": [run_case(*case, repeat=repeat) for case in get_cases(company)],
+			}
+
+	if sizes and not keep_data:
+		purge(company)
+
+	path = output or get_output_path()
+	with open(path, "w") as f:
+		json.dump(results, f, indent=1, default=str)
+
+	print(format_results(results))
+	print(f"\nResults written to {path}")
+	return path
+
+
+def run_case(name, kind, target, kwargs, writes, repeat=DEFAULT_REPEAT):
+	timings, queries, rows = [], None, None
+
+	for _ in range(repeat):
+		frappe.clear_cache()
+		with count_queries() as counter:
+			start = time.perf_counter()
+			result = call(kind, target, kwargs)
+			timings.append((time.perf_counter() - start) * 1000)
+
+		queries = counter["queries"]
+		rows = count_rows(kind, result)
+		if writes:
+			# Only discards what the call left uncommitted (see module docstring).
+			frappe.db.rollback()
+
+	return {
+		"name": name,
+		"kind": kind,
+		"target": target,
+		"kwargs": kwargs,
+		"timings_ms": [round(t, 2) for t in timings],
+		"min_ms": round(min(timings), 2),
+		"median_ms": round(statistics.median(timings), 2),
+		"queries": queries,
+		"rows": rows,
+	}
+
+
+def call(kind, target, kwargs):
+	if kind == "report":
+		module = frappe.get_module(get_report_module(target))
+		return module.execute(frappe._dict(kwargs))
+	return frappe.get_attr(target)(**kwargs)
+
+
+def get_report_module(report_name):
+	scrubbed = frappe.scrub(report_name)
+	return f"upande_sphynx.upande_sphynx.report.{scrubbed}.{scrubbed}"
+
+
+def count_rows(kind, result):
+	if kind == "report":
+		return len(result[1])
+	if isinstance(result, list | tuple):
+		return len(result)
+	return None
+
+
+@contextmanager
+def count_queries():
+	"""Count (and keep the text of) every frappe.db.sql call made inside the
+	block; frappe.qb and frappe.db.get_* all go through it. Also used by the
+	query budget tests (upande_sphynx.tests.query_budget)."""
+	counter = {"queries": 0, "statements": []}
+	db = frappe.db
+	original = db.sql
+
+	def sql(query, *args, **kwargs):
+		counter["queries"] += 1
+		counter["statements"].append(" ".join(str(query).split())[:300])
+		return original(query, *args, **kwargs)
+
+	db.sql = sql
+	try:
+		yield counter
+	finally:
+		db.sql = original
+
+
+@contextmanager
+def benchmark_conf():
+	"""Disable the report cache and background generation for the run."""
+	overrides = {"capital_report_cache_disabled": 1, "capital_report_background_days": 0}
+	previous = {key: frappe.local.conf.get(key) for key in overrides}
+	frappe.local.conf.update(overrides)
+	try:
+		yield
+	finally:
+		frappe.local.conf.update(previous)
+
+
+def get_commit():
+	try:
+		return subprocess.check_output(
+			["git", "rev-parse", "--short", "HEAD"], cwd=frappe.get_app_path("upande_sphynx"), text=True
+		).strip()
+	except Exception:
+		return None
+
+
+def get_output_path(prefix="capital"):
+	directory = frappe.get_site_path("private", "benchmarks")
+	os.makedirs(directory, exist_ok=True)
+	stamp = get_datetime_str(now()).replace(" ", "_").replace(":", "")
+	return os.path.join(directory, f"{prefix}-{stamp}.json")
+
+
+def format_results(results):
+	lines = []
+	for size, size_results in results["sizes"].items():
+		lines.append(f"\n[{size}]")
+		lines.append(f"{'case':<45} {'median ms':>10} {'min ms':>10} {'queries':>8} {'rows':>8}")
+		for case in size_results["cases"]:
+			lines.append(
+				f"{case['name']:<45} {case['median_ms']:>10} {case['min_ms']:>10} "
+				f"{case['queries']:>8} {case['rows'] if case['rows'] is not None else '-':>8}"
+			)
+	return "\n".join(lines)
+
+
+def compare(baseline, current):
+	"""Print the median-time and query-count change of every case present
+	in both result files."""
+	with open(baseline) as f:
+		before = json.load(f)
+	with open(current) as f:
+		after = json.load(f)
+
+	lines = []
+	for size, size_results in after["sizes"].items():
+		previous = {c["name"]: c for c in before["sizes"].get(size, {}).get("cases", [])}
+		lines.append(f"\n[{size}]")
+		lines.append(f"{'case':<45} {'before ms':>10} {'after ms':>10} {'change':>8} {'queries':>12}")
+		for case in size_results["cases"]:
+			old = previous.get(case["name"])
+			if not old:
+				continue
+			change = (case["median_ms"] - old["median_ms"]) / old["median_ms"] * 100 if old["median_ms"] else 0
+			lines.append(
+				f"{case['name']:<45} {old['median_ms']:>10} {case['median_ms']:>10} {change:>+7.1f}% "
+				f"{old['queries']:>5} -> {case['queries']:<4}"
+			)
+
+	print("\n".join(lines))
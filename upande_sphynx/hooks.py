@@ -47,7 +47,7 @@ doctype_js = {
     "Shareholder": "public/js/shareholder.js",
     "Share Transfer": "public/js/share_transfer.js",
 }
-# doctype_list_js = {"doctype" : "public/js/doctype_list.js"}
+doctype_list_js = {"Share Transfer": "public/js/share_transfer_list.js"}
 # doctype_tree_js = {"doctype" : "public/js/doctype_tree.js"}
 # doctype_calendar_js = {"doctype" : "public/js/doctype_calendar.js"}
 
@@ -140,8 +140,33 @@ doctype_js = {
 # ---------------
 # Hook on document methods and events
 
+# Every write to a document the capital reports read replaces the company's
+# report data-version stamp (see upande_sphynx/report_cache.py).
+_capital_report_doc_events = {
+    event: "upande_sphynx.report_cache.bump_data_version"
+    for event in ("on_update", "on_submit", "on_cancel", "on_update_after_submit", "on_trash")
+}
+
 doc_events = {
+    "Account": {
+        event: "upande_sphynx.account_cache.clear_account_meta"
+        for event in ("on_update", "on_trash", "after_rename")
+    },
+    "Share Movement": _capital_report_doc_events,
+    "Convertible Loan Note": _capital_report_doc_events,
+    "Journal Entry": _capital_report_doc_events,
+    "Purchase Invoice": _capital_report_doc_events,
+    "Payment Entry": _capital_report_doc_events,
     "Share Transfer": {
+        **_capital_report_doc_events,
+        "on_submit": [
+            "upande_sphynx.report_cache.bump_data_version",
+            "upande_sphynx.upande_sphynx.doctype.capital_event.capital_event.on_share_transfer_submit",
+        ],
+        "on_cancel": [
+            "upande_sphynx.report_cache.bump_data_version",
+            "upande_sphynx.upande_sphynx.doctype.capital_event.capital_event.on_share_transfer_cancel",
+        ],
         "validate": [
             "upande_sphynx.share_transfer_customization.share_transfer_controller.set_standard_accounts",
             "upande_sphynx.share_transfer_customization.share_transfer_controller.calculate_rate_and_amount",
@@ -181,6 +206,17 @@ fixtures = [
 # ---------------
 
 scheduler_events = {
+	"cron": {
+		"* * * * *": [
+			"upande_sphynx.upande_sphynx.doctype.capital_je_posting.capital_je_posting.process_due_postings"
+		],
+	},
+	"daily": [
+		"upande_sphynx.upande_sphynx.doctype.ap_aging_snapshot.ap_aging_snapshot.take_daily_snapshots"
+	],
+	"weekly": [
+		"upande_sphynx.upande_sphynx.doctype.capital_integrity_issue.capital_integrity_issue.run_weekly_check"
+	],
 	"yearly": [
 		"upande_sphynx.tasks.revalue_share_capital_fx"
 	],
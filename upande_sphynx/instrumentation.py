@@ -0,0 +1,135 @@
+"""Per-endpoint latency and query instrumentation for the capital APIs.
+
+`@instrumented` goes under `@frappe.whitelist()` on an endpoint. When the
+`capital_instrumentation_enabled` site config flag is set, each call records
+its wall time, SQL query count, rows returned by those queries and commits.
+The sample is pushed onto a capped Redis list per endpoint (SAMPLE_LIMIT
+most recent calls); the Capital Endpoint Latency report turns those into
+p50/p95/p99. With the flag off the decorator costs one config lookup.
+
+Counting works by wrapping frappe.db.sql and frappe.db.commit for the
+duration of the outermost instrumented call. Nested instrumented calls each
+record their own share, so an endpoint's numbers include whatever it calls.
+`capital_instrumentation_sample_rate` (0-1, default 1) records only that
+fraction of calls.
+"""
+
+import functools
+import inspect
+import json
+import random
+import time
+
+import frappe
+
+SAMPLES_KEY = "capital_endpoint_samples::{0}"
+ENDPOINTS_KEY = "capital_endpoints"
+SAMPLE_LIMIT = 1000
+
+
+def instrumented(fn):
+	endpoint = f"{fn.__module__}.{fn.__qualname__}"
+
+	@functools.wraps(fn)
+	def wrapper(*args, **kwargs):
+		if not is_enabled():
+			return fn(*args, **kwargs)
+
+		counters = start_counting()
+		before = dict(counters)
+		start = time.perf_counter()
+		try:
+			return fn(*args, **kwargs)
+		finally:
+			elapsed_ms = (time.perf_counter() - start) * 1000
+			sample = {key: counters[key] - before[key] for key in counters}
+			stop_counting()
+			record(endpoint, elapsed_ms, sample)
+
+	# frappe passes request arguments by name, read from fnargs when set.
+	wrapper.fnargs = list(inspect.signature(fn).parameters)
+	return wrapper
+
+
+def is_enabled():
+	if not frappe.conf.get("capital_instrumentation_enabled"):
+		return False
+	rate = frappe.conf.get("capital_instrumentation_sample_rate")
+	return rate is None or random.random() < rate
+
+
+def start_counting():
+	"""Install the counting wrappers (once, for the outermost call) and
+	return the live counters."""
+	state = getattr(frappe.local, "capital_instrumentation", None)
+	if state:
+		state["depth"] += 1
+		return state["counters"]
+
+	counters = {"queries": 0, "rows": 0, "commits": 0}
+	db = frappe.db
+	sql, commit = db.sql, db.commit
+
+	def counting_sql(*args, **kwargs):
+		result = sql(*args, **kwargs)
+		counters["queries"] += 1
+		if isinstance(result, list | tuple):
+			counters["rows"] += len(result)
+		return result
+
+	def counting_commit(*args, **kwargs):
+		counters["commits"] += 1
+		return commit(*args, **kwargs)
+
+	db.sql, db.commit = counting_sql, counting_commit
+	frappe.local.capital_instrumentation = {
+		"depth": 1,
+		"counters": counters,
+		"db": db,
+		"originals": (sql, commit),
+	}
+	return counters
+
+
+def stop_counting():
+	state = frappe.local.capital_instrumentation
+	state["depth"] -= 1
+	if state["depth"]:
+		return
+
+	state["db"].sql, state["db"].commit = state["originals"]
+	frappe.local.capital_instrumentation = None
+
+
+def record(endpoint, elapsed_ms, sample):
+	"""Push one sample; never lets a Redis problem fail the request."""
+	sample.update({"ms": round(elapsed_ms, 2), "at": int(time.time())})
+	try:
+		cache = frappe.cache()
+		key = SAMPLES_KEY.format(endpoint)
+		cache.lpush(key, json.dumps(sample))
+		cache.ltrim(key, 0, SAMPLE_LIMIT - 1)
+		cache.sadd(ENDPOINTS_KEY, endpoint)
+	except Exception:
+		pass
+
+
+def get_samples(endpoint):
+	raw = frappe.cache().lrange(SAMPLES_KEY.format(endpoint), 0, SAMPLE_LIMIT - 1)
+	return [json.loads(value) for value in raw]
+
+
+def get_endpoints():
+	return sorted(
+		endpoint.decode() if isinstance(endpoint, bytes) else endpoint
+		for endpoint in frappe.cache().smembers(ENDPOINTS_KEY)
+	)
+
+
+@frappe.whitelist()
+def clear_samples():
+	"""Drop every recorded sample."""
+	frappe.only_for("System Manager")
+	for endpoint in get_endpoints():
+		frappe.cache().delete_value(SAMPLES_KEY.format(endpoint))
+	frappe.cache().delete_value(ENDPOINTS_KEY)
@@ -0,0 +1,250 @@
+"""Dilution and new-round modeling against the current cap table.
+
+model_dilution loads the share register and the active Convertible Loan
+Notes once, then plays each scenario — a list of hypothetical steps — on an
+in-memory copy, and returns pre- and post-money ownership for all of them
+in one response. Nothing is written. Steps, applied in order:
+
+- {"type": "issuance", "investor": ..., "share_class": ..., "amount": ...,
+  and "price_per_share" or "pre_money_valuation"}: new shares for new
+  money. A pre-money valuation is priced over the fully diluted shares at
+  that point of the scenario, pool top-ups included.
+- {"type": "pool", "share_class": ..., "shares": ... or
+  "target_percentage": ..., "holder": "Option Pool"}: add to an option
+  pool, either a fixed number of shares or enough for the pool to be that
+  percentage of the fully diluted total right after the top-up.
+- {"type": "conversion", "convertible_loan_note": <name> or "all",
+  "price_per_share": ...}: convert active CLNs the way
+  convert_cln_to_shares would (principal plus accrued interest, at
+  calculate_conversion_price), at the given round price or the scenario's
+  latest issuance price.
+
+Holders are Shareholder names for existing positions and free-form labels
+for new investors and pools.
+"""
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, getdate
+
+from upande_sphynx.instrumentation import instrumented
+
+MAX_SCENARIOS = 100
+MAX_STEPS = 50
+DEFAULT_POOL_HOLDER = "Option Pool"
+
+
+@frappe.whitelist()
+@instrumented
+def model_dilution(company, scenarios, as_on_date=None):
+	"""Run every scenario in `scenarios` ([{"name": ..., "steps": [...]}])
+	against the cap table as of as_on_date. Returns the pre-money table once
+	and, per scenario, the post-money table, round price and valuations."""
+	scenarios = frappe.parse_json(scenarios) if isinstance(scenarios, str) else scenarios
+	if not scenarios:
+		frappe.throw(_("Pass at least one scenario"))
+	if len(scenarios) > MAX_SCENARIOS:
+		frappe.throw(_("At most {0} scenarios can be modeled at once").format(MAX_SCENARIOS))
+
+	cap_table = load_cap_table(company, as_on_date)
+	pre_money = summarize(cap_table.positions)
+
+	return {
+		"as_on_date": cap_table.as_on_date,
+		"pre_money": pre_money,
+		"active_clns": list(cap_table.clns.values()),
+		"scenarios": [
+			run_scenario(scenario, i, cap_table, pre_money) for i, scenario in enumerate(scenarios, start=1)
+		],
+	}
+
+
+def load_cap_table(company, as_on_date=None):
+	from upande_sphynx.api.capital_management import get_share_register
+
+	as_on_date = getdate(as_on_date or frappe.utils.today())
+	positions = {}
+	for row in get_share_register(company, as_on_date):
+		holder = positions.setdefault(row.to_shareholder, {})
+		holder[row.share_class] = holder.get(row.share_class, 0) + flt(row.current_holding)
+
+	clns = frappe.get_all(
+		"Convertible Loan Note",
+		filters={"company": company, "docstatus": 1, "status": "Active", "issue_date": ("<=", as_on_date)},
+		fields=[
+			"name", "lender", "principal_amount", "accrued_interest", "conversion_share_type",
+			"conversion_discount_rate", "valuation_cap",
+		],
+	)
+
+	return frappe._dict({
+		"as_on_date": as_on_date,
+		"positions": positions,
+		"clns": {cln.name: cln for cln in clns},
+	})
+
+
+def run_scenario(scenario, number, cap_table, pre_money):
+	steps = scenario.get("steps") or []
+	if len(steps) > MAX_STEPS:
+		frappe.throw(_("Scenario {0} has more than {1} steps").format(number, MAX_STEPS))
+
+	state = frappe._dict({
+		"positions": {holder: dict(classes) for holder, classes in cap_table.positions.items()},
+		"clns": dict(cap_table.clns),
+		"price": None,
+		"new_money": 0,
+		"pre_money_shares": None,
+	})
+
+	applied = []
+	for step_number, step in enumerate(steps, start=1):
+		step = frappe._dict(step)
+		apply_step = STEP_TYPES.get(step.get("type"))
+		if not apply_step:
+			frappe.throw(_("Scenario {0}, step {1}: type must be one of {2}").format(
+				number, step_number, ", ".join(STEP_TYPES)))
+		applied.append({"type": step.type, **apply_step(state, step, f"{number}.{step_number}")})
+
+	post_money = summarize(state.positions, pre_money)
+	price = state.price
+	return {
+		"name": scenario.get("name") or _("Scenario {0}").format(number),
+		"steps": applied,
+		"price_per_share": price,
+		"new_money": state.new_money,
+		"pre_money_valuation": price * state.pre_money_shares if price and state.pre_money_shares else None,
+		"post_money_valuation": price * post_money["total_shares"] if price else None,
+		"post_money": post_money,
+	}
+
+
+# ── Steps ─────────────────────────────────────────────────────────────────────
+def apply_issuance(state, step, label):
+	if not step.get("investor") or not step.get("share_class") or flt(step.get("amount")) <= 0:
+		frappe.throw(_("Step {0}: an issuance needs investor, share_class and a positive amount").format(label))
+
+	fully_diluted = total_shares(state.positions)
+	if step.get("price_per_share"):
+		price = flt(step.price_per_share)
+	elif step.get("pre_money_valuation"):
+		price = flt(step.pre_money_valuation) / fully_diluted if fully_diluted else 0
+	else:
+		frappe.throw(_("Step {0}: give price_per_share or pre_money_valuation").format(label))
+
+	if price <= 0:
+		frappe.throw(_("Step {0}: the price per share must be positive").format(label))
+
+	shares = int(flt(step.amount) / price)
+	add_shares(state.positions, step.investor, step.share_class, shares)
+
+	if state.pre_money_shares is None:
+		state.pre_money_shares = fully_diluted
+	state.price = price
+	state.new_money += flt(step.amount)
+	return {"holder": step.investor, "share_class": step.share_class, "shares": shares, "price_per_share": price}
+
+
+def apply_pool(state, step, label):
+	holder = step.get("holder") or DEFAULT_POOL_HOLDER
+	if not step.get("share_class"):
+		frappe.throw(_("Step {0}: a pool top-up needs share_class").format(label))
+
+	if step.get("target_percentage") is not None:
+		target = flt(step.target_percentage) / 100
+		if not 0 <= target < 1:
+			frappe.throw(_("Step {0}: target_percentage must be at least 0 and below 100").format(label))
+		pool = sum(state.positions.get(holder, {}).values())
+		# pool + x = target x (total + x)
+		shares = max(int(-(-(target * total_shares(state.positions) - pool) // (1 - target))), 0)
+	else:
+		shares = cint(step.get("shares"))
+		if shares <= 0:
+			frappe.throw(_("Step {0}: give shares or target_percentage").format(label))
+
+	add_shares(state.positions, holder, step.share_class, shares)
+	return {"holder": holder, "share_class": step.share_class, "shares": shares}
+
+
+def apply_conversion(state, step, label):
+	from upande_sphynx.api.capital_management import calculate_conversion_price
+
+	if step.get("convertible_loan_note") in (None, "", "all"):
+		notes = list(state.clns)
+	elif step.convertible_loan_note in state.clns:
+		notes = [step.convertible_loan_note]
+	else:
+		frappe.throw(_("Step {0}: {1} is not an active Convertible Loan Note of this company").format(
+			label, step.convertible_loan_note))
+
+	round_price = flt(step.get("price_per_share")) or state.price
+	fully_diluted = total_shares(state.positions)
+	converted = []
+	for name in notes:
+		cln = state.clns.pop(name)
+		if not cln.conversion_share_type:
+			frappe.throw(_("Step {0}: {1} has no Conversion Share Type").format(label, name))
+
+		price = calculate_conversion_price(cln, round_price, fully_diluted)
+		amount = flt(cln.principal_amount) + flt(cln.accrued_interest)
+		shares = int(amount / price)
+		add_shares(state.positions, cln.lender, cln.conversion_share_type, shares)
+		converted.append({
+			"convertible_loan_note": name,
+			"holder": cln.lender,
+			"share_class": cln.conversion_share_type,
+			"amount": amount,
+			"conversion_price": price,
+			"shares": shares,
+		})
+
+	return {"converted": converted, "shares": sum(row["shares"] for row in converted)}
+
+
+STEP_TYPES = {
+	"issuance": apply_issuance,
+	"pool": apply_pool,
+	"conversion": apply_conversion,
+}
+
+
+# ── Tables ────────────────────────────────────────────────────────────────────
+def add_shares(positions, holder, share_class, shares):
+	classes = positions.setdefault(holder, {})
+	classes[share_class] = classes.get(share_class, 0) + shares
+
+
+def total_shares(positions):
+	return sum(shares for classes in positions.values() for shares in classes.values())
+
+
+def summarize(positions, pre_money=None):
+	"""Fully diluted ownership per holder and totals per class. With the
+	pre-money table given, each holder also gets its pre-money figures and
+	the change."""
+	total = total_shares(positions)
+	before = {row["holder"]: row for row in pre_money["holders"]} if pre_money else {}
+
+	holders, classes = [], {}
+	for holder, holder_classes in positions.items():
+		shares = sum(holder_classes.values())
+		if not shares:
+			continue
+		row = {
+			"holder": holder,
+			"shares": shares,
+			"ownership": shares / total * 100 if total else 0,
+			"classes": holder_classes,
+		}
+		if pre_money:
+			previous = before.get(holder, {})
+			row["pre_money_shares"] = previous.get("shares", 0)
+			row["pre_money_ownership"] = previous.get("ownership", 0)
+			row["change_ownership"] = row["ownership"] - row["pre_money_ownership"]
+		holders.append(row)
+
+		for share_class, class_shares in holder_classes.items():
+			classes[share_class] = classes.get(share_class, 0) + class_shares
+
+	holders.sort(key=lambda row: (-row["shares"], row["holder"]))
+	return {"total_shares": total, "holders": holders, "classes": classes}
@@ -0,0 +1,339 @@
+"""Liquidation waterfall across share classes, for a whole vector of exits.
+
+Given the share register as of a date (get_share_register) and each class's
+liquidation terms, works out what every class — and optionally every
+holder — receives at each exit value in one set of NumPy array operations,
+rather than one Python pass per exit:
+
+- Preferred classes are paid their preference (multiple x capital invested
+  in the class) first, senior tiers before junior ones, pro rata within a
+  tier.
+- What is left goes to common, participating preferred and any
+  non-participating preferred that does better converting, pro rata by
+  shares.
+- Non-participating classes convert in order of preference per share
+  (cheapest first): for k = 0..m converted classes the payouts are computed
+  for every exit at once, and each exit takes the largest k whose residual
+  price per share still covers the k-th class's preference per share.
+
+Class terms come from the submitted Share Agreements' Liquidation
+Preference (the most common value per share class), and can be overridden
+per call. Active Convertible Loan Notes are included as if converted into
+their conversion share class, at the price calculate_conversion_price gives
+for `round_price` and/or their valuation cap over the fully diluted shares;
+notes without a usable price are left out and listed in `warnings`.
+
+Exit grids above PARALLEL_THRESHOLD values are split into chunks and
+evaluated in a process pool (`capital_waterfall_workers` in site config,
+default: CPU count, at most MAX_WORKERS).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import get_context
+
+import frappe
+import numpy as np
+from frappe import _
+from frappe.utils import cint, flt, getdate
+
+from upande_sphynx.instrumentation import instrumented
+
+# Share Agreement "Liquidation Preference" → (multiple, participating).
+PREFERENCE_TERMS = {
+	"1x Non-Participating": (1, False),
+	"1x Participating": (1, True),
+	"2x Non-Participating": (2, False),
+}
+
+MAX_EXIT_VALUES = 1_000_000
+DEFAULT_STEPS = 500
+CHUNK_SIZE = 50_000
+PARALLEL_THRESHOLD = 200_000
+MAX_WORKERS = 8
+
+# Holder-level results are exits x holders numbers; above this the caller
+# gets class-level results only.
+MAX_HOLDER_CELLS = 2_000_000
+
+
+@frappe.whitelist()
+@instrumented
+def get_exit_waterfall(
+	company,
+	exit_values=None,
+	min_exit=None,
+	max_exit=None,
+	steps=DEFAULT_STEPS,
+	as_on_date=None,
+	terms=None,
+	round_price=None,
+	by_holder=0,
+):
+	"""Payouts per share class (and per holder with `by_holder`) at each exit
+	value: either the `exit_values` list, or `steps` values evenly spaced
+	from `min_exit` to `max_exit`. `terms` overrides class terms as
+	{share_class: {"multiple": 1, "participating": 0, "seniority": 0}}."""
+	exits = get_exit_values(exit_values, min_exit, max_exit, steps)
+	cap_table = load_cap_table(company, as_on_date, round_price)
+	classes = get_class_terms(company, cap_table, frappe.parse_json(terms) if terms else None)
+
+	result = compute_waterfall(exits, classes)
+
+	response = {
+		"exit_values": exits.tolist(),
+		"price_per_share": np.round(result["price"], 6).tolist(),
+		"classes": [
+			{
+				"share_class": share_class,
+				"shares": classes.shares[i],
+				"preference": classes.preference[i],
+				"multiple": classes.multiple[i],
+				"participating": bool(classes.participating[i]),
+				"seniority": int(classes.seniority[i]),
+				"payout": np.round(result["preference_paid"][:, i] + result["residual_paid"][:, i], 2).tolist(),
+				"converts": result["converted"][:, i].tolist() if classes.convertible[i] else None,
+			}
+			for i, share_class in enumerate(classes.names)
+		],
+		"clns": cap_table.clns,
+		"warnings": cap_table.warnings + classes.warnings,
+	}
+
+	if cint(by_holder):
+		if len(exits) * len(cap_table.holders) > MAX_HOLDER_CELLS:
+			response["warnings"].append(
+				_("Too many exit values x holders for per-holder results; returned per class only.")
+			)
+		else:
+			response["holders"] = allocate_to_holders(result, classes, cap_table)
+
+	return response
+
+
+def get_exit_values(exit_values=None, min_exit=None, max_exit=None, steps=DEFAULT_STEPS):
+	if exit_values:
+		exits = np.asarray(frappe.parse_json(exit_values) if isinstance(exit_values, str) else exit_values, dtype=float)
+	elif max_exit is not None:
+		exits = np.linspace(flt(min_exit), flt(max_exit), cint(steps) or DEFAULT_STEPS)
+	else:
+		frappe.throw(_("Pass exit_values, or max_exit (and optionally min_exit and steps)"))
+
+	if exits.ndim != 1 or not len(exits):
+		frappe.throw(_("Exit values must be a non-empty list of numbers"))
+	if len(exits) > MAX_EXIT_VALUES:
+		frappe.throw(_("At most {0} exit values can be evaluated at once").format(MAX_EXIT_VALUES))
+	if (exits < 0).any():
+		frappe.throw(_("Exit values cannot be negative"))
+	return exits
+
+
+# ── Inputs ────────────────────────────────────────────────────────────────────
+def load_cap_table(company, as_on_date=None, round_price=None):
+	"""Positions per (holder, class) from the share register, plus active
+	CLNs as if converted. Returns holders, per-position shares and capital
+	invested, the CLNs included, and warnings for the ones left out."""
+	from upande_sphynx.api.capital_management import calculate_conversion_price, get_share_register
+
+	as_on_date = getdate(as_on_date or frappe.utils.today())
+	positions = [
+		(row.to_shareholder, row.share_class, flt(row.current_holding), flt(row.total_investment))
+		for row in get_share_register(company, as_on_date)
+	]
+
+	fully_diluted = sum(shares for _holder, _share_class, shares, _invested in positions)
+	clns, warnings = [], []
+	for cln in frappe.get_all(
+		"Convertible Loan Note",
+		filters={"company": company, "docstatus": 1, "status": "Active", "issue_date": ("<=", as_on_date)},
+		fields=[
+			"name", "lender", "principal_amount", "accrued_interest", "conversion_share_type",
+			"conversion_discount_rate", "valuation_cap", "exchange_rate",
+		],
+	):
+		if not cln.conversion_share_type or not (
+			(round_price and cln.conversion_discount_rate) or (cln.valuation_cap and fully_diluted)
+		):
+			warnings.append(_("{0} has no conversion share class or price, and is left out").format(cln.name))
+			continue
+
+		amount = flt(cln.principal_amount) + flt(cln.accrued_interest)
+		price = calculate_conversion_price(cln, round_price, fully_diluted)
+		shares = int(amount / price)
+		positions.append((cln.lender, cln.conversion_share_type, shares, amount * flt(cln.exchange_rate or 1)))
+		clns.append({
+			"convertible_loan_note": cln.name,
+			"lender": cln.lender,
+			"share_class": cln.conversion_share_type,
+			"amount": amount,
+			"conversion_price": price,
+			"shares": shares,
+		})
+
+	return frappe._dict({
+		"positions": positions,
+		"holders": sorted({holder for holder, _share_class, _shares, _invested in positions}),
+		"clns": clns,
+		"warnings": warnings,
+	})
+
+
+def get_class_terms(company, cap_table, overrides=None):
+	"""Per-class arrays (in name order) of shares, capital invested,
+	preference multiple and amount, participation and seniority."""
+	overrides = overrides or {}
+	names = sorted({share_class for _holder, share_class, _shares, _invested in cap_table.positions})
+	index = {name: i for i, name in enumerate(names)}
+
+	shares = np.zeros(len(names))
+	invested = np.zeros(len(names))
+	for _holder, share_class, position_shares, position_invested in cap_table.positions:
+		shares[index[share_class]] += position_shares
+		invested[index[share_class]] += position_invested
+
+	agreed, warnings = get_agreed_preferences(company)
+	multiple = np.zeros(len(names))
+	participating = np.ones(len(names), dtype=bool)
+	seniority = np.zeros(len(names), dtype=int)
+
+	for share_class, i in index.items():
+		if share_class in agreed:
+			multiple[i], participating[i] = PREFERENCE_TERMS[agreed[share_class]]
+		override = overrides.get(share_class)
+		if override:
+			multiple[i] = flt(override.get("multiple", multiple[i]))
+			participating[i] = bool(cint(override.get("participating", participating[i])))
+			seniority[i] = cint(override.get("seniority", seniority[i]))
+
+	preference = multiple * invested
+	return frappe._dict({
+		"names": names,
+		"shares": shares,
+		"invested": invested,
+		"multiple": multiple,
+		"preference": preference,
+		"participating": participating,
+		"seniority": seniority,
+		"convertible": (preference > 0) & ~participating,
+		"warnings": warnings,
+	})
+
+
+def get_agreed_preferences(company):
+	"""{share_class: Liquidation Preference} from submitted Share
+	Agreements, taking the most common value where agreements disagree."""
+	rows = frappe.get_all(
+		"Share Agreement",
+		filters={"company": company, "docstatus": 1, "liquidation_preference": ("in", list(PREFERENCE_TERMS))},
+		fields=["share_type", "liquidation_preference", "count(name) as agreements"],
+		group_by="share_type, liquidation_preference",
+		order_by="share_type, agreements desc",
+	)
+
+	agreed, warnings = {}, []
+	for row in rows:
+		if row.share_type not in agreed:
+			agreed[row.share_type] = row.liquidation_preference
+		else:
+			warnings.append(_("Share Agreements for {0} disagree on Liquidation Preference; using {1}").format(
+				row.share_type, agreed[row.share_type]))
+	return agreed, warnings
+
+
+# ── Engine ────────────────────────────────────────────────────────────────────
+def compute_waterfall(exits, classes):
+	"""run_waterfall over the exit vector in chunks, in a process pool for
+	large grids."""
+	args = (classes.shares, classes.preference, classes.participating, classes.seniority)
+	chunks = [exits[i:i + CHUNK_SIZE] for i in range(0, len(exits), CHUNK_SIZE)]
+
+	if len(exits) > PARALLEL_THRESHOLD and len(chunks) > 1:
+		workers = min(cint(frappe.conf.get("capital_waterfall_workers")) or os.cpu_count() or 1, MAX_WORKERS)
+		with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+			results = list(pool.map(run_waterfall, chunks, *(repeat(arg) for arg in args)))
+	else:
+		results = [run_waterfall(chunk, *args) for chunk in chunks]
+
+	return {key: np.concatenate([result[key] for result in results]) for key in results[0]}
+
+
+def run_waterfall(exits, shares, preference, participating, seniority):
+	"""Pure NumPy waterfall for a vector of exits (N) over classes (C).
+
+	Returns preference_paid and residual_paid (N x C), the residual price
+	per sharing share (N), and which classes converted (N x C)."""
+	n, c = len(exits), len(shares)
+	convertible = (preference > 0) & ~participating
+	candidates = np.flatnonzero(convertible)
+	threshold = preference[candidates] / np.maximum(shares[candidates], 1)
+	order = candidates[np.argsort(threshold, kind="stable")]
+	threshold = np.sort(threshold, kind="stable")
+
+	outcomes = []
+	for k in range(len(order) + 1):
+		converted = np.zeros(c, dtype=bool)
+		converted[order[:k]] = True
+		outcomes.append((converted, *settle(exits, shares, preference, participating, seniority, converted)))
+
+	# Largest k whose residual price covers the k-th cheapest preference per
+	# share; k = 0 (nobody converts) is always a valid fallback.
+	valid = np.ones((n, len(outcomes)), dtype=bool)
+	for k in range(1, len(outcomes)):
+		valid[:, k] = outcomes[k][3] >= threshold[k - 1]
+	chosen = len(outcomes) - 1 - np.argmax(valid[:, ::-1], axis=1)
+
+	rows = np.arange(n)
+
+	def pick(position):
+		return np.stack([outcome[position] for outcome in outcomes])[chosen, rows]
+
+	return {
+		"converted": np.stack([outcome[0] for outcome in outcomes])[chosen],
+		"preference_paid": pick(1),
+		"residual_paid": pick(2),
+		"price": pick(3),
+	}
+
+
+def settle(exits, shares, preference, participating, seniority, converted):
+	"""Payouts for one fixed set of converted classes: preferences by
+	seniority tier, then the residual pro rata over sharing shares."""
+	takes_preference = (preference > 0) & ~converted
+	preference_paid = np.zeros((len(exits), len(shares)))
+	remaining = exits.astype(float).copy()
+
+	for tier in sorted(set(seniority[takes_preference].tolist()), reverse=True):
+		members = takes_preference & (seniority == tier)
+		tier_total = preference[members].sum()
+		paid = np.minimum(remaining, tier_total)
+		preference_paid[:, members] = paid[:, None] * (preference[members] / tier_total)
+		remaining -= paid
+
+	sharing = participating | converted
+	sharing_shares = shares[sharing].sum()
+	price = remaining / sharing_shares if sharing_shares else np.zeros(len(exits))
+	residual_paid = price[:, None] * np.where(sharing, shares, 0)[None, :]
+	return preference_paid, residual_paid, price
+
+
+def allocate_to_holders(result, classes, cap_table):
+	"""Split each class's payout over its holders: the preference part by
+	capital invested, the residual part by shares."""
+	index = {name: i for i, name in enumerate(classes.names)}
+	holder_index = {holder: j for j, holder in enumerate(cap_table.holders)}
+	by_investment = np.zeros((len(classes.names), len(cap_table.holders)))
+	by_shares = np.zeros_like(by_investment)
+
+	for holder, share_class, shares, invested in cap_table.positions:
+		i, j = index[share_class], holder_index[holder]
+		if classes.invested[i]:
+			by_investment[i, j] += invested / classes.invested[i]
+		if classes.shares[i]:
+			by_shares[i, j] += shares / classes.shares[i]
+
+	payouts = result["preference_paid"] @ by_investment + result["residual_paid"] @ by_shares
+	return [
+		{"shareholder": holder, "payout": np.round(payouts[:, j], 2).tolist()}
+		for j, holder in enumerate(cap_table.holders)
+	]
@@ -0,0 +1,126 @@
+"""Backfill the Capital Event log from existing documents.
+
+Events are normally appended by the Share Movement, Share Transfer and
+Convertible Loan Note lifecycles; documents from before the log existed
+have none, so a replay would miss them. Done as one set-based INSERT ...
+SELECT per source (submitted Share Movements, submitted Share Transfers,
+disbursed CLNs, then their accrual and repayment rows) rather than
+re-running each document's hooks. Cancelled documents are skipped rather
+than backfilled as an event plus its reversal — they net to nothing in any
+replay. Safe to re-run: the log is cleared and rebuilt.
+"""
+
+import frappe
+
+COLUMNS = """
+	creation, modified, owner, modified_by, docstatus, idx,
+	event_type, event_date, company, reference_doctype, reference_name,
+	shareholder, counterparty, share_class, convertible_loan_note,
+	shares, amount, interest_amount, currency, amount_base
+"""
+
+SOURCES = [
+	# Share Movements
+	"""
+	SELECT
+		NOW(6), NOW(6), 'Administrator', 'Administrator', 0, 0,
+		CASE sm.movement_type
+			WHEN 'Equity Capital Injection' THEN 'Issued'
+			WHEN 'Share Purchase' THEN 'Transferred'
+			WHEN 'Share Buyback' THEN 'Bought Back'
+			WHEN 'Loan Equity Injection' THEN 'Converted'
+		END,
+		sm.transaction_date, sm.company, 'Share Movement', sm.name,
+		sm.to_shareholder,
+		CASE WHEN sm.from_shareholder != sm.to_shareholder THEN sm.from_shareholder END,
+		sm.share_class,
+		CASE WHEN sm.source_document_type = 'Convertible Loan Note' THEN sm.source_document_name END,
+		sm.number_of_shares, sm.total_amount, 0, sm.transaction_currency, sm.total_amount_base_currency
+	FROM `tabShare Movement` sm
+	WHERE sm.docstatus = 1
+	AND sm.movement_type IN ('Equity Capital Injection', 'Share Purchase', 'Share Buyback', 'Loan Equity Injection')
+	ORDER BY sm.transaction_date, sm.creation
+	""",
+	# Share Transfers
+	"""
+	SELECT
+		NOW(6), NOW(6), 'Administrator', 'Administrator', 0, 0,
+		CASE st.transfer_type
+			WHEN 'Issue' THEN 'Issued'
+			WHEN 'Transfer' THEN 'Transferred'
+			WHEN 'Purchase' THEN 'Bought Back'
+		END,
+		st.date, st.company, 'Share Transfer', st.name,
+		st.to_shareholder, st.from_shareholder, st.share_type, NULL,
+		st.no_of_shares, {amount}, 0, {currency}, {amount_base}
+	FROM `tabShare Transfer` st
+	WHERE st.docstatus = 1
+	ORDER BY st.date, st.creation
+	""",
+	# CLN disbursements (opening CLNs are activated without a Journal Entry)
+	"""
+	SELECT
+		NOW(6), NOW(6), 'Administrator', 'Administrator', 0, 0,
+		'Issued', cln.issue_date, cln.company, 'Convertible Loan Note', cln.name,
+		cln.lender, NULL, NULL, cln.name,
+		0, cln.principal_amount, 0, cln.loan_currency,
+		cln.principal_amount * IFNULL(NULLIF(cln.exchange_rate, 0), 1)
+	FROM `tabConvertible Loan Note` cln
+	WHERE cln.docstatus = 1
+	AND (IFNULL(cln.disbursement_journal_entry_ref, '') != ''
+		OR (cln.is_opening_entry = 'Yes' AND cln.status IN ('Active', 'Converted', 'Repaid')))
+	ORDER BY cln.issue_date, cln.creation
+	""",
+	# CLN interest accruals
+	"""
+	SELECT
+		NOW(6), NOW(6), 'Administrator', 'Administrator', 0, 0,
+		'Accrued', acc.accrual_date, cln.company, 'Convertible Loan Note', cln.name,
+		cln.lender, NULL, NULL, cln.name,
+		0, 0, acc.interest_amount, cln.loan_currency, acc.interest_amount_base
+	FROM `tabCLN Interest Accrual` acc
+	INNER JOIN `tabConvertible Loan Note` cln ON cln.name = acc.parent
+	WHERE cln.docstatus = 1 AND acc.parenttype = 'Convertible Loan Note'
+	ORDER BY acc.accrual_date, acc.idx
+	""",
+	# CLN repayments
+	"""
+	SELECT
+		NOW(6), NOW(6), 'Administrator', 'Administrator', 0, 0,
+		'Repaid', rep.repayment_date, cln.company, 'Convertible Loan Note', cln.name,
+		cln.lender, NULL, NULL, cln.name,
+		0, rep.principal_paid, rep.interest_paid, cln.loan_currency,
+		(rep.principal_paid + rep.interest_paid) * IFNULL(NULLIF(rep.exchange_rate, 0), 1)
+	FROM `tabCLN Repayment` rep
+	INNER JOIN `tabConvertible Loan Note` cln ON cln.name = rep.parent
+	WHERE cln.docstatus = 1 AND rep.parenttype = 'Convertible Loan Note'
+	ORDER BY rep.repayment_date, rep.idx
+	""",
+]
+
+
+def execute():
+	frappe.reload_doc("upande_sphynx", "doctype", "capital_event")
+
+	frappe.db.delete("Capital Event")
+
+	amounts = get_share_transfer_amounts()
+	for source in SOURCES:
+		frappe.db.sql(f"INSERT INTO `tabCapital Event` ({COLUMNS}) {source.format(**amounts)}")
+
+
+def get_share_transfer_amounts():
+	"""Share Transfer's multi-currency amounts are custom fields (see
+	share_transfer_controller.calculate_rate_and_amount); fall back to the
+	standard `amount` on sites that don't have them."""
+
+	def column(fieldname, fallback="st.amount"):
+		if frappe.db.has_column("Share Transfer", fieldname):
+			return f"IFNULL(NULLIF(st.{fieldname}, 0), {fallback})"
+		return fallback
+
+	return {
+		"amount": column("total_amount_in_transaction_currency"),
+		"amount_base": column("total_amount_in_company_currency"),
+		"currency": "st.transaction_currency" if frappe.db.has_column("Share Transfer", "transaction_currency") else "NULL",
+	}
@@ -0,0 +1,87 @@
+"""Backfill Share Certificate Range rows from existing certificate_numbers text.
+
+Movements saved before the certificate_ranges child table existed only have
+the free-text certificate_numbers ("CERT-A-00001, CERT-A-00002" or
+"CERT-A-00001 to CERT-A-09999 (9999 certificates)"). Those strings can only
+be parsed in Python, so movements without ranges are read in chunks, parsed
+with the same parse_certificate_ranges Share Movement uses, and written back
+with one bulk insert per chunk. Safe to re-run: movements that already have
+ranges are skipped.
+"""
+
+import frappe
+from frappe.utils import now
+
+from upande_sphynx.upande_sphynx.doctype.share_certificate_range.share_certificate_range import (
+	parse_certificate_ranges,
+)
+
+CHUNK_SIZE = 5000
+
+FIELDS = (
+	"name",
+	"creation",
+	"modified",
+	"owner",
+	"modified_by",
+	"docstatus",
+	"idx",
+	"parent",
+	"parenttype",
+	"parentfield",
+	"company",
+	"share_class",
+	"cert_start",
+	"cert_end",
+)
+
+
+def execute():
+	frappe.reload_doc("upande_sphynx", "doctype", "share_certificate_range")
+	frappe.reload_doc("upande_sphynx", "doctype", "share_movement")
+
+	timestamp = now()
+	last_name = ""
+	while True:
+		movements = frappe.db.sql(
+			"""
+			SELECT sm.name, sm.docstatus, sm.company, sm.share_class, sm.certificate_numbers
+			FROM `tabShare Movement` sm
+			WHERE sm.name > %s
+				AND IFNULL(sm.certificate_numbers, '') != ''
+				AND NOT EXISTS (
+					SELECT 1 FROM `tabShare Certificate Range` r
+					WHERE r.parent = sm.name AND r.parenttype = 'Share Movement'
+				)
+			ORDER BY sm.name
+			LIMIT %s
+			""",
+			(last_name, CHUNK_SIZE),
+			as_dict=True,
+		)
+		if not movements:
+			break
+
+		values = []
+		for sm in movements:
+			for idx, (cert_start, cert_end) in enumerate(parse_certificate_ranges(sm.certificate_numbers), start=1):
+				values.append((
+					f"{sm.name}-CR{idx}",
+					timestamp,
+					timestamp,
+					"Administrator",
+					"Administrator",
+					sm.docstatus,
+					idx,
+					sm.name,
+					"Share Movement",
+					"certificate_ranges",
+					sm.company,
+					sm.share_class,
+					cert_start,
+					cert_end,
+				))
+
+		frappe.db.bulk_insert("Share Certificate Range", FIELDS, values, ignore_duplicates=True)
+		frappe.db.commit()
+		last_name = movements[-1].name
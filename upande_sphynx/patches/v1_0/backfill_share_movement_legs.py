@@ -0,0 +1,51 @@
+"""Backfill Share Movement Leg rows for every already-submitted Share Movement.
+
+Legs are normally written by ShareMovement.on_submit; movements submitted
+before the Share Movement Leg doctype existed have none, so Shareholder
+Balance and get_share_register would silently show them as zero. Done as
+two set-based INSERT ... SELECTs (to-holder legs, then from-holder legs)
+and one window-function UPDATE for the running balances, rather than
+submitting/saving each movement again. Safe to re-run: existing legs are
+cleared and rebuilt from scratch.
+"""
+
+import frappe
+
+from upande_sphynx.upande_sphynx.doctype.share_movement_leg.share_movement_leg import (
+	update_running_balance,
+)
+
+INSERT_LEGS = """
+	INSERT INTO `tabShare Movement Leg` (
+		name, creation, modified, owner, modified_by, docstatus, idx,
+		share_movement, company, shareholder, share_class, transaction_date, movement_type,
+		qty, transaction_currency, total_amount, total_amount_base_currency
+	)
+	SELECT
+		CONCAT(sm.name, '-{suffix}'), NOW(6), NOW(6), 'Administrator', 'Administrator', 0, 0,
+		sm.name, sm.company, sm.{holder_field}, sm.share_class, sm.transaction_date, sm.movement_type,
+		{sign}sm.number_of_shares, sm.transaction_currency, sm.total_amount, sm.total_amount_base_currency
+	FROM `tabShare Movement` sm
+	WHERE sm.docstatus = 1
+	AND sm.{holder_field} IS NOT NULL AND sm.{holder_field} != ''
+	{extra_condition}
+"""
+
+
+def execute():
+	frappe.reload_doc("upande_sphynx", "doctype", "share_movement_leg")
+
+	frappe.db.delete("Share Movement Leg")
+
+	frappe.db.sql(INSERT_LEGS.format(suffix="IN", holder_field="to_shareholder", sign="", extra_condition=""))
+	frappe.db.sql(
+		INSERT_LEGS.format(
+			suffix="OUT",
+			holder_field="from_shareholder",
+			sign="-",
+			extra_condition="AND sm.from_shareholder != sm.to_shareholder",
+		)
+	)
+
+	update_running_balance()
+	frappe.db.commit()
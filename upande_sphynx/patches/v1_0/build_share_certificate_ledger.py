@@ -0,0 +1,34 @@
+"""Build the Share Certificate ledger from existing Share Movements.
+
+The ledger is normally kept current by ShareMovement.on_submit; movements
+submitted before it existed have no rows, so their holders' certificates
+would never be retired or split by later transfers. This replays every
+submitted movement once, in (company, share_class, transaction_date,
+creation) order, through the same apply_movement used on submit. Runs after
+backfill_share_certificate_ranges so each movement's ranges exist. Safe to
+re-run: the ledger is cleared and rebuilt.
+"""
+
+import frappe
+
+from upande_sphynx.upande_sphynx.doctype.share_certificate.share_certificate import apply_movement
+
+
+def execute():
+	frappe.reload_doc("upande_sphynx", "doctype", "share_certificate_series")
+	frappe.reload_doc("upande_sphynx", "doctype", "share_certificate")
+
+	frappe.db.delete("Share Certificate")
+
+	movements = frappe.get_all(
+		"Share Movement",
+		filters={"docstatus": 1},
+		pluck="name",
+		order_by="company, share_class, transaction_date, creation",
+	)
+	for i, name in enumerate(movements, start=1):
+		apply_movement(frappe.get_doc("Share Movement", name))
+		if i % 500 == 0:
+			frappe.db.commit()
+
+	frappe.db.commit()
@@ -0,0 +1,70 @@
+// List view action: post Journal Entries for many submitted Share Transfers
+// at once (share_transfer_controller.bulk_create_journal_entries). Small
+// selections come back in the response; larger ones run in the background
+// and report through the share_transfer_bulk_je realtime event.
+
+frappe.listview_settings['Share Transfer'] = {
+	onload: function (listview) {
+		listview.page.add_action_item(__('Create Journal Entries'), () => {
+			const docnames = listview.get_checked_items(true);
+			if (!docnames.length) {
+				frappe.msgprint(__('Select the Share Transfers to post.'));
+				return;
+			}
+
+			frappe.confirm(__('Create Journal Entries for {0} Share Transfers?', [docnames.length]), () => {
+				frappe.call({
+					method: 'upande_sphynx.share_transfer_customization.share_transfer_controller.bulk_create_journal_entries',
+					args: { docnames: docnames },
+					freeze: true,
+					freeze_message: __('Creating Journal Entries...'),
+					callback: function (r) {
+						if (r.exc || !r.message) return;
+						if (r.message.queued) {
+							frappe.show_alert({
+								message: __('Posting {0} Journal Entries in the background.', [r.message.count]),
+								indicator: 'blue',
+							});
+						} else {
+							show_bulk_je_results(r.message.results);
+							listview.refresh();
+						}
+					},
+				});
+			});
+		});
+
+		frappe.realtime.off('share_transfer_bulk_je_progress');
+		frappe.realtime.on('share_transfer_bulk_je_progress', (data) => {
+			frappe.show_progress(__('Creating Journal Entries'), data.done, data.total, null, true);
+		});
+
+		frappe.realtime.off('share_transfer_bulk_je');
+		frappe.realtime.on('share_transfer_bulk_je', (data) => {
+			frappe.hide_progress();
+			show_bulk_je_results(data.results);
+			listview.refresh();
+		});
+	},
+};
+
+function show_bulk_je_results(results) {
+	const failed = results.filter((row) => row.status !== 'success');
+	const rows = results.map((row) => `
+		<tr>
+			<td>${frappe.utils.get_form_link('Share Transfer', row.share_transfer, true)}</td>
+			<td>${row.status === 'success'
+				? frappe.utils.get_form_link('Journal Entry', row.journal_entry, true)
+				: `<span class="text-danger">${frappe.utils.escape_html(row.error || '')}</span>`}</td>
+		</tr>`).join('');
+
+	frappe.msgprint({
+		title: __('Journal Entries: {0} created, {1} failed', [results.length - failed.length, failed.length]),
+		indicator: failed.length ? 'orange' : 'green',
+		message: `<table class="table table-bordered table-sm">
+			<thead><tr><th>${__('Share Transfer')}</th><th>${__('Journal Entry / Error')}</th></tr></thead>
+			<tbody>${rows}</tbody>
+		</table>`,
+		wide: true,
+	});
+}
@@ -30,5 +30,80 @@ frappe.ui.form.on('Shareholder', {
 			};
 			frappe.set_route('query-report', 'Share Transactions Report');
 		}, __('View'));
+
+		frm.add_custom_button(__('Holdings Chart'), function () {
+			show_holdings_chart(frm);
+		}, __('View'));
 	},
 });
+
+function show_holdings_chart(frm) {
+	const dialog = new frappe.ui.Dialog({
+		title: __('Holdings over time: {0}', [frm.doc.title || frm.doc.name]),
+		size: 'extra-large',
+		fields: [
+			{
+				fieldname: 'frequency',
+				fieldtype: 'Select',
+				label: __('Frequency'),
+				options: [
+					{ value: 'month', label: __('Monthly') },
+					{ value: 'quarter', label: __('Quarterly') },
+					{ value: 'day', label: __('Daily') },
+				],
+				default: 'month',
+				change: () => render(),
+			},
+			{ fieldtype: 'Column Break' },
+			{
+				fieldname: 'from_date',
+				fieldtype: 'Date',
+				label: __('From Date'),
+				default: frappe.datetime.add_months(frappe.datetime.get_today(), -36),
+				change: () => render(),
+			},
+			{ fieldtype: 'Section Break' },
+			{ fieldname: 'chart', fieldtype: 'HTML' },
+		],
+	});
+
+	function render() {
+		const values = dialog.get_values();
+		const wrapper = dialog.fields_dict.chart.$wrapper;
+
+		frappe.call({
+			method: 'upande_sphynx.api.capital_management.get_holdings_history',
+			args: {
+				company: frm.doc.company,
+				shareholders: frm.doc.name,
+				from_date: values.from_date,
+				frequency: values.frequency,
+			},
+			callback: function (r) {
+				const history = r.message;
+				wrapper.empty();
+				if (!history || !history.series.length) {
+					wrapper.html(`<p class="text-muted">${__('No share movements in this period.')}</p>`);
+					return;
+				}
+
+				new frappe.Chart(wrapper[0], {
+					type: 'line',
+					height: 300,
+					data: {
+						labels: history.periods.map((period) => frappe.datetime.str_to_user(period)),
+						datasets: history.series.map((series) => ({
+							name: series.share_class,
+							values: series.holding,
+						})),
+					},
+					lineOptions: { regionFill: 1, hideDots: history.periods.length > 60 ? 1 : 0 },
+					axisOptions: { xIsSeries: 1 },
+				});
+			},
+		});
+	}
+
+	dialog.show();
+	render();
+}
@@ -0,0 +1,101 @@
+"""Versioned result cache for the capital reports.
+
+Shareholder Balance, Share Transactions Report, Share Movement Report and
+Accounts Payable Aging used to recompute everything on every refresh, even
+though the documents they read change far less often than they are viewed.
+Each now wraps its work in `get_cached_report`, which keys the result on:
+
+- the report name,
+- the normalized filters (after the report has applied its own defaults),
+- the user's language (column labels are translated),
+- a per-company data-version stamp.
+
+The stamp is replaced by `bump_data_version`, hooked in hooks.py on every
+write to the doctypes these reports read. A bump makes every older key
+unreachable, so invalidation is exact and stale entries just expire.
+Reports run without a Company filter key on the global stamp, which every
+bump also replaces.
+
+Set `capital_report_cache_disabled: 1` in site config to bypass the cache,
+and `capital_report_cache_ttl` (seconds) to change how long entries live.
+"""
+
+import hashlib
+import json
+
+import frappe
+
+VERSION_KEY = "capital_report_data_version"
+GLOBAL_VERSION = "__all__"
+RESULT_KEY = "capital_report::{report}::{version}::{filters_hash}"
+DEFAULT_TTL = 6 * 60 * 60
+
+
+def get_data_version(company=None):
+	"""Current stamp for a company (or the global one). Missing stamps are
+	created on read so a cold cache and a flushed Redis behave the same."""
+	field = company or GLOBAL_VERSION
+	version = frappe.cache().hget(VERSION_KEY, field)
+	if not version:
+		version = frappe.generate_hash(length=12)
+		frappe.cache().hset(VERSION_KEY, field, version)
+	return version
+
+
+def bump_data_version(doc=None, method=None):
+	"""doc_events handler: replace the stamp of the document's company and the
+	global stamp once the current transaction commits.
+
+	Bumping after commit (not immediately) matters: a report run between the
+	write and the commit still sees the old rows, and would otherwise cache
+	them under the new stamp."""
+	company = doc.get("company") if doc else None
+	frappe.db.after_commit.add(lambda: _bump(company))
+
+
+def _bump(company=None):
+	for field in {company, GLOBAL_VERSION} - {None}:
+		frappe.cache().hset(VERSION_KEY, field, frappe.generate_hash(length=12))
+
+
+def get_cached_report(report_name, filters, generator):
+	"""Return generator()'s result for these filters, from cache if the data
+	it was computed from has not changed since.
+
+	`generator` must depend only on `filters` and the database — anything
+	user-specific beyond the language belongs in the filters."""
+	if frappe.conf.get("capital_report_cache_disabled"):
+		return generator()
+
+	key = RESULT_KEY.format(
+		report=report_name,
+		version=get_data_version(filters.get("company")),
+		filters_hash=get_filters_hash(filters),
+	)
+
+	result = frappe.cache().get_value(key)
+	if result is not None:
+		return result
+
+	result = generator()
+	frappe.cache().set_value(
+		key, result, expires_in_sec=frappe.conf.get("capital_report_cache_ttl") or DEFAULT_TTL
+	)
+	return result
+
+
+def get_filters_hash(filters):
+	"""Stable hash of a filters dict: empty values dropped, lists sorted,
+	dates and other values stringified, plus the current language."""
+	normalized = {}
+	for key, value in (filters or {}).items():
+		if value in (None, "", [], ()):
+			continue
+		if isinstance(value, list | tuple | set):
+			value = sorted(str(v) for v in value)
+		else:
+			value = str(value)
+		normalized[key] = value
+
+	payload = json.dumps({"filters": normalized, "lang": frappe.local.lang}, sort_keys=True)
+	return hashlib.md5(payload.encode()).hexdigest()
@@ -3,7 +3,10 @@
 
 import frappe
 from frappe import _
-from frappe.utils import flt, getdate, nowdate
+from frappe.utils import cint, create_batch, cstr, flt, getdate, now, nowdate
+
+from upande_sphynx.account_cache import get_account_meta_map
+from upande_sphynx.instrumentation import instrumented
 
 # ----------------------------------------------------------------------
 # 1. Validation logic (runs on validate hook)
@@ -61,11 +64,14 @@ def validate_accounts(doc, method=None):
     
     if not doc.get('transaction_currency'):
         frappe.throw(_("Transaction Currency is required"))
-    
+
+    # Both accounts in one lookup; validate and before_submit in the same
+    # save are served from the request memo the second time.
+    accounts = get_account_meta_map([doc.get('equity_or_liability_account'), doc.get('asset_account')])
+
     # Validate Share Capital Account
     if doc.get('equity_or_liability_account'):
-        account = frappe.db.get_value('Account', doc.equity_or_liability_account, 
-                                       ['is_group', 'company', 'account_currency', 'root_type'], as_dict=1)
+        account = accounts.get(doc.equity_or_liability_account)
         
         if not account:
             frappe.throw(_("Share Capital Account {0} does not exist").format(doc.equity_or_liability_account))
@@ -85,8 +91,7 @@ def validate_accounts(doc, method=None):
     
     # Validate Receiving Account
     if doc.get('asset_account'):
-        account = frappe.db.get_value('Account', doc.asset_account, 
-                                       ['is_group', 'company', 'account_currency', 'root_type'], as_dict=1)
+        account = accounts.get(doc.asset_account)
         
         if not account:
             frappe.throw(_("Receiving Account {0} does not exist").format(doc.asset_account))
@@ -109,6 +114,7 @@ def validate_accounts(doc, method=None):
 # 2. Custom Journal Entry creation (whitelisted method)
 # ----------------------------------------------------------------------
 @frappe.whitelist()
+@instrumented
 def create_custom_journal_entry(docname):
     """
     Create multi-currency Journal Entry for a submitted Share Transfer
@@ -127,7 +133,53 @@ def create_custom_journal_entry(docname):
         if je_exists:
             frappe.throw(_("Journal Entry {0} already exists for this Share Transfer").format(
                 doc.custom_journal_entry))
-    
+
+    context = get_journal_entry_context([doc])
+    validate_journal_entry_inputs(doc, context)
+    je = build_journal_entry(doc, context)
+
+    # --- Save and submit JE ---
+    try:
+        je.flags.ignore_permissions = True
+        je.insert()
+        je.submit()
+
+        # --- Link JE to Share Transfer ---
+        frappe.db.set_value("Share Transfer", doc.name, "custom_journal_entry", je.name)
+        frappe.db.commit()
+
+        return {
+            'status': 'success',
+            'journal_entry': je.name,
+            'message': _('Journal Entry {0} created successfully').format(je.name)
+        }
+
+    except Exception as e:
+        frappe.log_error(title='Share Transfer JE Creation Failed', message=str(e))
+        frappe.throw(_('Failed to create Journal Entry: {0}').format(str(e)))
+
+
+def get_journal_entry_context(transfers):
+    """Everything the Journal Entry builder looks up outside the transfer
+    itself, fetched once for a whole batch: company currency and default
+    cost center per company, and the metadata of every account used."""
+    companies = {t.company for t in transfers if t.get('company')}
+    company_info = {
+        c.name: c for c in frappe.get_all(
+            'Company',
+            filters={'name': ('in', list(companies))},
+            fields=['name', 'default_currency', 'cost_center'],
+        )
+    } if companies else {}
+
+    accounts = get_account_meta_map(
+        [t.get('asset_account') for t in transfers] + [t.get('equity_or_liability_account') for t in transfers]
+    )
+    return frappe._dict(companies=company_info, accounts=accounts)
+
+
+def validate_journal_entry_inputs(doc, context):
+    """Checks that have to pass before a Journal Entry is built for `doc`."""
     # Validate required fields
     if not doc.get('equity_or_liability_account'):
         frappe.throw(_("Share Capital Account is required"))
@@ -140,15 +192,25 @@ def create_custom_journal_entry(docname):
     
     if not doc.get('transaction_currency'):
         frappe.throw(_("Transaction Currency is required"))
-    
-    # Get company currency
-    company_currency = frappe.get_cached_value('Company', doc.company, 'default_currency')
-    exchange_rate = flt(doc.exchange_rate) if doc.exchange_rate else 1.0
-    
+
+    for account in (doc.equity_or_liability_account, doc.asset_account):
+        if account not in context.accounts:
+            frappe.throw(_("Account {0} does not exist").format(account))
+        if context.accounts[account].company != doc.company:
+            frappe.throw(_("Account {0} does not belong to company {1}").format(account, doc.company))
+
     # Validate exchange rate
+    company_currency = context.companies[doc.company].default_currency
+    exchange_rate = flt(doc.exchange_rate) if doc.exchange_rate else 1.0
     if doc.transaction_currency != company_currency and exchange_rate == 0:
         frappe.throw(_("Exchange Rate cannot be zero when currencies differ"))
-    
+
+
+def build_journal_entry(doc, context):
+    """Unsaved multi-currency Journal Entry for a submitted Share Transfer."""
+    company_currency = context.companies[doc.company].default_currency
+    exchange_rate = flt(doc.exchange_rate) if doc.exchange_rate else 1.0
+
     # --- Create Journal Entry ---
     je = frappe.new_doc("Journal Entry")
     je.voucher_type = "Journal Entry"
@@ -174,7 +236,7 @@ def create_custom_journal_entry(docname):
     je.multi_currency = 1 if doc.transaction_currency != company_currency else 0
     
     # Get cost center
-    cost_center = doc.get('cost_center') or frappe.get_cached_value('Company', doc.company, 'cost_center')
+    cost_center = doc.get('cost_center') or context.companies[doc.company].cost_center
     
     # --- Line 1: Debit Receiving Account (Asset) ---
     # New shareholder pays money to company. Party is the incoming shareholder,
@@ -210,28 +272,11 @@ def create_custom_journal_entry(docname):
         "user_remark": _("Share capital for {0} shares").format(doc.no_of_shares)
     })
 
-    # --- Save and submit JE ---
-    try:
-        je.flags.ignore_permissions = True
-        je.insert()
-        je.submit()
-
-        # --- Link JE to Share Transfer ---
-        frappe.db.set_value("Share Transfer", doc.name, "custom_journal_entry", je.name)
-        frappe.db.commit()
-
-        return {
-            'status': 'success',
-            'journal_entry': je.name,
-            'message': _('Journal Entry {0} created successfully').format(je.name)
-        }
-
-    except Exception as e:
-        frappe.log_error(title='Share Transfer JE Creation Failed', message=str(e))
-        frappe.throw(_('Failed to create Journal Entry: {0}').format(str(e)))
+    return je
 
 
 @frappe.whitelist()
+@instrumented
 def cancel_custom_journal_entry(docname):
     """
     Cancel the journal entry linked to a Share Transfer
@@ -260,3 +305,139 @@ def cancel_custom_journal_entry(docname):
         frappe.log_error(title='Share Transfer JE Cancellation Failed', message=str(e))
         frappe.throw(_('Failed to cancel Journal Entry: {0}').format(str(e)))
 
+
+# ----------------------------------------------------------------------
+# 3. Bulk Journal Entry creation (list view action / migrations)
+# ----------------------------------------------------------------------
+BULK_JE_CHUNK_SIZE = 100
+# Larger selections are posted by a background job instead of the request.
+BULK_JE_INLINE_LIMIT = 50
+
+
+@frappe.whitelist()
+@instrumented
+def bulk_create_journal_entries(docnames=None, filters=None, chunk_size=BULK_JE_CHUNK_SIZE):
+    """
+    Create Journal Entries for many submitted Share Transfers at once.
+
+    Pass either `docnames` (a list) or `filters` for Share Transfer; with
+    filters, only submitted transfers without a linked Journal Entry are
+    picked. Small selections are posted inline and the per-document results
+    are returned. Larger ones run on the long queue and the results are
+    published to the caller as the `share_transfer_bulk_je` realtime event.
+    """
+    frappe.has_permission("Journal Entry", "create", throw=True)
+
+    if docnames:
+        docnames = frappe.parse_json(docnames)
+    else:
+        filters = frappe.parse_json(filters) if filters else {}
+        filters.update({'docstatus': 1, 'custom_journal_entry': ('is', 'not set')})
+        docnames = frappe.get_all("Share Transfer", filters=filters, order_by="date, name", pluck="name")
+
+    if not docnames:
+        frappe.throw(_("No Share Transfers selected"))
+
+    if len(docnames) <= BULK_JE_INLINE_LIMIT:
+        return {'queued': False, 'results': post_journal_entries(docnames, chunk_size)}
+
+    frappe.enqueue(
+        post_journal_entries,
+        queue="long",
+        timeout=3600,
+        docnames=docnames,
+        chunk_size=chunk_size,
+        user=frappe.session.user,
+        enqueue_after_commit=True,
+    )
+    return {'queued': True, 'count': len(docnames)}
+
+
+def post_journal_entries(docnames, chunk_size=BULK_JE_CHUNK_SIZE, user=None):
+    """
+    Post a Journal Entry for each Share Transfer in `docnames`.
+
+    Each chunk is one transaction: its transfers and accounts are fetched
+    up front, every Journal Entry is posted under its own savepoint (so one
+    bad transfer only rolls back itself), the successful ones are linked
+    back with a single UPDATE and the chunk is committed. Returns one
+    {share_transfer, status, journal_entry | error} row per transfer.
+    """
+    results = []
+
+    for chunk in create_batch(docnames, cint(chunk_size) or BULK_JE_CHUNK_SIZE):
+        transfers = {
+            t.name: t for t in frappe.get_all(
+                "Share Transfer", filters={'name': ('in', list(chunk))}, fields=['*']
+            )
+        }
+        context = get_journal_entry_context(transfers.values())
+        existing_entries = set(frappe.get_all(
+            'Journal Entry',
+            filters={'name': ('in', [t.custom_journal_entry for t in transfers.values() if t.custom_journal_entry])},
+            pluck='name',
+        ))
+
+        linked = {}
+        for name in chunk:
+            doc = transfers.get(name)
+            frappe.db.savepoint("share_transfer_je")
+            try:
+                if not doc:
+                    frappe.throw(_("Share Transfer {0} does not exist").format(name))
+                if doc.docstatus != 1:
+                    frappe.throw(_("Please submit the Share Transfer before creating a Journal Entry."))
+                if doc.custom_journal_entry in existing_entries:
+                    frappe.throw(_("Journal Entry {0} already exists for this Share Transfer").format(
+                        doc.custom_journal_entry))
+
+                validate_journal_entry_inputs(doc, context)
+                je = build_journal_entry(doc, context)
+                je.flags.ignore_permissions = True
+                je.insert()
+                je.submit()
+
+                linked[name] = je.name
+                results.append({'share_transfer': name, 'status': 'success', 'journal_entry': je.name})
+
+            except Exception as e:
+                frappe.db.rollback(save_point="share_transfer_je")
+                if not isinstance(e, frappe.ValidationError):
+                    frappe.log_error(title='Share Transfer JE Creation Failed', message=frappe.get_traceback())
+                results.append({'share_transfer': name, 'status': 'failed', 'error': cstr(e)})
+
+        link_journal_entries(linked)
+        frappe.db.commit()
+
+        if user:
+            frappe.publish_realtime(
+                'share_transfer_bulk_je_progress',
+                {'done': len(results), 'total': len(docnames)},
+                user=user,
+            )
+
+    # The failures are reported in the results; don't also pop one error
+    # dialog per failed transfer.
+    frappe.clear_messages()
+
+    if user:
+        frappe.publish_realtime('share_transfer_bulk_je', {'results': results}, user=user)
+
+    return results
+
+
+def link_journal_entries(linked):
+    """Set custom_journal_entry on many Share Transfers in one UPDATE."""
+    if not linked:
+        return
+
+    cases = " ".join(["WHEN %s THEN %s"] * len(linked))
+    placeholders = ", ".join(["%s"] * len(linked))
+    values = [value for pair in linked.items() for value in pair]
+
+    frappe.db.sql(f"""
+        UPDATE `tabShare Transfer`
+        SET custom_journal_entry = CASE name {cases} END,
+            modified = %s
+        WHERE name IN ({placeholders})
+    """, [*values, now(), *linked])
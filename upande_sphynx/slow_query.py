@@ -0,0 +1,152 @@
+"""Slow-query capture for the app's own SQL.
+
+`slow_query.sql` is a drop-in for `frappe.db.sql` used by the app's heavy
+raw queries (the share register, the balance and transactions reports, the
+AP aging aggregation, certificate lookups). It is off unless the
+`capital_slow_query_ms` site config is set; then any of those queries that
+takes at least that many milliseconds is recorded in the Capital Slow Query
+log.
+
+The request itself only times the query and, when it is slow, computes its
+fingerprint — the SQL with every literal and placeholder replaced by `?` and
+IN lists collapsed — and queues a short job. The job runs EXPLAIN with the
+same parameters and upserts the log row for that fingerprint: occurrence
+count, total / max / average duration, first and last seen, and the
+parameter shape and plan of the slowest run. Parameter values themselves
+are never stored.
+"""
+
+import hashlib
+import re
+import sys
+import time
+
+import frappe
+from frappe.utils import cint, flt, now_datetime
+
+PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w`.])-?\d+(?:\.\d+)?\b")
+IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+
+def sql(query, values=(), *args, **kwargs):
+	threshold = cint(frappe.conf.get("capital_slow_query_ms"))
+	if not threshold:
+		return frappe.db.sql(query, values, *args, **kwargs)
+
+	start = time.perf_counter()
+	result = frappe.db.sql(query, values, *args, **kwargs)
+	duration_ms = (time.perf_counter() - start) * 1000
+
+	if duration_ms >= threshold:
+		caller = sys._getframe(1)
+		capture(query, values, duration_ms, f"{caller.f_globals.get('__name__')}.{caller.f_code.co_name}")
+	return result
+
+
+def normalize(query):
+	query = PLACEHOLDER.sub("?", query)
+	query = STRING_LITERAL.sub("?", query)
+	query = NUMBER_LITERAL.sub("?", query)
+	query = IN_LIST.sub("IN (...)", query)
+	return WHITESPACE.sub(" ", query).strip()
+
+
+def get_fingerprint(normalized):
+	return hashlib.md5(normalized.encode()).hexdigest()
+
+
+def get_parameter_shape(values):
+	"""Types (and list lengths) of the parameters, without their values."""
+	def shape(value):
+		if isinstance(value, list | tuple | set):
+			return f"list[{len(value)}]"
+		return type(value).__name__
+
+	if isinstance(values, dict):
+		return {key: shape(value) for key, value in values.items()}
+	if isinstance(values, list | tuple):
+		return [shape(value) for value in values]
+	return shape(values)
+
+
+def capture(query, values, duration_ms, source):
+	"""Queue the log write; a failure here must never fail the query."""
+	try:
+		normalized = normalize(query)
+		frappe.enqueue(
+			record_slow_query,
+			queue="short",
+			fingerprint=get_fingerprint(normalized),
+			normalized_sql=normalized,
+			query=query,
+			values=values,
+			duration_ms=round(duration_ms, 2),
+			source=source,
+			seen_at=now_datetime(),
+		)
+	except Exception:
+		pass
+
+
+def record_slow_query(fingerprint, normalized_sql, query, values, duration_ms, source, seen_at):
+	"""Background job: upsert the fingerprint's Capital Slow Query row, with
+	a fresh EXPLAIN when this run is its slowest yet."""
+	previous_max = frappe.db.get_value("Capital Slow Query", fingerprint, "max_duration_ms", for_update=True)
+	is_worst = previous_max is None or duration_ms > flt(previous_max)
+	worst = {}
+	if is_worst:
+		worst = {
+			"max_duration_ms": duration_ms,
+			"worst_at": seen_at,
+			"source": source,
+			"parameter_shape": frappe.as_json(get_parameter_shape(values)),
+			"explain_plan": frappe.as_json(explain(query, values)),
+		}
+
+	if previous_max is None:
+		try:
+			frappe.get_doc({
+				"doctype": "Capital Slow Query",
+				"fingerprint": fingerprint,
+				"normalized_sql": normalized_sql,
+				"occurrences": 1,
+				"total_duration_ms": duration_ms,
+				"avg_duration_ms": duration_ms,
+				"first_seen": seen_at,
+				"last_seen": seen_at,
+				**worst,
+			}).insert(ignore_permissions=True)
+			frappe.db.commit()
+			return
+		except frappe.DuplicateEntryError:
+			# Another worker logged the same fingerprint first.
+			frappe.db.rollback()
+
+	# avg first: MariaDB applies SET assignments left to right, so it must
+	# read occurrences and total_duration_ms before they are incremented.
+	frappe.db.sql(
+		"""
+		UPDATE `tabCapital Slow Query`
+		SET avg_duration_ms = (total_duration_ms + %(duration_ms)s) / (occurrences + 1),
+			occurrences = occurrences + 1,
+			total_duration_ms = total_duration_ms + %(duration_ms)s,
+			last_seen = GREATEST(last_seen, %(seen_at)s)
+		WHERE name = %(fingerprint)s
+		""",
+		{"duration_ms": duration_ms, "seen_at": seen_at, "fingerprint": fingerprint},
+	)
+	if worst:
+		frappe.db.set_value("Capital Slow Query", fingerprint, worst, update_modified=False)
+	frappe.db.commit()
+
+
+def explain(query, values):
+	if not query.lstrip().upper().startswith(("SELECT", "WITH")):
+		return None
+	try:
+		return frappe.db.sql("EXPLAIN " + query, values, as_dict=True)
+	except Exception as e:
+		return {"error": str(e)}
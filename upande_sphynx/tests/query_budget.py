@@ -0,0 +1,67 @@
+# Copyright (c) 2026, Jeniffer and Contributors
+# See license.txt
+#
+# SQL query budgets for tests. A test wraps the call it measures in
+# `self.assertQueryBudget()`; every frappe.db.sql statement issued inside
+# is counted and compared against the test's entry in query_budgets.json.
+# Going over fails the test, so a change that adds a query per row shows up
+# at review time as a failing test (or, once re-recorded, as a budget bump
+# in the JSON diff).
+#
+# To record or update budgets after an intended change:
+#
+#	UPDATE_QUERY_BUDGETS=1 bench --site <site> run-tests --module upande_sphynx.tests.test_query_budgets
+#
+# A test with no recorded budget fails until one is recorded the same way.
+
+import json
+import os
+from contextlib import contextmanager
+
+from upande_sphynx.benchmarks.run import count_queries
+
+BUDGETS_FILE = os.path.join(os.path.dirname(__file__), "query_budgets.json")
+UPDATE_ENV = "UPDATE_QUERY_BUDGETS"
+
+
+class QueryBudgetMixin:
+	"""Mix into a FrappeTestCase."""
+
+	@contextmanager
+	def assertQueryBudget(self, scenario=None):
+		key = scenario or self.id().rsplit(".", 2)[-2] + "." + self._testMethodName
+		with count_queries() as counter:
+			yield counter
+
+		budgets = load_budgets()
+		budget = budgets.get(key)
+		if os.environ.get(UPDATE_ENV):
+			if budget != counter["queries"]:
+				budgets[key] = counter["queries"]
+				save_budgets(budgets)
+			return
+
+		if budget is None:
+			self.fail(
+				f"{key} has no query budget in {os.path.basename(BUDGETS_FILE)} "
+				f"({counter['queries']} SQL queries issued). Record one with {UPDATE_ENV}=1."
+			)
+
+		self.assertLessEqual(
+			counter["queries"],
+			budget,
+			f"{key} issued {counter['queries']} SQL queries, over its budget of {budget}. "
+			f"If the extra queries are intended, re-record with {UPDATE_ENV}=1.\n\n"
+			+ "\n".join(counter["statements"]),
+		)
+
+
+def load_budgets():
+	with open(BUDGETS_FILE) as f:
+		return json.load(f)
+
+
+def save_budgets(budgets):
+	with open(BUDGETS_FILE, "w") as f:
+		json.dump(budgets, f, indent=1, sort_keys=True)
+		f.write("\n")
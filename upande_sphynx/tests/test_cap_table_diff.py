@@ -0,0 +1,83 @@
+# Copyright (c) 2026, Jeniffer and Contributors
+# See license.txt
+#
+# get_cap_table_diff on a hand-built set of Share Movement Legs, including
+# the negative position issuances leave on the company's own shareholder.
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, nowdate
+
+from upande_sphynx.api.capital_management import get_cap_table_diff
+from upande_sphynx.benchmarks.run import benchmark_conf
+
+TEST_COMPANY = "_Test Company"
+
+LEG_FIELDS = (
+	"name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+	"share_movement", "company", "shareholder", "share_class", "transaction_date", "movement_type", "qty",
+	"total_amount_base_currency",
+)
+
+
+class TestCapTableDiff(FrappeTestCase):
+	def setUp(self):
+		self.share_class = f"_Test Class {frappe.generate_hash(length=6)}"
+		self.from_date = add_days(nowdate(), -30)
+		before, during = add_days(self.from_date, -10), add_days(self.from_date, 10)
+
+		self.make_legs([
+			# Issued from the company's shareholder record before from_date ...
+			("ISSUE-1", "_Test Treasury", -1000, before, "Equity Capital Injection"),
+			("ISSUE-1", "_Test Holder A", 600, before, "Equity Capital Injection"),
+			("ISSUE-1", "_Test Holder B", 400, before, "Equity Capital Injection"),
+			# ... then a new holder comes in and A sells out to B in the window.
+			("ISSUE-2", "_Test Treasury", -1000, during, "Equity Capital Injection"),
+			("ISSUE-2", "_Test Holder C", 1000, during, "Equity Capital Injection"),
+			("SALE-1", "_Test Holder A", -600, during, "Share Purchase"),
+			("SALE-1", "_Test Holder B", 600, during, "Share Purchase"),
+		])
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def make_legs(self, legs):
+		timestamp = frappe.utils.now()
+		frappe.db.bulk_insert(
+			"Share Movement Leg",
+			LEG_FIELDS,
+			[
+				(
+					frappe.generate_hash(length=12), timestamp, timestamp, "Administrator", "Administrator", 0, 0,
+					f"{self.share_class}-{movement}", TEST_COMPANY, shareholder, self.share_class, date,
+					movement_type, qty, qty * 2 if qty > 0 else 0,
+				)
+				for movement, shareholder, qty, date, movement_type in legs
+			],
+		)
+
+	def test_ownership_ignores_company_position(self):
+		with benchmark_conf():
+			diff = get_cap_table_diff(TEST_COMPANY, self.from_date, nowdate(), self.share_class)
+
+		self.assertEqual(diff["opening_shares"], 1000)
+		self.assertEqual(diff["closing_shares"], 2000)
+
+		rows = {row.shareholder: row for row in diff["rows"]}
+		self.assertNotIn("_Test Treasury", rows)
+		self.assertEqual(set(rows), {"_Test Holder A", "_Test Holder B", "_Test Holder C"})
+
+		expected = {
+			# holder: (status, opening %, closing %)
+			"_Test Holder A": ("Exited", 60, 0),
+			"_Test Holder B": ("Changed", 40, 50),
+			"_Test Holder C": ("New", 0, 50),
+		}
+		for holder, (status, opening, closing) in expected.items():
+			row = rows[holder]
+			self.assertEqual(row.status, status, holder)
+			self.assertAlmostEqual(row.opening_ownership, opening, places=6, msg=holder)
+			self.assertAlmostEqual(row.closing_ownership, closing, places=6, msg=holder)
+			self.assertAlmostEqual(row.change_ownership, closing - opening, places=6, msg=holder)
+
+		self.assertEqual(rows["_Test Holder C"].new_investment, 2000)
@@ -0,0 +1,170 @@
+# Copyright (c) 2026, Jeniffer and Contributors
+# See license.txt
+#
+# Query budgets for the read-side whitelisted APIs and every capital report,
+# run against a small synthetic cap table (upande_sphynx.benchmarks.generate)
+# so that a query issued per row multiplies the count and breaks the budget.
+# Each scenario is called once to warm metadata and document caches, then
+# measured; the report cache and background runs are switched off.
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_months, nowdate
+
+from upande_sphynx.benchmarks.generate import PREFIX, generate, purge
+from upande_sphynx.benchmarks.run import benchmark_conf, call
+from upande_sphynx.tests.query_budget import QueryBudgetMixin
+
+TEST_COMPANY = "_Test Company"
+
+# Enough rows that per-row queries dominate the count, small enough to
+# generate in a few seconds.
+DATASET = {
+	"shareholders": 20,
+	"share_classes": 2,
+	"movements": 400,
+	"clns": 5,
+	"accrual_months": 6,
+	"suppliers": 5,
+	"invoices": 100,
+}
+
+
+class TestQueryBudgets(QueryBudgetMixin, FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		generate(TEST_COMPANY, size="small", seed=7, **DATASET)
+
+		cls.today = nowdate()
+		cls.from_date = add_months(cls.today, -36)
+		cls.shareholder = frappe.db.get_value("Shareholder", {"name": ("like", f"{PREFIX}SH-0%")})
+		cls.cln = frappe.db.get_value("Convertible Loan Note", {"name": ("like", f"{PREFIX}CLN-%")})
+		cls.share_class = f"{PREFIX}Class A"
+
+	@classmethod
+	def tearDownClass(cls):
+		purge(TEST_COMPANY)
+		super().tearDownClass()
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def assertWithinBudget(self, kind, target, **kwargs):
+		with benchmark_conf():
+			call(kind, target, kwargs)
+			with self.assertQueryBudget():
+				call(kind, target, kwargs)
+
+	# Reports
+
+	def test_shareholder_balance(self):
+		self.assertWithinBudget("report", "Shareholder Balance", company=TEST_COMPANY, as_on_date=self.today)
+
+	def test_share_transactions_report(self):
+		self.assertWithinBudget(
+			"report", "Share Transactions Report",
+			company=TEST_COMPANY, from_date=self.from_date, to_date=self.today,
+		)
+
+	def test_share_transactions_report_one_holder(self):
+		self.assertWithinBudget(
+			"report", "Share Transactions Report",
+			company=TEST_COMPANY, shareholder=self.shareholder, to_date=self.today,
+		)
+
+	def test_share_movement_report(self):
+		self.assertWithinBudget("report", "Share Movement Report")
+
+	def test_accounts_payable_aging(self):
+		self.assertWithinBudget(
+			"report", "Accounts Payable Aging",
+			company=TEST_COMPANY, from_date=self.from_date, to_date=self.today,
+		)
+
+	def test_accounts_payable_aging_supplier_summary(self):
+		self.assertWithinBudget(
+			"report", "Accounts Payable Aging",
+			company=TEST_COMPANY, from_date=self.from_date, to_date=self.today, report_view="Supplier Summary",
+		)
+
+	def test_ap_aging_trend(self):
+		self.assertWithinBudget(
+			"report", "AP Aging Trend", company=TEST_COMPANY, from_date=self.from_date, to_date=self.today
+		)
+
+	def test_cap_table_diff(self):
+		self.assertWithinBudget(
+			"report", "Cap Table Diff",
+			company=TEST_COMPANY, from_date=add_months(self.today, -12), to_date=self.today,
+		)
+
+	def test_capital_endpoint_latency(self):
+		self.assertWithinBudget("report", "Capital Endpoint Latency")
+
+	def test_capital_integrity_check(self):
+		self.assertWithinBudget("report", "Capital Integrity Check", company=TEST_COMPANY)
+
+	def test_capital_je_outbox(self):
+		self.assertWithinBudget("report", "Capital JE Outbox", company=TEST_COMPANY)
+
+	# Whitelisted APIs
+
+	def test_get_share_register(self):
+		self.assertWithinBudget(
+			"api", "upande_sphynx.api.capital_management.get_share_register",
+			company=TEST_COMPANY, as_on_date=self.today,
+		)
+
+	def test_get_holdings_history(self):
+		self.assertWithinBudget(
+			"api", "upande_sphynx.api.capital_management.get_holdings_history",
+			company=TEST_COMPANY, from_date=self.from_date, to_date=self.today, frequency="month",
+		)
+
+	def test_get_cln_outstanding_balance(self):
+		self.assertWithinBudget(
+			"api", "upande_sphynx.api.capital_management.get_cln_outstanding_balance", cln_name=self.cln
+		)
+
+	def test_get_certificate_holder(self):
+		self.assertWithinBudget(
+			"api", "upande_sphynx.api.capital_management.get_certificate_holder",
+			company=TEST_COMPANY, share_class=self.share_class, certificate=f"CERT-{self.share_class}-00001",
+		)
+
+	def test_get_live_certificates(self):
+		self.assertWithinBudget(
+			"api", "upande_sphynx.api.capital_management.get_live_certificates",
+			company=TEST_COMPANY, share_class=self.share_class,
+		)
+
+	def test_recompute_shareholder_totals(self):
+		self.assertWithinBudget(
+			"api", "upande_sphynx.api.capital_management.recompute_shareholder_totals",
+			shareholder_name=self.shareholder,
+		)
+
+	def test_get_exit_waterfall(self):
+		self.assertWithinBudget(
+			"api", "upande_sphynx.modeling.waterfall.get_exit_waterfall",
+			company=TEST_COMPANY, max_exit=10_000_000, steps=200, by_holder=1,
+		)
+
+	def test_model_dilution(self):
+		round_steps = [
+			{"type": "pool", "share_class": self.share_class, "target_percentage": 10},
+			{"type": "issuance", "investor": "New Investor", "share_class": self.share_class,
+				"amount": 1_000_000, "pre_money_valuation": 4_000_000},
+		]
+		self.assertWithinBudget(
+			"api", "upande_sphynx.modeling.dilution.model_dilution",
+			company=TEST_COMPANY, scenarios=[{"name": f"Round {i}", "steps": round_steps} for i in range(20)],
+		)
+
+	def test_get_outbox_metrics(self):
+		self.assertWithinBudget(
+			"api",
+			"upande_sphynx.upande_sphynx.doctype.capital_je_posting.capital_je_posting.get_outbox_metrics",
+			company=TEST_COMPANY,
+		)
@@ -0,0 +1,19 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+#
+# Working state for the daily AP aging snapshot: one row per Purchase Invoice
+# that still has a payable outstanding, named after the invoice. Maintained
+# incrementally by upande_sphynx.upande_sphynx.doctype.ap_aging_snapshot.
+# ap_aging_snapshot.take_daily_snapshots — only invoices whose Payment Ledger
+# rows changed since the previous run are re-summed.
+
+import frappe
+from frappe.model.document import Document
+
+
+class APAgingOpenInvoice(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("AP Aging Open Invoice", ["company", "supplier"])
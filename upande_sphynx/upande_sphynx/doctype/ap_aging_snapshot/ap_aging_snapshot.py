@@ -0,0 +1,183 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+#
+# Compact daily aging of payables: one row per (company, snapshot_date,
+# supplier, currency, aging bucket). Written by take_daily_snapshots (daily
+# scheduler job) and read by the AP Aging Trend report, so plotting aging
+# over time never re-derives historical outstanding from the ledger.
+#
+# The job is incremental. AP Aging Open Invoice holds the current outstanding
+# of every open Purchase Invoice; each run re-sums only the invoices whose
+# Payment Ledger Entries were created or modified since the previous run's
+# watermark (less an overlap, see sync_open_invoices), then buckets the open-invoice table as of the snapshot date.
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_to_date, get_datetime, getdate, nowdate
+
+from upande_sphynx.upande_sphynx.report.accounts_payable_aging.accounts_payable_aging import (
+	PARTY_CHUNK_SIZE,
+	get_aging_boundaries,
+	get_bucket_conditions,
+	get_bucket_labels,
+)
+
+# Site config key overriding the bucket bounds used for snapshots, e.g.
+# "ap_aging_snapshot_range": "30, 60, 90". Changing it only affects
+# snapshots taken afterwards — the report shows each day's own labels.
+RANGE_CONFIG_KEY = "ap_aging_snapshot_range"
+
+WATERMARK_KEY = "ap_aging_snapshot_watermark::{company}"
+# How far behind the watermark each run re-scans. A transaction stamps its
+# rows' modified when it writes them but they only become visible when it
+# commits, which can be after a run has already moved the watermark past
+# that time. Re-summing an invoice is idempotent, so the overlap only costs
+# a few repeated invoices; it must be longer than any transaction that
+# writes Payment Ledger Entries.
+WATERMARK_OVERLAP_HOURS = 6
+
+PAYABLE_CONDITIONS = """
+	ple.company = %(company)s
+	AND ple.party_type = 'Supplier'
+	AND ple.account_type = 'Payable'
+	AND ple.against_voucher_type = 'Purchase Invoice'
+"""
+
+
+class APAgingSnapshot(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("AP Aging Snapshot", ["company", "snapshot_date"])
+	frappe.db.add_index("AP Aging Snapshot", ["company", "supplier", "snapshot_date"])
+
+
+def take_daily_snapshots(snapshot_date=None):
+	"""Refresh the open-invoice state and write today's snapshot for every
+	company. Re-running on the same day replaces that day's rows."""
+	snapshot_date = getdate(snapshot_date or nowdate())
+	boundaries = get_aging_boundaries(frappe.conf.get(RANGE_CONFIG_KEY))
+
+	for company in frappe.get_all("Company", pluck="name"):
+		sync_open_invoices(company)
+		write_snapshot(company, snapshot_date, boundaries)
+		frappe.db.commit()
+
+
+def sync_open_invoices(company):
+	"""Bring AP Aging Open Invoice up to date for one company.
+
+	The first run (no watermark yet) builds the table in one pass over the
+	company's payables. Later runs only touch invoices with Payment Ledger
+	activity — new payments, debit notes, reconciliations, cancellations
+	(which delink rows and so bump their modified) — since the last run.
+	The new watermark is read before scanning, and each run re-scans from
+	WATERMARK_OVERLAP_HOURS before the old one, so rows committed after a
+	run by a transaction that stamped them earlier are still picked up."""
+	key = WATERMARK_KEY.format(company=company)
+	watermark = frappe.db.get_default(key)
+	upto = frappe.db.sql(
+		f"""SELECT MAX(modified) FROM `tabPayment Ledger Entry` ple WHERE {PAYABLE_CONDITIONS}""",
+		{"company": company},
+	)[0][0]
+
+	if not upto:
+		return
+
+	if not watermark:
+		frappe.db.delete("AP Aging Open Invoice", {"company": company})
+		insert_open_invoices(company)
+	else:
+		invoices = frappe.db.sql_list(
+			f"""
+			SELECT DISTINCT ple.against_voucher_no
+			FROM `tabPayment Ledger Entry` ple
+			WHERE {PAYABLE_CONDITIONS}
+				AND ple.modified > %(watermark)s
+				AND ple.modified <= %(upto)s
+			""",
+			{
+				"company": company,
+				"watermark": add_to_date(get_datetime(watermark), hours=-WATERMARK_OVERLAP_HOURS),
+				"upto": upto,
+			},
+		)
+		for i in range(0, len(invoices), PARTY_CHUNK_SIZE):
+			chunk = invoices[i:i + PARTY_CHUNK_SIZE]
+			frappe.db.delete("AP Aging Open Invoice", {"name": ("in", chunk)})
+			insert_open_invoices(company, chunk)
+
+	frappe.db.set_default(key, str(upto))
+
+
+def insert_open_invoices(company, invoices=None):
+	"""Re-sum the outstanding of the given invoices (or all of the company's)
+	from the Payment Ledger and store the ones still open."""
+	values = {"company": company}
+	invoice_condition = ""
+	if invoices:
+		invoice_condition = "AND ple.against_voucher_no IN %(invoices)s"
+		values["invoices"] = tuple(invoices)
+
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabAP Aging Open Invoice`
+			(name, creation, modified, owner, modified_by, docstatus, idx,
+			company, supplier, purchase_invoice, due_date, currency, outstanding_amount)
+		SELECT
+			pi.name, NOW(), NOW(), %(user)s, %(user)s, 0, 0,
+			ple.company, pi.supplier, pi.name,
+			IFNULL(pi.due_date, pi.posting_date),
+			MAX(ple.account_currency),
+			SUM(ple.amount_in_account_currency)
+		FROM `tabPayment Ledger Entry` ple
+		INNER JOIN `tabPurchase Invoice` pi ON pi.name = ple.against_voucher_no
+		WHERE {PAYABLE_CONDITIONS}
+			AND ple.delinked = 0
+			AND pi.docstatus = 1
+			{invoice_condition}
+		GROUP BY pi.name, ple.company, pi.supplier, pi.due_date, pi.posting_date
+		HAVING SUM(ple.amount_in_account_currency) > 0.005
+		""",
+		dict(values, user=frappe.session.user),
+	)
+
+
+def write_snapshot(company, snapshot_date, boundaries):
+	"""Bucket the company's open invoices as of snapshot_date into one row
+	per (supplier, currency, bucket). Row names are a hash of that key, so
+	a re-run the same day overwrites rather than duplicates."""
+	frappe.db.delete("AP Aging Snapshot", {"company": company, "snapshot_date": snapshot_date})
+
+	age_expr = "DATEDIFF(%(snapshot_date)s, inv.due_date)"
+	conditions = get_bucket_conditions(boundaries, age_expr)
+	labels = get_bucket_labels(boundaries)
+	bucket_index = " ".join(f"WHEN {c} THEN {i}" for i, c in enumerate(conditions, start=1))
+	bucket_label = " ".join(
+		f"WHEN {c} THEN {frappe.db.escape(label)}" for c, label in zip(conditions, labels, strict=True)
+	)
+
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabAP Aging Snapshot`
+			(name, creation, modified, owner, modified_by, docstatus, idx,
+			company, snapshot_date, supplier, currency, bucket_index, bucket,
+			outstanding_amount, invoice_count)
+		SELECT
+			MD5(CONCAT_WS('|', b.company, %(snapshot_date)s, b.supplier, b.currency, b.bucket_index)),
+			NOW(), NOW(), %(user)s, %(user)s, 0, 0,
+			b.company, %(snapshot_date)s, b.supplier, b.currency, b.bucket_index, b.bucket,
+			SUM(b.outstanding_amount), COUNT(*)
+		FROM (
+			SELECT
+				inv.company, inv.supplier, inv.currency, inv.outstanding_amount,
+				CASE {bucket_index} END AS bucket_index,
+				CASE {bucket_label} END AS bucket
+			FROM `tabAP Aging Open Invoice` inv
+			WHERE inv.company = %(company)s
+		) b
+		GROUP BY b.company, b.supplier, b.currency, b.bucket_index, b.bucket
+		""",
+		{"company": company, "snapshot_date": snapshot_date, "user": frappe.session.user},
+	)
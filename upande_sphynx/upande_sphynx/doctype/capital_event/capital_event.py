@@ -0,0 +1,402 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+#
+# Append-only log of capital events, written from the Share Movement, Share
+# Transfer and Convertible Loan Note lifecycle: Issued, Transferred, Bought
+# Back, Converted, Accrued, Repaid — and Cancelled, which never deletes or
+# edits an event but appends its reversal (same values, `reverses` set).
+#
+# Derived state — positions, as-of snapshots, lender exposure — can be
+# rebuilt from the log with replay(): events are streamed in business order
+# (event_date, then log order) in keyset-paged batches and fed to one or
+# more projections in a single pass. Memory is bounded by the projections'
+# state (one entry per position or note), never by the number of events.
+#
+# Historical documents are backfilled by
+# upande_sphynx.patches.v1_0.backfill_capital_events.
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import flt, getdate
+
+REPLAY_BATCH_SIZE = 5000
+
+SHARE_MOVEMENT_EVENTS = {
+	"Equity Capital Injection": "Issued",
+	"Share Purchase": "Transferred",
+	"Share Buyback": "Bought Back",
+	"Loan Equity Injection": "Converted",
+}
+
+SHARE_TRANSFER_EVENTS = {
+	"Issue": "Issued",
+	"Transfer": "Transferred",
+	"Purchase": "Bought Back",
+}
+
+EVENT_FIELDS = (
+	"event_type",
+	"event_date",
+	"company",
+	"reference_doctype",
+	"reference_name",
+	"shareholder",
+	"counterparty",
+	"share_class",
+	"convertible_loan_note",
+	"shares",
+	"amount",
+	"interest_amount",
+	"currency",
+	"amount_base",
+)
+
+
+class CapitalEvent(Document):
+	def validate(self):
+		if not self.is_new():
+			frappe.throw(_("Capital Events cannot be edited. Record a new event instead."))
+
+	def on_trash(self):
+		frappe.throw(_("Capital Events cannot be deleted. Record a Cancelled event instead."))
+
+
+def on_doctype_update():
+	frappe.db.add_index("Capital Event", ["company", "event_date"])
+	frappe.db.add_index("Capital Event", ["reference_doctype", "reference_name"])
+	frappe.db.add_index("Capital Event", ["convertible_loan_note"])
+
+
+def record_event(event_type, reference_doctype, reference_name, **values):
+	return frappe.get_doc({
+		"doctype": "Capital Event",
+		"event_type": event_type,
+		"reference_doctype": reference_doctype,
+		"reference_name": reference_name,
+		**values,
+	}).insert(ignore_permissions=True)
+
+
+def record_reversals(reference_doctype, reference_name, event_date=None):
+	"""Append a Cancelled event for every not-yet-reversed event of a
+	document. The reversal keeps the original's date, so replays as of any
+	date net the two out."""
+	events = frappe.get_all(
+		"Capital Event",
+		filters={
+			"reference_doctype": reference_doctype,
+			"reference_name": reference_name,
+			"event_type": ("!=", "Cancelled"),
+		},
+		fields=["name", *EVENT_FIELDS],
+		order_by="name",
+	)
+	already_reversed = {
+		str(name)
+		for name in frappe.get_all(
+			"Capital Event",
+			filters={"reference_doctype": reference_doctype, "reference_name": reference_name, "reverses": ("is", "set")},
+			pluck="reverses",
+		)
+	}
+
+	for event in events:
+		if str(event.name) in already_reversed:
+			continue
+		values = {field: event[field] for field in EVENT_FIELDS}
+		values.update({
+			"event_type": "Cancelled",
+			"reverses": event.name,
+			"reversed_event_type": event.event_type,
+			"event_date": event_date or event.event_date,
+		})
+		frappe.get_doc({"doctype": "Capital Event", **values}).insert(ignore_permissions=True)
+
+
+# ----------------------------------------------------------------------
+# Writers, called from the document lifecycles
+# ----------------------------------------------------------------------
+
+
+def record_share_movement(sm):
+	event_type = SHARE_MOVEMENT_EVENTS.get(sm.movement_type)
+	if not event_type:
+		return
+
+	# Same legs as share_movement_leg.get_legs: shares go to `shareholder`
+	# and, when there is one, leave `counterparty`.
+	record_event(
+		event_type,
+		"Share Movement",
+		sm.name,
+		event_date=sm.transaction_date,
+		company=sm.company,
+		shareholder=sm.to_shareholder,
+		counterparty=sm.from_shareholder if sm.from_shareholder != sm.to_shareholder else None,
+		share_class=sm.share_class,
+		convertible_loan_note=sm.source_document_name if sm.source_document_type == "Convertible Loan Note" else None,
+		shares=sm.number_of_shares,
+		amount=sm.total_amount,
+		currency=sm.transaction_currency,
+		amount_base=sm.total_amount_base_currency,
+	)
+
+
+def on_share_transfer_submit(doc, method=None):
+	event_type = SHARE_TRANSFER_EVENTS.get(doc.transfer_type)
+	if not event_type:
+		return
+
+	# A Purchase (the company buying shares back) has no to_shareholder.
+	record_event(
+		event_type,
+		"Share Transfer",
+		doc.name,
+		event_date=doc.date,
+		company=doc.company,
+		shareholder=doc.to_shareholder,
+		counterparty=doc.from_shareholder,
+		share_class=doc.share_type,
+		shares=doc.no_of_shares,
+		amount=doc.get("total_amount_in_transaction_currency") or doc.amount,
+		currency=doc.get("transaction_currency"),
+		amount_base=doc.get("total_amount_in_company_currency") or doc.amount,
+	)
+
+
+def on_share_transfer_cancel(doc, method=None):
+	record_reversals("Share Transfer", doc.name)
+
+
+def record_cln_issued(cln, event_date=None):
+	record_event(
+		"Issued",
+		"Convertible Loan Note",
+		cln.name,
+		event_date=event_date or cln.issue_date,
+		company=cln.company,
+		shareholder=cln.lender,
+		convertible_loan_note=cln.name,
+		amount=cln.principal_amount,
+		currency=cln.loan_currency,
+		amount_base=flt(cln.principal_amount) * flt(cln.exchange_rate or 1),
+	)
+
+
+def record_cln_accrued(cln, accrual_date, interest, interest_base):
+	record_event(
+		"Accrued",
+		"Convertible Loan Note",
+		cln.name,
+		event_date=accrual_date,
+		company=cln.company,
+		shareholder=cln.lender,
+		convertible_loan_note=cln.name,
+		interest_amount=interest,
+		currency=cln.loan_currency,
+		amount_base=interest_base,
+	)
+
+
+def record_cln_repaid(cln, repayment_date, principal, interest, amount_base):
+	record_event(
+		"Repaid",
+		"Convertible Loan Note",
+		cln.name,
+		event_date=repayment_date,
+		company=cln.company,
+		shareholder=cln.lender,
+		convertible_loan_note=cln.name,
+		amount=principal,
+		interest_amount=interest,
+		currency=cln.loan_currency,
+		amount_base=amount_base,
+	)
+
+
+# ----------------------------------------------------------------------
+# Replay
+# ----------------------------------------------------------------------
+
+
+def stream_events(company=None, to_date=None, reference_doctypes=None, batch_size=REPLAY_BATCH_SIZE):
+	"""Yield every event in (event_date, name) order, one keyset page at a
+	time."""
+	conditions, values = [], {"batch_size": batch_size}
+	if company:
+		conditions.append("company = %(company)s")
+		values["company"] = company
+	if to_date:
+		conditions.append("event_date <= %(to_date)s")
+		values["to_date"] = getdate(to_date)
+	if reference_doctypes:
+		conditions.append("reference_doctype IN %(reference_doctypes)s")
+		values["reference_doctypes"] = tuple(reference_doctypes)
+
+	last = None
+	while True:
+		page_conditions = list(conditions)
+		if last:
+			page_conditions.append(
+				"(event_date > %(last_date)s OR (event_date = %(last_date)s AND name > %(last_name)s))"
+			)
+			values.update(last_date=last.event_date, last_name=last.name)
+
+		batch = frappe.db.sql(
+			f"""
+			SELECT name, reverses, reversed_event_type, {", ".join(EVENT_FIELDS)}
+			FROM `tabCapital Event`
+			{"WHERE " + " AND ".join(page_conditions) if page_conditions else ""}
+			ORDER BY event_date, name
+			LIMIT %(batch_size)s
+			""",
+			values,
+			as_dict=True,
+		)
+		yield from batch
+
+		if len(batch) < batch_size:
+			return
+		last = batch[-1]
+
+
+def replay(projections, **stream_filters):
+	"""Feed every event to each projection in one pass, then return each
+	projection's result."""
+	for event in stream_events(**stream_filters):
+		sign = -1 if event.reverses else 1
+		kind = event.reversed_event_type if event.reverses else event.event_type
+		for projection in projections:
+			projection.apply(event, kind, sign)
+	return [projection.result() for projection in projections]
+
+
+class PositionsProjection:
+	"""Shares per (shareholder, share_class), and money invested per
+	shareholder: the base amount of everything received except buybacks,
+	as recalculate_shareholder_totals counts it."""
+
+	def __init__(self):
+		self.shares = {}
+		self.investment = {}
+
+	def apply(self, event, kind, sign):
+		if kind not in ("Issued", "Transferred", "Bought Back", "Converted") or not event.share_class:
+			return
+
+		shares = sign * flt(event.shares)
+		self.move(event.shareholder, event.share_class, shares)
+		self.move(event.counterparty, event.share_class, -shares)
+
+		if event.shareholder and kind != "Bought Back":
+			self.investment[event.shareholder] = self.investment.get(event.shareholder, 0) + sign * flt(event.amount_base)
+
+	def move(self, shareholder, share_class, shares):
+		if not shareholder:
+			return
+		key = (shareholder, share_class)
+		self.shares[key] = self.shares.get(key, 0) + shares
+
+	def result(self):
+		return {"shares": self.shares, "investment": self.investment}
+
+
+class SnapshotsProjection(PositionsProjection):
+	"""Positions as of each date in `dates`. Each snapshot is handed to
+	`emit(date, positions)` as soon as the stream passes that date, so
+	callers that write snapshots out keep only the live positions in
+	memory; without `emit` the snapshots are collected and returned."""
+
+	def __init__(self, dates, emit=None):
+		super().__init__()
+		self.dates = sorted(getdate(d) for d in dates)
+		self.snapshots = {}
+		self.emit = emit or (lambda date, positions: self.snapshots.__setitem__(date, positions))
+
+	def apply(self, event, kind, sign):
+		while self.dates and getdate(event.event_date) > self.dates[0]:
+			self.take(self.dates.pop(0))
+		super().apply(event, kind, sign)
+
+	def take(self, date):
+		self.emit(date, {key: shares for key, shares in self.shares.items() if shares})
+
+	def result(self):
+		while self.dates:
+			self.take(self.dates.pop(0))
+		return self.snapshots
+
+
+class LenderExposureProjection:
+	"""Outstanding principal and interest per Convertible Loan Note, rolled
+	up per lender. A conversion clears the note."""
+
+	def __init__(self):
+		self.notes = {}
+
+	def apply(self, event, kind, sign):
+		note = event.convertible_loan_note
+		if not note:
+			return
+
+		if kind == "Converted":
+			if sign > 0:
+				self.notes.pop(note, None)
+			return
+
+		if kind not in ("Issued", "Accrued", "Repaid"):
+			return
+
+		state = self.notes.setdefault(note, {"lender": event.shareholder, "principal": 0, "interest": 0})
+		direction = -sign if kind == "Repaid" else sign
+		state["principal"] += direction * flt(event.amount)
+		state["interest"] += direction * flt(event.interest_amount)
+
+	def result(self):
+		lenders = {}
+		for note, state in self.notes.items():
+			lender = lenders.setdefault(state["lender"], {"principal": 0, "interest": 0, "notes": []})
+			lender["principal"] += state["principal"]
+			lender["interest"] += state["interest"]
+			lender["notes"].append(note)
+		return lenders
+
+
+@frappe.whitelist()
+def rebuild_holdings(company=None):
+	"""Recompute every Shareholder's Total Shares Held and Total Investment
+	from a single replay of the Share Movement events, written back in one
+	bulk update. Total Investment keeps the stored active CLN principal,
+	as recalculate_shareholder_totals does."""
+	frappe.only_for("System Manager")
+
+	positions = replay([PositionsProjection()], company=company, reference_doctypes=["Share Movement"])[0]
+
+	held = {}
+	for (shareholder, _share_class), shares in positions["shares"].items():
+		held[shareholder] = held.get(shareholder, 0) + shares
+
+	filters = {"company": company} if company else {}
+	shareholders = frappe.get_all("Shareholder", filters=filters, pluck="name")
+	for start in range(0, len(shareholders), REPLAY_BATCH_SIZE):
+		batch = shareholders[start:start + REPLAY_BATCH_SIZE]
+		values = []
+		for shareholder in batch:
+			values.extend([shareholder, flt(held.get(shareholder))])
+		for shareholder in batch:
+			values.extend([shareholder, flt(positions["investment"].get(shareholder))])
+
+		cases = " ".join(["WHEN %s THEN %s"] * len(batch))
+		frappe.db.sql(
+			f"""
+			UPDATE `tabShareholder`
+			SET custom_total_shares_held = CASE name {cases} END,
+				custom_total_investment = CASE name {cases} END + IFNULL(custom_total_cln_amount, 0)
+			WHERE name IN ({", ".join(["%s"] * len(batch))})
+			""",
+			values + batch,
+		)
+
+	frappe.db.commit()
+	return {"shareholders": len(shareholders)}
@@ -0,0 +1,416 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+#
+# Reconciler for the capital app's denormalized fields. Several values are
+# stored rather than derived on read — Shareholder totals, CLN interest and
+# repayment totals, and the links between agreements, movements, notes and
+# Journal Entries — and they drift whenever a hook fails part-way (several
+# on_submit paths log and swallow their errors). Each check here recomputes
+# one group of those values from source rows with a single set-based query
+# per chunk and yields an issue for every difference.
+#
+# run_integrity_check splits each company's rows into name-range chunks and
+# runs every (check, chunk) as its own long-queue job, so large tables are
+# reconciled in parallel. Issues are stored as Capital Integrity Issue rows
+# (read by the Capital Integrity Check report) and, when asked to, repaired
+# in bulk: one UPDATE ... CASE per field per batch.
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, cstr, flt, now
+
+CHUNK_SIZE = 5000
+REPAIR_BATCH_SIZE = 500
+# Currency fields are compared to the cent.
+TOLERANCE = 0.005
+
+ISSUE_FIELDS = (
+	"name",
+	"creation",
+	"modified",
+	"owner",
+	"modified_by",
+	"docstatus",
+	"idx",
+	"run",
+	"company",
+	"check_name",
+	"status",
+	"reference_doctype",
+	"reference_name",
+	"fieldname",
+	"stored_value",
+	"expected_value",
+)
+
+# (doctype, link field, linked doctype) for every stored reference. A
+# submitted document's link must point at a document that exists and is
+# not cancelled.
+REFERENCES = (
+	("Share Movement", "journal_entry_ref", "Journal Entry"),
+	("Share Agreement", "journal_entry_ref", "Journal Entry"),
+	("Share Agreement", "share_movement_ref", "Share Movement"),
+	("Share Agreement", "share_transfer_ref", "Share Transfer"),
+	("Convertible Loan Note", "disbursement_journal_entry_ref", "Journal Entry"),
+	("Convertible Loan Note", "conversion_journal_entry_ref", "Journal Entry"),
+	("Convertible Loan Note", "share_transfer_ref", "Share Movement"),
+	("Share Transfer", "custom_journal_entry", "Journal Entry"),
+)
+
+
+class CapitalIntegrityIssue(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Capital Integrity Issue", ["company", "status"])
+
+
+def issue(doctype, name, fieldname, stored, expected):
+	return frappe._dict(
+		reference_doctype=doctype, reference_name=name, fieldname=fieldname, stored=stored, expected=expected
+	)
+
+
+def name_bounds(column, lo, hi):
+	"""SQL restricting `column` to the chunk (lo, hi]."""
+	conditions = []
+	if lo is not None:
+		conditions.append(f"{column} > %(lo)s")
+	if hi is not None:
+		conditions.append(f"{column} <= %(hi)s")
+	return " AND ".join(conditions) or "1 = 1"
+
+
+# ----------------------------------------------------------------------
+# Checks: each takes (company, lo, hi) and returns a list of issues
+# ----------------------------------------------------------------------
+
+
+def check_shareholder_totals(company, lo, hi):
+	"""custom_total_shares_held, custom_total_investment and
+	custom_total_cln_amount, recomputed the way recalculate_shareholder_totals
+	and the CLN actions compute them."""
+	rows = frappe.db.sql(
+		f"""
+		SELECT
+			sh.name,
+			sh.custom_total_shares_held AS stored_shares,
+			sh.custom_total_investment AS stored_investment,
+			sh.custom_total_cln_amount AS stored_cln,
+			IFNULL(mv.shares, 0) AS shares,
+			IFNULL(mv.investment, 0) AS investment,
+			IFNULL(cln.principal, 0) AS cln
+		FROM `tabShareholder` sh
+		LEFT JOIN (
+			SELECT holder, SUM(shares) AS shares, SUM(investment) AS investment
+			FROM (
+				SELECT to_shareholder AS holder, number_of_shares AS shares,
+					IF(movement_type != 'Share Buyback', total_amount_base_currency, 0) AS investment
+				FROM `tabShare Movement`
+				WHERE docstatus = 1 AND {name_bounds("to_shareholder", lo, hi)}
+				UNION ALL
+				SELECT from_shareholder, -number_of_shares, 0
+				FROM `tabShare Movement`
+				WHERE docstatus = 1 AND from_shareholder IS NOT NULL AND {name_bounds("from_shareholder", lo, hi)}
+			) legs
+			GROUP BY holder
+		) mv ON mv.holder = sh.name
+		LEFT JOIN (
+			SELECT lender, SUM(principal_amount) AS principal
+			FROM `tabConvertible Loan Note`
+			WHERE docstatus = 1 AND status = 'Active' AND {name_bounds("lender", lo, hi)}
+			GROUP BY lender
+		) cln ON cln.lender = sh.name
+		WHERE sh.company = %(company)s AND {name_bounds("sh.name", lo, hi)}
+		""",
+		{"company": company, "lo": lo, "hi": hi},
+		as_dict=True,
+	)
+
+	issues = []
+	for row in rows:
+		expected_investment = flt(row.investment) + flt(row.cln)
+		if flt(row.stored_shares) != flt(row.shares):
+			issues.append(issue("Shareholder", row.name, "custom_total_shares_held", row.stored_shares, flt(row.shares)))
+		if abs(flt(row.stored_investment) - expected_investment) > TOLERANCE:
+			issues.append(issue("Shareholder", row.name, "custom_total_investment", row.stored_investment, expected_investment))
+		if abs(flt(row.stored_cln) - flt(row.cln)) > TOLERANCE:
+			issues.append(issue("Shareholder", row.name, "custom_total_cln_amount", row.stored_cln, flt(row.cln)))
+	return issues
+
+
+def check_cln_totals(company, lo, hi):
+	"""accrued_interest (the last accrual row's cumulative_interest, which
+	carries any opening balance), total_accrued_from_table and total_repaid,
+	for notes that have accrual or repayment rows to check them against."""
+	rows = frappe.db.sql(
+		f"""
+		SELECT
+			cln.name,
+			cln.accrued_interest,
+			cln.total_accrued_from_table,
+			cln.total_repaid,
+			acc.row_count AS accrual_rows,
+			acc.total_interest,
+			last_acc.cumulative_interest,
+			rep.row_count AS repayment_rows,
+			rep.total_paid
+		FROM `tabConvertible Loan Note` cln
+		LEFT JOIN (
+			SELECT parent, COUNT(*) AS row_count, SUM(interest_amount) AS total_interest, MAX(idx) AS last_idx
+			FROM `tabCLN Interest Accrual`
+			WHERE parenttype = 'Convertible Loan Note' AND {name_bounds("parent", lo, hi)}
+			GROUP BY parent
+		) acc ON acc.parent = cln.name
+		LEFT JOIN `tabCLN Interest Accrual` last_acc
+			ON last_acc.parent = cln.name
+			AND last_acc.parenttype = 'Convertible Loan Note'
+			AND last_acc.idx = acc.last_idx
+		LEFT JOIN (
+			SELECT parent, COUNT(*) AS row_count,
+				SUM(IFNULL(principal_paid, 0) + IFNULL(interest_paid, 0) + IFNULL(penalty_paid, 0)) AS total_paid
+			FROM `tabCLN Repayment`
+			WHERE parenttype = 'Convertible Loan Note' AND {name_bounds("parent", lo, hi)}
+			GROUP BY parent
+		) rep ON rep.parent = cln.name
+		WHERE cln.company = %(company)s AND cln.docstatus = 1 AND {name_bounds("cln.name", lo, hi)}
+		AND (acc.row_count IS NOT NULL OR rep.row_count IS NOT NULL)
+		""",
+		{"company": company, "lo": lo, "hi": hi},
+		as_dict=True,
+	)
+
+	doctype = "Convertible Loan Note"
+	issues = []
+	for row in rows:
+		if row.accrual_rows:
+			if abs(flt(row.accrued_interest) - flt(row.cumulative_interest)) > TOLERANCE:
+				issues.append(issue(doctype, row.name, "accrued_interest", row.accrued_interest, flt(row.cumulative_interest)))
+			if abs(flt(row.total_accrued_from_table) - flt(row.total_interest)) > TOLERANCE:
+				issues.append(issue(doctype, row.name, "total_accrued_from_table", row.total_accrued_from_table, flt(row.total_interest)))
+		if row.repayment_rows and abs(flt(row.total_repaid) - flt(row.total_paid)) > TOLERANCE:
+			issues.append(issue(doctype, row.name, "total_repaid", row.total_repaid, flt(row.total_paid)))
+	return issues
+
+
+def check_dangling_references(company, lo, hi):
+	"""Links on submitted documents pointing at a missing or cancelled
+	document. The fix is to clear the link."""
+	issues = []
+	for doctype, fieldname, linked_doctype in REFERENCES:
+		rows = frappe.db.sql(
+			f"""
+			SELECT src.name, src.`{fieldname}` AS link
+			FROM `tab{doctype}` src
+			LEFT JOIN `tab{linked_doctype}` linked ON linked.name = src.`{fieldname}`
+			WHERE src.company = %(company)s AND src.docstatus = 1
+			AND IFNULL(src.`{fieldname}`, '') != ''
+			AND (linked.name IS NULL OR linked.docstatus = 2)
+			AND {name_bounds("src.name", lo, hi)}
+			""",
+			{"company": company, "lo": lo, "hi": hi},
+			as_dict=True,
+		)
+		issues.extend(issue(doctype, row.name, fieldname, row.link, None) for row in rows)
+	return issues
+
+
+def check_missing_references(company, lo, hi):
+	"""Links left empty although the linked document exists: a submitted
+	Share Movement issued from an agreement or note that doesn't point back
+	at it, or a movement whose Journal Entry the outbox posted but never
+	linked."""
+	issues = []
+
+	for doctype, fieldname in (("Share Agreement", "share_movement_ref"), ("Convertible Loan Note", "share_transfer_ref")):
+		rows = frappe.db.sql(
+			f"""
+			SELECT src.name, MAX(sm.name) AS movement
+			FROM `tab{doctype}` src
+			JOIN `tabShare Movement` sm
+				ON sm.source_document_type = %(doctype)s
+				AND sm.source_document_name = src.name
+				AND sm.docstatus = 1
+			WHERE src.company = %(company)s AND src.docstatus = 1
+			AND IFNULL(src.`{fieldname}`, '') = ''
+			AND {name_bounds("src.name", lo, hi)}
+			GROUP BY src.name
+			""",
+			{"company": company, "doctype": doctype, "lo": lo, "hi": hi},
+			as_dict=True,
+		)
+		issues.extend(issue(doctype, row.name, fieldname, None, row.movement) for row in rows)
+
+	rows = frappe.db.sql(
+		f"""
+		SELECT sm.name, posting.journal_entry
+		FROM `tabShare Movement` sm
+		JOIN `tabCapital JE Posting` posting
+			ON posting.reference_doctype = 'Share Movement'
+			AND posting.reference_name = sm.name
+			AND posting.status = 'Posted'
+		JOIN `tabJournal Entry` je ON je.name = posting.journal_entry AND je.docstatus = 1
+		WHERE sm.company = %(company)s AND sm.docstatus = 1
+		AND IFNULL(sm.journal_entry_ref, '') = ''
+		AND {name_bounds("sm.name", lo, hi)}
+		""",
+		{"company": company, "lo": lo, "hi": hi},
+		as_dict=True,
+	)
+	issues.extend(issue("Share Movement", row.name, "journal_entry_ref", None, row.journal_entry) for row in rows)
+	return issues
+
+
+# check name -> (function, doctype whose names the chunks are cut from)
+CHECKS = {
+	"Shareholder Totals": (check_shareholder_totals, "Shareholder"),
+	"CLN Totals": (check_cln_totals, "Convertible Loan Note"),
+	"Dangling References": (check_dangling_references, None),
+	"Missing References": (check_missing_references, None),
+}
+
+
+# ----------------------------------------------------------------------
+# Dispatch
+# ----------------------------------------------------------------------
+
+
+@frappe.whitelist()
+def run_integrity_check(company=None, repair=0):
+	"""Queue every check for one company (or all), one job per chunk.
+	Replaces the company's previous issues. Returns the run id."""
+	frappe.only_for("System Manager")
+	repair = cint(repair)
+
+	run = frappe.generate_hash(length=10)
+	companies = [company] if company else frappe.get_all("Company", pluck="name")
+	jobs = 0
+
+	for company_name in companies:
+		frappe.db.delete("Capital Integrity Issue", {"company": company_name})
+		for check_name, (_check, doctype) in CHECKS.items():
+			for lo, hi in get_chunk_bounds(doctype, company_name):
+				frappe.enqueue(
+					run_chunk,
+					queue="long",
+					enqueue_after_commit=True,
+					run=run,
+					company=company_name,
+					check_name=check_name,
+					lo=lo,
+					hi=hi,
+					repair=repair,
+				)
+				jobs += 1
+
+	return {"run": run, "jobs": jobs}
+
+
+def run_weekly_check():
+	"""Scheduler entry point: check every company, repair nothing."""
+	run_integrity_check()
+
+
+def get_chunk_bounds(doctype, company):
+	"""(lo, hi] name ranges of about CHUNK_SIZE rows each, found by keyset
+	probes on the name index. Checks without a chunking doctype run whole."""
+	if not doctype:
+		return [(None, None)]
+
+	bounds, lo = [], None
+	while True:
+		hi = frappe.db.sql(
+			f"""
+			SELECT name FROM `tab{doctype}`
+			WHERE company = %(company)s {"AND name > %(lo)s" if lo is not None else ""}
+			ORDER BY name
+			LIMIT 1 OFFSET %(offset)s
+			""",
+			{"company": company, "lo": lo, "offset": CHUNK_SIZE - 1},
+		)
+		if not hi:
+			bounds.append((lo, None))
+			return bounds
+		bounds.append((lo, hi[0][0]))
+		lo = hi[0][0]
+
+
+def run_chunk(run, company, check_name, lo=None, hi=None, repair=0):
+	"""Background job: run one check over one chunk, store its issues and
+	repair them if asked."""
+	check = CHECKS[check_name][0]
+	issues = check(company, lo, hi)
+	if not issues:
+		return
+
+	if repair:
+		repair_issues(issues)
+	save_issues(run, company, check_name, issues, "Repaired" if repair else "Open")
+	frappe.db.commit()
+
+
+def save_issues(run, company, check_name, issues, status):
+	timestamp = now()
+	user = frappe.session.user
+	frappe.db.bulk_insert(
+		"Capital Integrity Issue",
+		ISSUE_FIELDS,
+		[
+			(
+				frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0, 0,
+				run, company, check_name, status, i.reference_doctype, i.reference_name, i.fieldname,
+				cstr(i.stored), cstr(i.expected),
+			)
+			for i in issues
+		],
+	)
+
+
+def repair_issues(issues):
+	"""Write every expected value back, one UPDATE ... CASE per (doctype,
+	field) per batch. modified is left alone: these are corrections of
+	derived values, not edits."""
+	groups = {}
+	for i in issues:
+		groups.setdefault((i.reference_doctype, i.fieldname), []).append(i)
+
+	for (doctype, fieldname), group in groups.items():
+		for start in range(0, len(group), REPAIR_BATCH_SIZE):
+			batch = group[start:start + REPAIR_BATCH_SIZE]
+			cases = " ".join(["WHEN %s THEN %s"] * len(batch))
+			placeholders = ", ".join(["%s"] * len(batch))
+			values = [value for i in batch for value in (i.reference_name, i.expected)]
+			frappe.db.sql(
+				f"""
+				UPDATE `tab{doctype}`
+				SET `{fieldname}` = CASE name {cases} END
+				WHERE name IN ({placeholders})
+				""",
+				values + [i.reference_name for i in batch],
+			)
+
+
+@frappe.whitelist()
+def repair_open_issues(company=None):
+	"""Repair the issues found by the last check without re-running it."""
+	frappe.only_for("System Manager")
+	filters = {"status": "Open"}
+	if company:
+		filters["company"] = company
+
+	rows = frappe.get_all(
+		"Capital Integrity Issue",
+		filters=filters,
+		fields=["name", "reference_doctype", "reference_name", "fieldname", "expected_value"],
+	)
+	issues = [
+		issue(r.reference_doctype, r.reference_name, r.fieldname, None, r.expected_value or None) for r in rows
+	]
+	repair_issues(issues)
+	if rows:
+		frappe.db.set_value(
+			"Capital Integrity Issue", {"name": ("in", [r.name for r in rows])}, "status", "Repaired"
+		)
+	frappe.db.commit()
+	return len(rows)
@@ -0,0 +1,18 @@
+// Copyright (c) 2026, Jeniffer and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("Capital JE Posting", {
+	refresh(frm) {
+		if (["Failed", "Dead"].includes(frm.doc.status)) {
+			frm.add_custom_button(__("Retry"), () => {
+				frm.call("retry").then(() => frm.reload_doc());
+			});
+		}
+
+		if (frm.doc.journal_entry) {
+			frm.add_custom_button(__("View Journal Entry"), () => {
+				frappe.set_route("Form", "Journal Entry", frm.doc.journal_entry);
+			});
+		}
+	},
+});
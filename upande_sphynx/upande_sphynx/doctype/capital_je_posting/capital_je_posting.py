@@ -0,0 +1,278 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+#
+# Outbox of Journal Entries waiting to be posted. A submit that needs a
+# Journal Entry queues a posting (enqueue_posting) instead of building it
+# inside the request, and a short-queue job posts it after the submit
+# commits. A failed attempt is retried with exponential backoff by the
+# every-minute scheduler job; after `capital_je_posting_max_attempts` (site
+# config, default 6) it is marked Dead and stays in the list until someone
+# fixes the cause and presses Retry.
+#
+# Each posting carries an idempotency key (one per reference document) with
+# a unique index, so a document can only be queued once. The handlers commit
+# the Journal Entry and its link on the reference document together, and a
+# posting whose reference already links a Journal Entry is marked Posted
+# without calling the handler again, so a retry after a crash never posts
+# twice.
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import add_to_date, cint, now_datetime, time_diff_in_seconds
+
+# Reference doctype -> (handler that posts and links the Journal Entry,
+# field on the reference that holds the Journal Entry).
+POSTING_HANDLERS = {
+	"Share Movement": (
+		"upande_sphynx.api.capital_management.create_journal_entry_from_share_movement",
+		"journal_entry_ref",
+	),
+}
+
+DEFAULT_MAX_ATTEMPTS = 6
+BACKOFF_SECONDS = 60
+MAX_BACKOFF_SECONDS = 6 * 60 * 60
+# A posting left in Processing this long belongs to a worker that died.
+STALE_PROCESSING_MINUTES = 30
+BATCH_SIZE = 200
+
+
+class CapitalJEPosting(Document):
+	@frappe.whitelist()
+	def retry(self):
+		"""Put a Failed or Dead posting back in the queue with a fresh
+		attempt budget."""
+		if self.status not in ("Failed", "Dead"):
+			frappe.throw(_("Only Failed or Dead postings can be retried"))
+
+		self.db_set({"status": "Pending", "attempts": 0, "next_attempt_at": now_datetime()})
+		enqueue_job(self.name)
+
+
+def on_doctype_update():
+	frappe.db.add_index("Capital JE Posting", ["status", "next_attempt_at"])
+
+
+def get_idempotency_key(reference_doctype, reference_name):
+	return f"{reference_doctype}::{reference_name}::journal_entry"
+
+
+def enqueue_posting(reference_doctype, reference_name, company=None, enqueue=True):
+	"""Queue the Journal Entry for a document. Queueing the same document
+	twice returns the existing posting. Posting starts after the current
+	transaction commits, or — with `enqueue=False` — when the caller runs
+	process_posting itself (the scheduler picks it up otherwise)."""
+	if reference_doctype not in POSTING_HANDLERS:
+		frappe.throw(_("Journal Entries for {0} cannot be queued").format(reference_doctype))
+
+	key = get_idempotency_key(reference_doctype, reference_name)
+	existing = frappe.db.get_value("Capital JE Posting", {"idempotency_key": key})
+	if existing:
+		return existing
+
+	posting = frappe.get_doc({
+		"doctype": "Capital JE Posting",
+		"reference_doctype": reference_doctype,
+		"reference_name": reference_name,
+		"company": company,
+		"idempotency_key": key,
+		"status": "Pending",
+		"next_attempt_at": now_datetime(),
+	}).insert(ignore_permissions=True)
+
+	if enqueue:
+		enqueue_job(posting.name)
+	return posting.name
+
+
+def cancel_postings(reference_doctype, reference_name):
+	"""Withdraw a document's posting that has not gone through yet (its
+	reference was cancelled before the Journal Entry was posted)."""
+	frappe.db.set_value(
+		"Capital JE Posting",
+		{
+			"idempotency_key": get_idempotency_key(reference_doctype, reference_name),
+			"status": ("in", ("Pending", "Failed", "Dead")),
+		},
+		"status",
+		"Cancelled",
+		update_modified=False,
+	)
+
+
+def enqueue_job(posting_name):
+	frappe.enqueue(
+		process_posting,
+		queue="short",
+		job_id=f"capital_je_posting::{posting_name}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		posting_name=posting_name,
+	)
+
+
+def process_posting(posting_name):
+	"""Make one attempt at a posting, if it is due."""
+	if not claim(posting_name):
+		return
+
+	posting = frappe.get_doc("Capital JE Posting", posting_name)
+	handler, je_field = POSTING_HANDLERS[posting.reference_doctype]
+
+	try:
+		# Locks the reference row, so two workers can't both find it unposted.
+		docstatus, journal_entry = frappe.db.get_value(
+			posting.reference_doctype, posting.reference_name, ["docstatus", je_field], for_update=True
+		) or (None, None)
+
+		if not journal_entry:
+			if docstatus != 1:
+				frappe.db.rollback()
+				set_status(posting_name, "Cancelled")
+				return
+			frappe.get_attr(handler)(posting.reference_name)
+			journal_entry = frappe.db.get_value(posting.reference_doctype, posting.reference_name, je_field)
+
+	except Exception:
+		frappe.db.rollback()
+		frappe.clear_messages()
+		record_failure(posting, frappe.get_traceback())
+		return
+
+	frappe.clear_messages()
+	posted_at = now_datetime()
+	frappe.db.set_value(
+		"Capital JE Posting",
+		posting_name,
+		{
+			"status": "Posted",
+			"journal_entry": journal_entry,
+			"posted_at": posted_at,
+			"latency": time_diff_in_seconds(posted_at, posting.creation),
+			"next_attempt_at": None,
+		},
+	)
+	frappe.db.commit()
+
+
+def claim(posting_name):
+	"""Move a due Pending/Failed posting to Processing and commit, so no
+	other worker picks it up. False if it isn't due or someone else has it."""
+	posting = frappe.db.get_value(
+		"Capital JE Posting", posting_name, ["status", "next_attempt_at"], as_dict=True, for_update=True
+	)
+	if (
+		not posting
+		or posting.status not in ("Pending", "Failed")
+		or (posting.next_attempt_at and posting.next_attempt_at > now_datetime())
+	):
+		frappe.db.rollback()
+		return False
+
+	frappe.db.sql(
+		"""
+		UPDATE `tabCapital JE Posting`
+		SET status = 'Processing', attempts = attempts + 1, started_at = %s
+		WHERE name = %s
+		""",
+		(now_datetime(), posting_name),
+	)
+	frappe.db.commit()
+	return True
+
+
+def record_failure(posting, error):
+	attempts = cint(frappe.db.get_value("Capital JE Posting", posting.name, "attempts"))
+	max_attempts = cint(frappe.conf.get("capital_je_posting_max_attempts")) or DEFAULT_MAX_ATTEMPTS
+
+	values = {"last_error": error}
+	if attempts >= max_attempts:
+		values.update({"status": "Dead", "next_attempt_at": None})
+	else:
+		delay = min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+		values.update({"status": "Failed", "next_attempt_at": add_to_date(now_datetime(), seconds=delay)})
+
+	frappe.db.set_value("Capital JE Posting", posting.name, values)
+	frappe.db.commit()
+
+
+def set_status(posting_name, status):
+	frappe.db.set_value("Capital JE Posting", posting_name, "status", status)
+	frappe.db.commit()
+
+
+def process_due_postings():
+	"""Scheduler job (every minute): give stalled postings back to the queue
+	and make an attempt at every posting whose backoff has expired."""
+	frappe.db.sql(
+		"""
+		UPDATE `tabCapital JE Posting`
+		SET status = 'Failed', next_attempt_at = %s
+		WHERE status = 'Processing' AND started_at < %s
+		""",
+		(now_datetime(), add_to_date(now_datetime(), minutes=-STALE_PROCESSING_MINUTES)),
+	)
+	frappe.db.commit()
+
+	due = frappe.get_all(
+		"Capital JE Posting",
+		filters={"status": ("in", ("Pending", "Failed")), "next_attempt_at": ("<=", now_datetime())},
+		order_by="next_attempt_at",
+		limit=BATCH_SIZE,
+		pluck="name",
+	)
+	for posting_name in due:
+		process_posting(posting_name)
+
+
+@frappe.whitelist()
+def get_outbox_metrics(company=None):
+	"""Queue depth by status, age of the oldest unposted posting, and
+	queue-to-post latency over the last 24 hours."""
+	frappe.has_permission("Capital JE Posting", "read", throw=True)
+
+	conditions, values = "", {"since": add_to_date(now_datetime(), hours=-24)}
+	if company:
+		conditions = "AND company = %(company)s"
+		values["company"] = company
+
+	depth = dict(frappe.db.sql(
+		f"""
+		SELECT status, COUNT(*)
+		FROM `tabCapital JE Posting`
+		WHERE 1 = 1 {conditions}
+		GROUP BY status
+		""",
+		values,
+	))
+
+	oldest = frappe.db.sql(
+		f"""
+		SELECT MIN(creation)
+		FROM `tabCapital JE Posting`
+		WHERE status IN ('Pending', 'Processing', 'Failed') {conditions}
+		""",
+		values,
+	)[0][0]
+
+	latencies = sorted(frappe.db.sql_list(
+		f"""
+		SELECT latency
+		FROM `tabCapital JE Posting`
+		WHERE status = 'Posted' AND posted_at >= %(since)s {conditions}
+		""",
+		values,
+	))
+
+	def percentile(p):
+		if not latencies:
+			return None
+		return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+	return {
+		"depth": {status: depth.get(status, 0) for status in ("Pending", "Processing", "Failed", "Dead")},
+		"oldest_unposted_seconds": time_diff_in_seconds(now_datetime(), oldest) if oldest else None,
+		"posted_last_24h": len(latencies),
+		"latency_seconds": {"p50": percentile(50), "p95": percentile(95), "max": latencies[-1] if latencies else None},
+	}
@@ -0,0 +1,23 @@
+// Copyright (c) 2026, Jeniffer and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["Capital JE Posting"] = {
+	onload(listview) {
+		// Queue depth and queue-to-post latency (get_outbox_metrics).
+		listview.page.add_inner_button(__("Outbox Metrics"), () => {
+			frappe.set_route("query-report", "Capital JE Outbox");
+		});
+	},
+
+	get_indicator(doc) {
+		const colors = {
+			Pending: "blue",
+			Processing: "orange",
+			Posted: "green",
+			Failed: "yellow",
+			Dead: "red",
+			Cancelled: "gray",
+		};
+		return [__(doc.status), colors[doc.status], "status,=," + doc.status];
+	},
+};
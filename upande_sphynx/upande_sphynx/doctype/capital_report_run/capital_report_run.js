@@ -0,0 +1,26 @@
+// Copyright (c) 2026, Jeniffer and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("Capital Report Run", {
+	refresh(frm) {
+		if (frm.doc.status === "Failed") {
+			frm.add_custom_button(__("Retry"), () => {
+				frappe
+					.call({
+						method: "upande_sphynx.upande_sphynx.doctype.capital_report_run.capital_report_run.retry",
+						args: { run_name: frm.doc.name },
+					})
+					.then(() => frm.reload_doc());
+			});
+			return;
+		}
+		if (frm.doc.status !== "Completed") return;
+
+		// Shows this run's saved result as-is, without recomputing.
+		frm.add_custom_button(__("Open Report"), () => {
+			const filters = JSON.parse(frm.doc.filters || "{}");
+			filters.capital_report_run = frm.doc.name;
+			frappe.set_route("query-report", frm.doc.report_name, filters);
+		});
+	},
+});
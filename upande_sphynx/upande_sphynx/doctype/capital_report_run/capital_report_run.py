@@ -0,0 +1,280 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+#
+# Background generation for the heavy capital reports (Accounts Payable Aging,
+# Share Transactions Report). A run whose date range is longer than
+# `capital_report_background_days` (site config, default 365; 0 disables) is
+# not computed in the web request: the report's execute() calls
+# get_background_result, which either returns a finished run's saved result
+# or queues one on the long queue and tells the user it is being prepared.
+#
+# Runs are matched on report name, normalized filters and the company's
+# report data version (upande_sphynx.report_cache), so reopening the same
+# report with the same filters reuses a finished run until the underlying
+# documents change. A failed run is matched the same way, so the report shows
+# its error instead of queueing the same failing job on every refresh; Retry
+# on the run queues it again. Results are stored as a private gzipped JSON File
+# attached to the run.
+
+import gzip
+import io
+import json
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import add_to_date, date_diff, get_datetime, getdate, now_datetime
+
+from upande_sphynx.report_cache import get_data_version, get_filters_hash
+
+DEFAULT_BACKGROUND_DAYS = 365
+JOB_TIMEOUT = 60 * 60
+# Progress a run reaches once the report's queries are done. Writing the
+# result file takes it from here to 95, saving it to 100.
+QUERY_PROGRESS = 60
+# Rows serialized between progress updates while writing the result.
+RESULT_CHUNK_SIZE = 5000
+
+# Report name -> module whose execute(filters) produces (columns, data).
+BACKGROUND_REPORTS = {
+	"Accounts Payable Aging": "upande_sphynx.upande_sphynx.report.accounts_payable_aging.accounts_payable_aging",
+	"Share Transactions Report": "upande_sphynx.upande_sphynx.report.share_transactions_report.share_transactions_report",
+}
+
+# Report filter set by the run's "Open Report" button to show that
+# run's saved result as-is, even if the data has changed since.
+RUN_FILTER = "capital_report_run"
+
+REALTIME_EVENT = "capital_report_run"
+
+
+class CapitalReportRun(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Capital Report Run", ["report_name", "filters_hash", "data_version"])
+
+
+def should_run_in_background(filters, from_date, to_date):
+	"""True when the requested period is longer than the configured
+	threshold. Never true inside a run itself."""
+	if frappe.flags.in_capital_report_run:
+		return False
+
+	threshold = frappe.conf.get("capital_report_background_days")
+	if threshold is None:
+		threshold = DEFAULT_BACKGROUND_DAYS
+	if not threshold or not from_date or not to_date:
+		return False
+	return date_diff(getdate(to_date), getdate(from_date)) > threshold
+
+
+def get_background_result(report_name, filters, columns=None):
+	"""What a report's execute() returns for a backgrounded run: the saved
+	result of a finished matching run, or `columns` with no rows and a
+	message while one is queued or running, or with its error once it has
+	failed."""
+	run = get_or_enqueue_run(report_name, filters)
+
+	if run.status == "Completed":
+		result = load_result(run)
+		return result["columns"], result["data"], get_message(run, _("Loaded from a background run finished {0}."))
+
+	if run.status == "Failed":
+		message = _("Background generation failed ({2}). See {0} to retry.")
+	else:
+		message = _("This report covers a long period and is being generated in the background ({1}% done). It will refresh when ready; progress is also shown on {0}.")
+
+	return columns or [], [], get_message(run, message)
+
+
+def get_message(run, message):
+	link = f'<a href="/app/capital-report-run/{run.name}">{run.name}</a>'
+	if run.status == "Completed":
+		return message.format(frappe.utils.pretty_date(run.completed_at)) + " " + _("Run: {0}").format(link)
+	return message.format(link, frappe.utils.cint(run.progress), frappe.utils.escape_html(get_error_summary(run)))
+
+
+def get_error_summary(run):
+	"""Last line of the stored traceback (the exception itself)."""
+	lines = [line for line in (run.error or "").splitlines() if line.strip()]
+	return lines[-1].strip() if lines else _("no error was recorded.")
+
+
+def get_or_enqueue_run(report_name, filters):
+	filters = {k: v for k, v in dict(filters).items() if k != RUN_FILTER}
+	filters_hash = get_filters_hash(filters)
+	data_version = get_data_version(filters.get("company"))
+
+	name = frappe.db.get_value(
+		"Capital Report Run",
+		{
+			"report_name": report_name,
+			"filters_hash": filters_hash,
+			"data_version": data_version,
+			"status": ("in", ("Queued", "Running", "Completed", "Failed")),
+		},
+		"name",
+		order_by="creation desc",
+	)
+	if name:
+		run = frappe.get_doc("Capital Report Run", name)
+		if not is_stalled(run):
+			return run
+		run.db_set({"status": "Failed", "error": _("The background job stopped without finishing.")})
+
+	run = frappe.get_doc({
+		"doctype": "Capital Report Run",
+		"report_name": report_name,
+		"company": filters.get("company"),
+		"filters": frappe.as_json(filters),
+		"filters_hash": filters_hash,
+		"data_version": data_version,
+		"status": "Queued",
+	}).insert(ignore_permissions=True)
+
+	enqueue_run(run)
+	return run
+
+
+def enqueue_run(run):
+	frappe.enqueue(
+		"upande_sphynx.upande_sphynx.doctype.capital_report_run.capital_report_run.generate",
+		queue="long",
+		timeout=JOB_TIMEOUT,
+		job_id=f"capital_report_run::{run.name}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		run_name=run.name,
+	)
+
+
+@frappe.whitelist()
+def retry(run_name):
+	"""Queue a failed run again, for the run's "Retry" button."""
+	run = frappe.get_doc("Capital Report Run", run_name)
+	run.check_permission("read")
+
+	if run.status != "Failed":
+		frappe.throw(_("Only a failed run can be retried"))
+
+	run.db_set({"status": "Queued", "progress": 0, "error": None, "started_at": None})
+	enqueue_run(run)
+
+
+def is_stalled(run):
+	"""A Queued/Running run untouched for longer than the job timeout was
+	lost by its worker (restart, OOM) and will never finish."""
+	if run.status in ("Completed", "Failed"):
+		return False
+	return get_datetime(run.modified) < add_to_date(now_datetime(), seconds=-JOB_TIMEOUT)
+
+
+def generate(run_name):
+	"""Background job: compute the report and save its result file."""
+	run = frappe.get_doc("Capital Report Run", run_name)
+	run.db_set({"status": "Running", "started_at": now_datetime(), "progress": 0})
+	frappe.db.commit()
+
+	frappe.flags.in_capital_report_run = run.name
+	try:
+		module = frappe.get_module(BACKGROUND_REPORTS[run.report_name])
+		result = module.execute(frappe._dict(json.loads(run.filters)))
+		columns, data = result[0], result[1]
+
+		content = compress_result(columns, data)
+
+		set_progress(95)
+		file_url = save_result(run, content)
+		run.db_set({
+			"status": "Completed",
+			"progress": 100,
+			"completed_at": now_datetime(),
+			"row_count": len(data),
+			"result_file": file_url,
+		})
+	except Exception:
+		frappe.db.rollback()
+		run.db_set({"status": "Failed", "error": frappe.get_traceback()})
+		run.log_error(_("Capital report run failed"))
+	finally:
+		frappe.flags.in_capital_report_run = None
+
+	frappe.db.commit()
+	publish(run)
+
+
+def set_progress(percent):
+	"""Report progress from inside a background run; a no-op otherwise, so
+	report code can call it unconditionally. Reports report their own query
+	work as 0 to QUERY_PROGRESS."""
+	run_name = frappe.flags.in_capital_report_run
+	if not run_name:
+		return
+
+	frappe.db.set_value("Capital Report Run", run_name, "progress", percent)
+	frappe.db.commit()
+	publish(frappe.get_doc("Capital Report Run", run_name))
+
+
+def publish(run):
+	"""Broadcast to every user, not only the run's owner: anyone whose report
+	reused this run (see get_or_enqueue_run) is waiting on it too. The report
+	scripts ignore events for other reports."""
+	frappe.publish_realtime(
+		REALTIME_EVENT,
+		{
+			"name": run.name,
+			"report_name": run.report_name,
+			"status": run.status,
+			"progress": run.progress,
+		},
+	)
+
+
+def compress_result(columns, data):
+	"""The gzipped {"columns", "data"} JSON load_result reads, written a chunk
+	of rows at a time with a progress update after each."""
+	buffer = io.BytesIO()
+	with gzip.GzipFile(fileobj=buffer, mode="wb") as f:
+		f.write(('{"columns": ' + frappe.as_json(columns, indent=None) + ', "data": [').encode())
+		for start in range(0, len(data), RESULT_CHUNK_SIZE):
+			rows = data[start:start + RESULT_CHUNK_SIZE]
+			f.write(((", " if start else "") + ", ".join(frappe.as_json(row, indent=None) for row in rows)).encode())
+			set_progress(QUERY_PROGRESS + (95 - QUERY_PROGRESS) * (start + len(rows)) // len(data))
+		f.write(b"]}")
+	return buffer.getvalue()
+
+
+def save_result(run, content):
+	_file = frappe.get_doc({
+		"doctype": "File",
+		"file_name": f"{run.name}.json.gz",
+		"attached_to_doctype": run.doctype,
+		"attached_to_name": run.name,
+		"attached_to_field": "result_file",
+		"is_private": 1,
+		"content": content,
+	})
+	_file.save(ignore_permissions=True)
+	return _file.file_url
+
+
+def load_result(run):
+	_file = frappe.get_doc("File", {"file_url": run.result_file, "attached_to_name": run.name})
+	return json.loads(gzip.decompress(_file.get_content()))
+
+
+def get_saved_run_result(run_name, report_name):
+	"""(columns, data, message) of a specific finished run, for the run's
+	"Open Report" button. Shown even if the data has changed since."""
+	run = frappe.get_doc("Capital Report Run", run_name)
+	run.check_permission("read")
+
+	if run.report_name != report_name or run.status != "Completed":
+		frappe.throw(_("{0} is not a finished run of {1}").format(run_name, report_name))
+
+	result = load_result(run)
+	message = _("Showing saved run {0}, generated {1}. Clear the Saved Run filter to run the report again.")
+	return result["columns"], result["data"], message.format(run.name, frappe.utils.pretty_date(run.completed_at))
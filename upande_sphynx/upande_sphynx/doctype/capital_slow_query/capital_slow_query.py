@@ -0,0 +1,10 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+#
+# One row per query fingerprint, written by upande_sphynx.slow_query.
+
+from frappe.model.document import Document
+
+
+class CapitalSlowQuery(Document):
+	pass
@@ -11,6 +11,7 @@ from frappe.model.document import Document
 import frappe
 from frappe import _
 from upande_sphynx.api.capital_management import recalculate_shareholder_totals
+from upande_sphynx.upande_sphynx.doctype.capital_event.capital_event import record_reversals
 
 class ConvertibleLoanNote(Document):
     
@@ -37,6 +38,9 @@ class ConvertibleLoanNote(Document):
         
         # Step 5: Update status
         self.db_set("status", "Cancelled", update_modified=False)
+
+        # Step 6: Reverse its disbursement, accrual and repayment events
+        record_reversals("Convertible Loan Note", self.name)
         
         frappe.db.commit()
     
@@ -0,0 +1,19 @@
+// Copyright (c) 2026, Jeniffer and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("Funding Round Close", {
+	refresh(frm) {
+		frm.add_custom_button(__("Share Agreements"), () => {
+			frappe.set_route("List", "Share Agreement", {
+				name: ["in", JSON.parse(frm.doc.share_agreements || "[]")],
+			});
+		}, __("View"));
+
+		if (["Queued", "Running"].includes(frm.doc.status)) {
+			frappe.realtime.off("funding_round_close");
+			frappe.realtime.on("funding_round_close", (data) => {
+				if (data.name === frm.doc.name) frm.reload_doc();
+			});
+		}
+	},
+});
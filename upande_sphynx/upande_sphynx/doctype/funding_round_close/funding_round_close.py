@@ -0,0 +1,310 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+#
+# Closing a funding round: issue the shares of many submitted Share
+# Agreements in one background job, instead of one issue_shares_from_agreement
+# round trip (create, recompute, commit) per subscriber.
+#
+# The job reserves each share class's certificates as one contiguous block up
+# front, then creates and submits the Share Movements in chunks, one
+# transaction per chunk, with a savepoint per agreement so one bad agreement
+# only fails itself. Each chunk first locks its agreements and skips any that
+# another close (over an overlapping selection) has issued meanwhile, so an
+# agreement is never issued twice. The agreements of a chunk are linked to their movements
+# with a single UPDATE. Journal Entries go through the Capital JE Posting
+# outbox (anything that fails there is retried by its scheduler), and every
+# holder's totals are recomputed once at the end. Progress, counts and the
+# per-agreement results are kept on the Funding Round Close document.
+
+import json
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import create_batch, cstr, now, now_datetime
+
+from upande_sphynx.api.capital_management import (
+	get_exchange_rate,
+	make_share_movement_from_agreement,
+	recalculate_shareholder_totals,
+)
+from upande_sphynx.upande_sphynx.doctype.capital_je_posting.capital_je_posting import process_posting
+from upande_sphynx.upande_sphynx.doctype.share_certificate_series.share_certificate_series import (
+	allocate_certificate_numbers,
+)
+from upande_sphynx.upande_sphynx.doctype.share_movement.share_movement import (
+	count_certificates,
+	describe_certificate_block,
+)
+
+CHUNK_SIZE = 50
+JOB_TIMEOUT = 2 * 60 * 60
+REALTIME_EVENT = "funding_round_close"
+
+
+class FundingRoundClose(Document):
+	pass
+
+
+@frappe.whitelist()
+def close_funding_round(company, funding_round=None, share_agreements=None):
+	"""Queue the issuance of a round's shares. Takes either `share_agreements`
+	(a list of names) or `funding_round`, meaning every submitted agreement
+	of that round not yet issued. Returns the Funding Round Close name."""
+	frappe.has_permission("Share Movement", "create", throw=True)
+
+	if share_agreements:
+		share_agreements = frappe.parse_json(share_agreements)
+	elif not funding_round:
+		frappe.throw(_("Select the Share Agreements to issue, or a Funding Round"))
+
+	agreements = get_open_agreements(company, funding_round, share_agreements)
+	if not agreements:
+		frappe.throw(_("No submitted Share Agreements without issued shares were found"))
+
+	# Only stops the same close being queued twice. A close over selected
+	# agreements and one over their funding round can still overlap; the row
+	# locks in issue_round keep them from issuing an agreement twice.
+	running = frappe.db.get_value(
+		"Funding Round Close",
+		{"company": company, "funding_round": funding_round or "", "status": ("in", ("Queued", "Running"))},
+	)
+	if running:
+		frappe.throw(_("Funding round close {0} is already in progress").format(running))
+
+	close = frappe.get_doc({
+		"doctype": "Funding Round Close",
+		"company": company,
+		"funding_round": funding_round or "",
+		"status": "Queued",
+		"agreement_count": len(agreements),
+		"share_agreements": frappe.as_json(agreements),
+	}).insert(ignore_permissions=True)
+
+	frappe.enqueue(
+		"upande_sphynx.upande_sphynx.doctype.funding_round_close.funding_round_close.run_close",
+		queue="long",
+		timeout=JOB_TIMEOUT,
+		job_id=f"funding_round_close::{close.name}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		close_name=close.name,
+	)
+	return close.name
+
+
+def get_open_agreements(company, funding_round=None, share_agreements=None):
+	filters = {"company": company, "docstatus": 1, "share_movement_ref": ("is", "not set")}
+	if share_agreements:
+		filters["name"] = ("in", share_agreements)
+	else:
+		filters["funding_round"] = funding_round
+	return frappe.get_all("Share Agreement", filters=filters, order_by="agreement_date, name", pluck="name")
+
+
+def run_close(close_name):
+	"""Background job for one Funding Round Close."""
+	close = frappe.get_doc("Funding Round Close", close_name)
+	close.db_set({"status": "Running", "started_at": now_datetime(), "progress": 0})
+	frappe.db.commit()
+
+	results = []
+	try:
+		issue_round(close, results)
+		close.db_set({"status": "Completed", "progress": 100, "completed_at": now_datetime()})
+	except Exception:
+		frappe.db.rollback()
+		close.db_set({"status": "Failed", "error": frappe.get_traceback(), "completed_at": now_datetime()})
+		close.log_error(_("Funding round close failed"))
+
+	frappe.clear_messages()
+	close.db_set("results", frappe.as_json(results))
+	frappe.db.commit()
+	publish(close)
+
+
+def issue_round(close, results):
+	agreements = frappe.get_all(
+		"Share Agreement",
+		filters={
+			"name": ("in", json.loads(close.share_agreements)),
+			"docstatus": 1,
+			"share_movement_ref": ("is", "not set"),
+		},
+		fields=["*"],
+		order_by="agreement_date, name",
+	)
+
+	company_shareholder = frappe.db.get_value("Shareholder", {"company": close.company}, "name")
+	if not company_shareholder:
+		frappe.throw(_("Company shareholder not found. Please create a Shareholder record for the company"))
+	company_currency = frappe.get_cached_value("Company", close.company, "default_currency")
+
+	exchange_rates = get_exchange_rates(agreements, company_currency)
+	certificate_starts = reserve_certificates(close.company, agreements)
+
+	movements = {}
+	for chunk in create_batch(agreements, CHUNK_SIZE):
+		issued = {}
+		open_agreements = lock_open_agreements([agreement.name for agreement in chunk])
+		for agreement in chunk:
+			if agreement.name not in open_agreements:
+				results.append({
+					"share_agreement": agreement.name,
+					"status": "skipped",
+					"error": _("Already issued by another close"),
+				})
+				continue
+
+			frappe.db.savepoint("funding_round_close")
+			try:
+				sm = make_share_movement_from_agreement(
+					agreement,
+					company_shareholder,
+					company_currency,
+					exchange_rates.get((agreement.transaction_currency or "USD", agreement.agreement_date)),
+				)
+				sm.certificate_numbers = describe_certificate_block(
+					agreement.share_type,
+					certificate_starts[agreement.name],
+					count_certificates(agreement.number_of_shares),
+				)
+				sm.flags.skip_shareholder_totals = True
+				sm.flags.defer_journal_entry = True
+				sm.insert(ignore_permissions=True)
+				sm.submit()
+
+				issued[agreement.name] = sm.name
+				movements[sm.name] = agreement.shareholder
+				results.append({"share_agreement": agreement.name, "status": "success", "share_movement": sm.name})
+
+			except Exception as e:
+				frappe.db.rollback(save_point="funding_round_close")
+				results.append({"share_agreement": agreement.name, "status": "failed", "error": cstr(e)})
+
+		link_share_movements(issued)
+		close.db_set({
+			"issued_count": len(movements),
+			"failed_count": sum(1 for result in results if result["status"] == "failed"),
+			"progress": 80 * len(results) / len(agreements),
+		})
+		frappe.db.commit()
+		publish(close)
+
+	close.db_set("journal_entry_count", post_journal_entries(list(movements)))
+	close.db_set("progress", 95)
+	frappe.db.commit()
+	publish(close)
+
+	for shareholder in sorted(set(movements.values()) | {company_shareholder}):
+		recalculate_shareholder_totals(shareholder)
+	frappe.db.commit()
+
+
+def lock_open_agreements(names):
+	"""Lock the agreements until the chunk commits and return the ones still
+	without a Share Movement. A close that issued some of them first holds
+	their locks until it has linked them, so this waits for it and then sees
+	them as issued."""
+	return set(frappe.db.sql_list(
+		"""
+		SELECT name
+		FROM `tabShare Agreement`
+		WHERE name IN %(names)s
+			AND docstatus = 1
+			AND IFNULL(share_movement_ref, '') = ''
+		ORDER BY name
+		FOR UPDATE
+		""",
+		{"names": names},
+	))
+
+
+def get_exchange_rates(agreements, company_currency):
+	"""One rate lookup per (currency, date) among the agreements that don't
+	carry their own rate."""
+	rates = {}
+	for agreement in agreements:
+		currency = agreement.transaction_currency or "USD"
+		key = (currency, agreement.agreement_date)
+		if agreement.exchange_rate or currency == company_currency or key in rates:
+			continue
+		rates[key] = get_exchange_rate(currency, company_currency, agreement.agreement_date)
+	return rates
+
+
+def reserve_certificates(company, agreements):
+	"""Reserve one contiguous block of certificate numbers per share class
+	for the whole round and hand it out in agreement order. Returns
+	{agreement: first certificate number}. Committed straight away so the
+	series lock isn't held for the rest of the job; an agreement that then
+	fails to issue leaves its numbers unused."""
+	by_class = {}
+	for agreement in agreements:
+		by_class.setdefault(agreement.share_type, []).append(agreement)
+
+	starts = {}
+	for share_class, class_agreements in by_class.items():
+		counts = [count_certificates(a.number_of_shares) for a in class_agreements]
+		number = allocate_certificate_numbers(company, share_class, sum(counts))
+		for agreement, count in zip(class_agreements, counts, strict=True):
+			starts[agreement.name] = number
+			number += count
+
+	frappe.db.commit()
+	return starts
+
+
+def link_share_movements(issued):
+	"""Point many Share Agreements at their Share Movements in one UPDATE."""
+	if not issued:
+		return
+
+	cases = " ".join(["WHEN %s THEN %s"] * len(issued))
+	placeholders = ", ".join(["%s"] * len(issued))
+	values = [value for pair in issued.items() for value in pair]
+
+	frappe.db.sql(
+		f"""
+		UPDATE `tabShare Agreement`
+		SET share_movement_ref = CASE name {cases} END,
+			status = 'Shares Issued',
+			modified = %s
+		WHERE name IN ({placeholders})
+		""",
+		[*values, now(), *issued],
+	)
+
+
+def post_journal_entries(share_movements):
+	"""Work through the round's queued Journal Entry postings in batches.
+	Returns how many were posted; the rest stay in the outbox for retry."""
+	posted = 0
+	for batch in create_batch(share_movements, CHUNK_SIZE):
+		postings = frappe.get_all(
+			"Capital JE Posting",
+			filters={"reference_doctype": "Share Movement", "reference_name": ("in", list(batch))},
+			pluck="name",
+		)
+		if not postings:
+			continue
+
+		for posting_name in postings:
+			process_posting(posting_name)
+		posted += frappe.db.count("Capital JE Posting", {"name": ("in", postings), "status": "Posted"})
+	return posted
+
+
+def publish(close):
+	frappe.publish_realtime(
+		REALTIME_EVENT,
+		{
+			"name": close.name,
+			"funding_round": close.funding_round,
+			"status": close.status,
+			"progress": close.progress,
+			"issued_count": close.issued_count,
+			"failed_count": close.failed_count,
+		},
+		user=close.owner,
+	)
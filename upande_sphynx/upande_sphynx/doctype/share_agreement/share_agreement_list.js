@@ -0,0 +1,58 @@
+// Copyright (c) 2026, Jeniffer and contributors
+// For license information, please see license.txt
+
+// Close Funding Round: issue the shares of many submitted agreements in one
+// background job (see funding_round_close.py), either the selected rows or
+// every open agreement of a round.
+
+frappe.listview_settings['Share Agreement'] = {
+    onload: function(listview) {
+        listview.page.add_action_item(__('Close Funding Round'), function() {
+            const selected = listview.get_checked_items();
+            const companies = [...new Set(selected.map((row) => row.company))];
+            if (companies.length !== 1) {
+                frappe.msgprint(__('Select agreements of one company.'));
+                return;
+            }
+            close_funding_round({
+                company: companies[0],
+                share_agreements: selected.map((row) => row.name),
+            });
+        });
+
+        listview.page.add_menu_item(__('Close Funding Round'), function() {
+            frappe.prompt([
+                {
+                    fieldname: 'company',
+                    label: __('Company'),
+                    fieldtype: 'Link',
+                    options: 'Company',
+                    reqd: 1,
+                    default: frappe.defaults.get_user_default('Company'),
+                },
+                {
+                    fieldname: 'funding_round',
+                    label: __('Funding Round'),
+                    fieldtype: 'Data',
+                    reqd: 1,
+                },
+            ], (values) => close_funding_round(values), __('Close Funding Round'), __('Issue Shares'));
+        });
+    },
+};
+
+function close_funding_round(args) {
+    frappe.call({
+        method: 'upande_sphynx.upande_sphynx.doctype.funding_round_close.funding_round_close.close_funding_round',
+        args: args,
+        freeze: true,
+        callback: function(r) {
+            if (r.exc) return;
+            frappe.show_alert({
+                message: __('Issuing shares in the background: {0}',
+                    [frappe.utils.get_form_link('Funding Round Close', r.message, true)]),
+                indicator: 'blue',
+            });
+        },
+    });
+}
@@ -0,0 +1,200 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+#
+# Certificate ledger. Each row is a contiguous range of certificate numbers
+# (cert_start..cert_end) of one share class, held by one shareholder, and is:
+#
+# - Live: the holder's certificates right now.
+# - Split: partly used up by an outflow; its numbers are now covered by the
+#   child rows that name it in split_from (one Retired, maybe one Live).
+# - Retired: cancelled by an outflow (a buyback).
+#
+# Every certificate number in a row holds SHARES_PER_CERTIFICATE shares
+# except the last, which holds the remainder. Share Movement keeps the
+# ledger current on submit (apply_movement) and undoes its own changes on
+# cancel (reverse_movement), so "which certificates are live, and whose are
+# they" is a lookup on (company, share_class, shareholder, status) rather
+# than a replay of every movement.
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+
+from upande_sphynx.upande_sphynx.doctype.share_certificate_series.share_certificate_series import (
+	allocate_certificate_numbers,
+)
+
+SHARES_PER_CERTIFICATE = 100
+
+# Movements that cancel the from_shareholder's existing certificates. Every
+# other type (Share Purchase, Equity Capital Injection, Loan Equity
+# Injection) is an issuance: it names the company's own shareholder as
+# from_shareholder but creates new shares, so it neither retires nor locks
+# anything on that side. Holder-to-holder transfers are ERPNext Share
+# Transfers, which do not go through this ledger.
+RETIRING_MOVEMENT_TYPES = ("Share Buyback",)
+
+
+class ShareCertificate(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Share Certificate", ["company", "share_class", "shareholder", "status"])
+	frappe.db.add_index("Share Certificate", ["company", "share_class", "cert_start"])
+	frappe.db.add_index("Share Certificate", ["issued_by"])
+	frappe.db.add_index("Share Certificate", ["retired_by"])
+
+
+def format_certificate_number(share_class, number):
+	return "CERT-{}-{:05d}".format(share_class or "SHARE", number)
+
+
+def format_certificate_range(share_class, cert_start, cert_end):
+	if cert_start == cert_end:
+		return format_certificate_number(share_class, cert_start)
+	return _("{0} to {1}").format(
+		format_certificate_number(share_class, cert_start), format_certificate_number(share_class, cert_end)
+	)
+
+
+def get_certificate_shares(cert, number):
+	"""Shares held by one certificate number within a ledger row."""
+	if number < cert.cert_end:
+		return SHARES_PER_CERTIFICATE
+	return cert.shares - SHARES_PER_CERTIFICATE * (cert.cert_end - cert.cert_start)
+
+
+def apply_movement(sm):
+	"""Update the ledger for a submitted Share Movement: for buybacks,
+	retire (splitting where needed) the shares leaving from_shareholder; then
+	issue the movement's own certificate ranges to to_shareholder."""
+	if (
+		sm.movement_type in RETIRING_MOVEMENT_TYPES
+		and sm.from_shareholder
+		and sm.from_shareholder != sm.to_shareholder
+	):
+		retire_shares(sm, sm.from_shareholder, sm.number_of_shares)
+
+	remaining = sm.number_of_shares
+	for cert_range in sorted(sm.get("certificate_ranges") or [], key=lambda r: r.cert_start):
+		shares = min(remaining, SHARES_PER_CERTIFICATE * (cert_range.cert_end - cert_range.cert_start + 1))
+		if shares <= 0:
+			break
+		make_certificate(sm, sm.to_shareholder, cert_range.cert_start, cert_range.cert_end, shares)
+		remaining -= shares
+
+
+def retire_shares(sm, shareholder, qty):
+	"""Retire `qty` shares of the holder's live certificates, oldest numbers
+	first. A row only partly needed is split: the numbers used up become a
+	Retired child row, the untouched tail stays Live as another child row,
+	and any shares left on a partly-used certificate are reissued to the
+	holder as a new balance certificate."""
+	live = frappe.db.sql(
+		"""
+		SELECT name, cert_start, cert_end, shares
+		FROM `tabShare Certificate`
+		WHERE company = %s AND share_class = %s AND shareholder = %s AND status = 'Live'
+		ORDER BY cert_start
+		FOR UPDATE
+		""",
+		(sm.company, sm.share_class, shareholder),
+		as_dict=True,
+	)
+
+	balance = 0
+	for cert in live:
+		if qty <= 0:
+			break
+
+		if qty >= cert.shares:
+			retire_certificate(cert.name, sm)
+			qty -= cert.shares
+			continue
+
+		full_certificates, remainder = divmod(qty, SHARES_PER_CERTIFICATE)
+		used_end = cert.cert_start + full_certificates - 1
+		if remainder:
+			used_end += 1
+			balance = get_certificate_shares(cert, used_end) - remainder
+		used_shares = qty + balance
+
+		retire_certificate(cert.name, sm, status="Split")
+		make_certificate(
+			sm, shareholder, cert.cert_start, used_end, used_shares, status="Retired", split_from=cert.name
+		)
+		if used_end < cert.cert_end:
+			make_certificate(
+				sm, shareholder, used_end + 1, cert.cert_end, cert.shares - used_shares, split_from=cert.name
+			)
+		qty = 0
+
+	if balance:
+		number = allocate_certificate_numbers(sm.company, sm.share_class, 1)
+		make_certificate(sm, shareholder, number, number, balance)
+
+	if qty > 0:
+		frappe.msgprint(
+			_("{0} has no live certificates for {1} of the {2} {3} shares leaving them, so none were retired for those.").format(
+				shareholder, qty, sm.number_of_shares, sm.share_class
+			),
+			indicator="orange",
+			alert=True,
+		)
+
+
+def retire_certificate(name, sm, status="Retired"):
+	frappe.db.set_value(
+		"Share Certificate",
+		name,
+		{"status": status, "retired_by": sm.name, "retire_date": sm.transaction_date},
+		update_modified=False,
+	)
+
+
+def make_certificate(sm, shareholder, cert_start, cert_end, shares, status="Live", split_from=None):
+	frappe.get_doc({
+		"doctype": "Share Certificate",
+		"title": format_certificate_range(sm.share_class, cert_start, cert_end),
+		"company": sm.company,
+		"share_class": sm.share_class,
+		"shareholder": shareholder,
+		"status": status,
+		"cert_start": cert_start,
+		"cert_end": cert_end,
+		"shares": shares,
+		"issued_by": sm.name,
+		"issue_date": sm.transaction_date,
+		"split_from": split_from,
+		"retired_by": sm.name if status == "Retired" else None,
+		"retire_date": sm.transaction_date if status == "Retired" else None,
+	}).insert(ignore_permissions=True)
+
+
+def reverse_movement(sm):
+	"""Undo apply_movement for a cancelled Share Movement: drop every row it
+	created and bring back the rows it retired or split. Refused while a
+	later movement has already moved certificates this one issued."""
+	created = frappe.get_all(
+		"Share Certificate",
+		filters={"issued_by": sm.name},
+		fields=["name", "title", "status", "retired_by"],
+	)
+	moved_on = [c for c in created if c.status != "Live" and c.retired_by != sm.name]
+	if moved_on:
+		frappe.throw(
+			_("Certificates {0} issued by this movement have since been retired by {1}. Cancel that movement first.").format(
+				", ".join(c.title for c in moved_on), ", ".join(sorted({c.retired_by for c in moved_on}))
+			)
+		)
+
+	frappe.db.delete("Share Certificate", {"issued_by": sm.name})
+	frappe.db.sql(
+		"""
+		UPDATE `tabShare Certificate`
+		SET status = 'Live', retired_by = NULL, retire_date = NULL
+		WHERE retired_by = %s
+		""",
+		sm.name,
+	)
@@ -0,0 +1,55 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+#
+# Child table of Share Movement: the certificate numbers a movement issued,
+# as (share_class, cert_start, cert_end) ranges. certificate_numbers stays as
+# the human-readable text; these rows are what the Share Certificate ledger
+# issues to the holder on submit, and are indexed on (company, share_class,
+# cert_start) for lookups by number.
+
+import re
+
+import frappe
+from frappe.model.document import Document
+
+CERTIFICATE_NUMBER = re.compile(r"-(\d{5,})\b")
+
+
+class ShareCertificateRange(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Share Certificate Range", ["company", "share_class", "cert_start"])
+
+
+def parse_certificate_ranges(certificate_numbers):
+	"""Turn certificate_numbers text into sorted, merged (start, end) ranges.
+
+	Handles both formats Share Movement has written: a comma-separated list
+	("CERT-A-00001, CERT-A-00002") and a range summary ("CERT-A-00001 to
+	CERT-A-09999 (9999 certificates)"). A comma-separated piece holding two
+	numbers is read as a range; consecutive numbers are merged."""
+	ranges = []
+	for piece in (certificate_numbers or "").split(","):
+		numbers = [int(n) for n in CERTIFICATE_NUMBER.findall(piece)]
+		if len(numbers) == 2:
+			ranges.append((min(numbers), max(numbers)))
+		else:
+			ranges.extend((n, n) for n in numbers)
+
+	merged = []
+	for start, end in sorted(ranges):
+		if merged and start <= merged[-1][1] + 1:
+			merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+		else:
+			merged.append((start, end))
+	return merged
+
+
+def parse_certificate_number(certificate):
+	"""4711, "4711" or "CERT-Ordinary-04711" -> 4711."""
+	if isinstance(certificate, int):
+		return certificate
+	digits = re.search(r"(\d+)\s*$", str(certificate or ""))
+	return int(digits.group(1)) if digits else None
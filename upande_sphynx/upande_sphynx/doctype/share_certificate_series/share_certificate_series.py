@@ -0,0 +1,106 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+#
+# One counter row per (company, share_class) holding the last certificate
+# number handed out. Share Movement used to find the next number by regex-
+# parsing the newest movement's certificate_numbers string, which two
+# concurrent issuances could both read before either saved, and which went
+# wrong whenever that newest row held a "... to ... (n certificates)" range
+# summary. allocate_certificate_numbers instead locks the counter row
+# (SELECT ... FOR UPDATE) and reserves the whole block in one update; the
+# lock is held until the issuing transaction commits or rolls back, so a
+# rolled-back issuance gives its block back. The row itself is created on
+# first use by ensure_series, on a connection of its own (see there).
+
+import re
+
+import frappe
+from frappe.database import get_db
+from frappe.model.document import Document
+
+
+class ShareCertificateSeries(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_unique("Share Certificate Series", ["company", "share_class"])
+
+
+def allocate_certificate_numbers(company, share_class, count):
+	"""Reserve `count` consecutive certificate numbers for the class and
+	return the first one."""
+	ensure_series(company, share_class)
+
+	name, last_number = frappe.db.sql(
+		"""
+		SELECT name, last_number
+		FROM `tabShare Certificate Series`
+		WHERE company = %s AND share_class = %s
+		FOR UPDATE
+		""",
+		(company, share_class),
+	)[0]
+
+	frappe.db.sql(
+		"""UPDATE `tabShare Certificate Series` SET last_number = last_number + %s WHERE name = %s""",
+		(count, name),
+	)
+	return (last_number or 0) + 1
+
+
+def ensure_series(company, share_class):
+	"""Create the counter row on first use, seeded past every certificate
+	number already written for the class.
+
+	The row is inserted and committed on a separate connection, not in the
+	caller's transaction. Two first uses racing an INSERT IGNORE inside their
+	own transactions would each keep a shared lock on the unique
+	(company, share_class) key, and then deadlock upgrading it for the
+	SELECT ... FOR UPDATE in allocate_certificate_numbers. Committed on its
+	own, the insert leaves the caller holding no lock: one row wins the
+	unique key, and every caller then queues on that row's lock. A row left
+	behind by a rolled-back issuance only holds the seed."""
+	if frappe.db.exists("Share Certificate Series", {"company": company, "share_class": share_class}):
+		return
+
+	db = get_db()
+	try:
+		db.sql(
+			"""
+			INSERT IGNORE INTO `tabShare Certificate Series`
+				(name, creation, modified, owner, modified_by, docstatus, idx, company, share_class, last_number)
+			VALUES (%s, NOW(), NOW(), %s, %s, 0, 0, %s, %s, %s)
+			""",
+			(
+				frappe.generate_hash(length=10),
+				frappe.session.user,
+				frappe.session.user,
+				company,
+				share_class,
+				get_legacy_last_number(company, share_class, db),
+			),
+		)
+		db.commit()
+	finally:
+		db.close()
+
+
+def get_legacy_last_number(company, share_class, db=None):
+	"""Highest certificate number in any existing certificate_numbers text
+	for the class — both ends of a range summary are picked up."""
+	last_number = 0
+	for (certificate_numbers,) in (db or frappe.db).sql(
+		"""
+		SELECT certificate_numbers
+		FROM `tabShare Movement`
+		WHERE company = %s
+			AND share_class = %s
+			AND IFNULL(certificate_numbers, '') != ''
+		""",
+		(company, share_class),
+	):
+		numbers = re.findall(r"-(\d{5,})\b", certificate_numbers)
+		if numbers:
+			last_number = max(last_number, *(int(n) for n in numbers))
+	return last_number
@@ -0,0 +1,158 @@
+# Copyright (c) 2026, Jeniffer and Contributors
+# See license.txt
+
+import threading
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import nowdate
+
+from upande_sphynx.upande_sphynx.doctype.share_certificate_series.share_certificate_series import (
+	allocate_certificate_numbers,
+)
+
+TEST_COMPANY = "_Test Company"
+WORKERS = 8
+ALLOCATIONS_PER_WORKER = 5
+SUBMITS_PER_WORKER = 3
+
+# Rows a Share Movement submit leaves behind for its share class.
+SUBMIT_DOCTYPES = (
+	"Share Movement Leg",
+	"Share Certificate",
+	"Share Certificate Range",
+	"Capital Event",
+	"Share Movement",
+)
+
+
+class TestShareCertificateSeries(FrappeTestCase):
+	def setUp(self):
+		# A class name no real movement uses, so the series starts at 1.
+		self.share_class = f"_Test Class {frappe.generate_hash(length=6)}"
+		self.shareholders = []
+
+	def tearDown(self):
+		frappe.db.rollback()
+		for doctype in SUBMIT_DOCTYPES:
+			frappe.db.delete(doctype, {"share_class": self.share_class})
+		frappe.db.delete("Share Certificate Series", {"share_class": self.share_class})
+		if self.shareholders:
+			frappe.db.delete("Shareholder", {"name": ("in", self.shareholders)})
+		frappe.db.delete("Share Type", {"name": self.share_class})
+		frappe.db.commit()
+
+	def test_sequential_blocks_are_contiguous(self):
+		first = allocate_certificate_numbers(TEST_COMPANY, self.share_class, 3)
+		second = allocate_certificate_numbers(TEST_COMPANY, self.share_class, 10)
+		self.assertEqual(first, 1)
+		self.assertEqual(second, 4)
+
+	def test_parallel_allocations_never_overlap(self):
+		"""Each worker has its own database connection and commits after
+		every allocation, the way concurrent Share Movement submits would."""
+		frappe.db.commit()
+		site = frappe.local.site
+		barrier = threading.Barrier(WORKERS)
+		blocks, errors = [], []
+
+		def worker(size):
+			frappe.init(site=site)
+			frappe.connect()
+			try:
+				barrier.wait()
+				for _i in range(ALLOCATIONS_PER_WORKER):
+					start = allocate_certificate_numbers(TEST_COMPANY, self.share_class, size)
+					frappe.db.commit()
+					blocks.append((start, start + size - 1))
+			except Exception as e:
+				errors.append(e)
+			finally:
+				frappe.destroy()
+
+		threads = [threading.Thread(target=worker, args=(size,)) for size in range(1, WORKERS + 1)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.assertFalse(errors, errors)
+		self.assertEqual(len(blocks), WORKERS * ALLOCATIONS_PER_WORKER)
+
+		numbers = [n for start, end in blocks for n in range(start, end + 1)]
+		self.assertEqual(len(numbers), len(set(numbers)), "a certificate number was handed out twice")
+		# Blocks are reserved back to back: no gaps either.
+		self.assertEqual(sorted(numbers), list(range(1, len(numbers) + 1)))
+
+	def test_parallel_share_movement_submits_get_distinct_numbers(self):
+		"""Concurrent first issuances of a new class, through the real
+		insert-and-submit path: none deadlocks, and no two movements share a
+		certificate number."""
+		frappe.get_doc({"doctype": "Share Type", "title": self.share_class}).insert(ignore_permissions=True)
+		issuer = self.make_shareholder("Issuer")
+		holders = [self.make_shareholder(f"Holder {i}") for i in range(WORKERS)]
+		frappe.db.commit()
+
+		site = frappe.local.site
+		barrier = threading.Barrier(WORKERS)
+		errors = []
+
+		def worker(holder):
+			frappe.init(site=site)
+			frappe.connect()
+			try:
+				barrier.wait()
+				for _i in range(SUBMITS_PER_WORKER):
+					self.submit_issuance(issuer, holder, 250)
+					frappe.db.commit()
+			except Exception as e:
+				errors.append(e)
+			finally:
+				frappe.destroy()
+
+		threads = [threading.Thread(target=worker, args=(holder,)) for holder in holders]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.assertFalse(errors, errors)
+
+		ranges = frappe.get_all(
+			"Share Certificate Range",
+			filters={"parenttype": "Share Movement", "share_class": self.share_class},
+			fields=["parent", "cert_start", "cert_end"],
+		)
+		self.assertEqual(len({r.parent for r in ranges}), WORKERS * SUBMITS_PER_WORKER)
+
+		# 250 shares is three certificates per movement.
+		numbers = [n for r in ranges for n in range(r.cert_start, r.cert_end + 1)]
+		self.assertEqual(len(numbers), len(set(numbers)), "a certificate number was handed out twice")
+		self.assertEqual(sorted(numbers), list(range(1, WORKERS * SUBMITS_PER_WORKER * 3 + 1)))
+
+	def make_shareholder(self, label):
+		name = frappe.get_doc({
+			"doctype": "Shareholder",
+			"title": f"_Test {label} {self.share_class}",
+			"company": TEST_COMPANY,
+		}).insert(ignore_permissions=True).name
+		self.shareholders.append(name)
+		return name
+
+	def submit_issuance(self, from_shareholder, to_shareholder, number_of_shares):
+		frappe.get_doc({
+			"doctype": "Share Movement",
+			"transaction_date": nowdate(),
+			"movement_type": "Equity Capital Injection",
+			"company": TEST_COMPANY,
+			"from_shareholder": from_shareholder,
+			"to_shareholder": to_shareholder,
+			"share_class": self.share_class,
+			"number_of_shares": number_of_shares,
+			"par_value_per_share": 1,
+			"price_per_share": 2,
+			"total_amount": number_of_shares * 2,
+			"exchange_rate": 1,
+			"total_amount_base_currency": number_of_shares * 2,
+			"is_opening_entry": "Yes",
+		}).insert(ignore_permissions=True).submit()
@@ -16,12 +16,13 @@ frappe.ui.form.on('Share Movement', {
             }
         } else if (frm.doc.docstatus === 0 && !frm.doc.__islocal) {
             if (frm.doc.auto_create_journal_entry) {
-                frm.set_intro(__('This Share Movement is still a Draft. Its Journal Entry will be created and submitted automatically when you submit this document.'), 'orange');
+                frm.set_intro(__('This Share Movement is still a Draft. Its Journal Entry will be posted automatically in the background shortly after you submit this document.'), 'orange');
             } else {
                 frm.set_intro(__('This Share Movement is still a Draft. Submit it, then use "Create Journal Entry" (Actions) to record the accounting impact on your books.'), 'orange');
             }
         } else if (frm.doc.docstatus === 1 && !frm.doc.journal_entry_ref) {
             frm.set_intro(__('Submitted, but no Journal Entry exists yet. Use "Create Journal Entry" (Actions) to record this in your books.'), 'blue');
+            show_queued_posting(frm);
         } else {
             frm.set_intro();
         }
@@ -37,13 +38,33 @@ frappe.ui.form.on('Share Movement', {
         }
 
         if (frm.doc.auto_create_journal_entry) {
-            frappe.msgprint(__('This Share Movement\'s Journal Entry will now be created and submitted automatically as soon as you submit this document.'));
+            frappe.msgprint(__('This Share Movement\'s Journal Entry will now be posted automatically in the background as soon as you submit this document.'));
         } else {
             frappe.msgprint(__('You\'ll need to create the Journal Entry yourself after submitting — use "Create Journal Entry" under Actions.'));
         }
     }
 });
 
+// A queued Journal Entry (Capital JE Posting) replaces the "no Journal Entry
+// yet" intro with where the posting is at.
+function show_queued_posting(frm) {
+    frappe.db.get_value('Capital JE Posting',
+        { reference_doctype: 'Share Movement', reference_name: frm.doc.name },
+        ['name', 'status', 'next_attempt_at'],
+        function(r) {
+            if (!r || !r.name) return;
+            if (['Pending', 'Processing'].includes(r.status)) {
+                frm.set_intro(__('The Journal Entry is being posted in the background. Reload in a moment.'), 'blue');
+            } else if (r.status === 'Failed') {
+                frm.set_intro(__('Posting the Journal Entry failed and will be retried at {0}. See {1}.',
+                    [frappe.datetime.str_to_user(r.next_attempt_at), frappe.utils.get_form_link('Capital JE Posting', r.name, true)]), 'orange');
+            } else if (r.status === 'Dead') {
+                frm.set_intro(__('Posting the Journal Entry failed repeatedly and has stopped. See {0}, or use "Create Journal Entry" (Actions).',
+                    [frappe.utils.get_form_link('Capital JE Posting', r.name, true)]), 'red');
+            }
+        });
+}
+
 frappe.ui.form.on('Share Movement', {
     refresh: function(frm) {
         // Add Cancel button for submitted documents
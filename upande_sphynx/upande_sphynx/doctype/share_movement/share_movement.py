@@ -1,12 +1,30 @@
 # Copyright (c) 2025, Jeniffer and contributors
 # For license information, please see license.txt
 
-import re
-
 import frappe
 from frappe import _
 from frappe.model.document import Document
 from upande_sphynx.api.capital_management import recalculate_shareholder_totals
+from upande_sphynx.upande_sphynx.doctype.capital_event.capital_event import (
+    record_reversals,
+    record_share_movement,
+)
+from upande_sphynx.upande_sphynx.doctype.capital_je_posting.capital_je_posting import (
+    cancel_postings,
+    enqueue_posting,
+)
+from upande_sphynx.upande_sphynx.doctype.share_certificate_series.share_certificate_series import (
+    allocate_certificate_numbers,
+)
+from upande_sphynx.upande_sphynx.doctype.share_certificate.share_certificate import (
+    SHARES_PER_CERTIFICATE,
+    apply_movement,
+    reverse_movement,
+)
+from upande_sphynx.upande_sphynx.doctype.share_certificate_range.share_certificate_range import (
+    parse_certificate_ranges,
+)
+from upande_sphynx.upande_sphynx.doctype.share_movement_leg.share_movement_leg import make_legs, remove_legs
 
 # Movement types that increase a shareholder's holding and should get certificate numbers.
 ISSUANCE_MOVEMENT_TYPES = ["Equity Capital Injection", "Share Purchase", "Loan Equity Injection"]
@@ -17,6 +35,7 @@ class ShareMovement(Document):
     def validate(self):
         self.validate_source_document()
         self.generate_certificate_numbers()
+        self.set_certificate_ranges()
 
         # Opening entries never get a Journal Entry — don't let the checkbox
         # claim otherwise, regardless of what the client sent.
@@ -60,47 +79,9 @@ class ShareMovement(Document):
         if not (self.is_new() and not self.certificate_numbers and self.movement_type in ISSUANCE_MOVEMENT_TYPES):
             return
 
-        last_cert = frappe.db.sql("""
-            SELECT certificate_numbers
-            FROM `tabShare Movement`
-            WHERE company = %s
-            AND share_class = %s
-            AND certificate_numbers IS NOT NULL
-            AND certificate_numbers != ''
-            ORDER BY creation DESC
-            LIMIT 1
-        """, (self.company, self.share_class))
-
-        start_num = 1
-        if last_cert and last_cert[0][0]:
-            try:
-                last_cert_str = last_cert[0][0]
-                numbers_found = re.findall(r"-(\d{5,})\b", last_cert_str)
-                if numbers_found:
-                    start_num = max(int(n) for n in numbers_found) + 1
-            except Exception:
-                start_num = 1
-
-        shares_per_cert = 100  # Can be customized
-        num_certificates = max(1, (self.number_of_shares + shares_per_cert - 1) // shares_per_cert)
-        end_num = start_num + num_certificates - 1
-        share_class_label = self.share_class or "SHARE"
-
-        # Listing every certificate out as "CERT-x-00001, CERT-x-00002, ..." blows
-        # past the certificate_numbers column's size for large issuances (each
-        # entry is ~30 bytes, so a few thousand certificates overflow it). Past a
-        # reasonable count, collapse to a range instead of enumerating each one.
-        MAX_LISTED_CERTIFICATES = 20
-        if num_certificates <= MAX_LISTED_CERTIFICATES:
-            cert_numbers = [
-                "CERT-{0}-{1:05d}".format(share_class_label, start_num + i)
-                for i in range(num_certificates)
-            ]
-            self.certificate_numbers = ", ".join(cert_numbers)
-        else:
-            self.certificate_numbers = _("CERT-{0}-{1:05d} to CERT-{0}-{2:05d} ({3} certificates)").format(
-                share_class_label, start_num, end_num, num_certificates
-            )
+        num_certificates = count_certificates(self.number_of_shares)
+        start_num = allocate_certificate_numbers(self.company, self.share_class, num_certificates)
+        self.certificate_numbers = describe_certificate_block(self.share_class, start_num, num_certificates)
 
         frappe.msgprint(
             _("Certificate Numbers auto-generated: {0}").format(self.certificate_numbers),
@@ -108,14 +89,35 @@ class ShareMovement(Document):
             alert=True
         )
 
+    def set_certificate_ranges(self):
+        """Mirror certificate_numbers into the certificate_ranges table that
+        certificate lookups read — whether the numbers were just generated or
+        typed in by hand. Left alone once filled (amendments copy theirs)."""
+        if self.certificate_ranges or not self.certificate_numbers:
+            return
+
+        for cert_start, cert_end in parse_certificate_ranges(self.certificate_numbers):
+            self.append("certificate_ranges", {
+                "company": self.company,
+                "share_class": self.share_class,
+                "cert_start": cert_start,
+                "cert_end": cert_end,
+            })
+
     def on_submit(self):
-        """Keep the to/from Shareholder's holdings and investment totals
-        current, and auto-create the Journal Entry if the user opted in via
+        """Keep the to/from Shareholder's holdings, live certificates and
+        investment totals current, and queue the Journal Entry if the user opted in via
         "Auto-create Journal Entry on Submit" (never for Opening Entries —
         validate() already forces the checkbox off for those)."""
-        recalculate_shareholder_totals(self.to_shareholder)
-        if self.from_shareholder:
-            recalculate_shareholder_totals(self.from_shareholder)
+        make_legs(self)
+        apply_movement(self)
+        record_share_movement(self)
+
+        # A funding round close recomputes each holder once at the end instead.
+        if not self.flags.skip_shareholder_totals:
+            recalculate_shareholder_totals(self.to_shareholder)
+            if self.from_shareholder:
+                recalculate_shareholder_totals(self.from_shareholder)
 
         # Opening Entries never get a Journal Entry (validate() already forces
         # auto_create_journal_entry off for them), so nothing else will ever
@@ -133,18 +135,13 @@ class ShareMovement(Document):
         if self.amended_from and self.source_document_type and self.source_document_name:
             self.relink_source_document()
 
+        # The Journal Entry is posted by a background worker once this submit
+        # commits (see capital_je_posting); failures are retried there and
+        # end up in the Capital JE Posting list rather than a lost msgprint.
         if self.auto_create_journal_entry and not self.journal_entry_ref:
-            from upande_sphynx.api.capital_management import create_journal_entry_from_share_movement
-            try:
-                create_journal_entry_from_share_movement(self.name)
-            except Exception:
-                frappe.log_error(frappe.get_traceback(), "Share Movement auto Journal Entry creation failed")
-                frappe.msgprint(
-                    _("Could not automatically create the Journal Entry for this Share Movement — "
-                      "use Create Journal Entry from the Actions menu instead."),
-                    indicator="orange",
-                    alert=True
-                )
+            enqueue_posting(
+                "Share Movement", self.name, self.company, enqueue=not self.flags.defer_journal_entry
+            )
 
     def on_cancel(self):
         """Cancel forward documents (the Journal Entry this movement created).
@@ -158,7 +155,15 @@ class ShareMovement(Document):
         Share Agreement/CLN still links to it. If this movement is later
         amended and resubmitted, on_submit's relink_source_document restores
         the reference.
+
+        Certificates this movement retired or split are restored first — and
+        the cancel refused if a later movement has already moved the ones it
+        issued (see share_certificate.reverse_movement).
         """
+        reverse_movement(self)
+        cancel_postings("Share Movement", self.name)
+        record_reversals("Share Movement", self.name)
+
         if self.journal_entry_ref:
             try:
                 je = frappe.get_doc("Journal Entry", self.journal_entry_ref)
@@ -171,6 +176,8 @@ class ShareMovement(Document):
 
         self.db_set("status", "Cancelled", update_modified=False)
 
+        remove_legs(self)
+
         recalculate_shareholder_totals(self.to_shareholder)
         if self.from_shareholder:
             recalculate_shareholder_totals(self.from_shareholder)
@@ -247,3 +254,27 @@ class ShareMovement(Document):
             except Exception:
                 # don't block trashing if cleanup fails
                 pass
+
+
+def count_certificates(number_of_shares):
+    """Certificates needed for an issuance of `number_of_shares`."""
+    return max(1, (number_of_shares + SHARES_PER_CERTIFICATE - 1) // SHARES_PER_CERTIFICATE)
+
+
+def describe_certificate_block(share_class, start_num, num_certificates):
+    """certificate_numbers text for a block of consecutive certificates."""
+    share_class_label = share_class or "SHARE"
+
+    # Listing every certificate out as "CERT-x-00001, CERT-x-00002, ..." blows
+    # past the certificate_numbers column's size for large issuances (each
+    # entry is ~30 bytes, so a few thousand certificates overflow it). Past a
+    # reasonable count, collapse to a range instead of enumerating each one.
+    MAX_LISTED_CERTIFICATES = 20
+    if num_certificates <= MAX_LISTED_CERTIFICATES:
+        return ", ".join(
+            "CERT-{0}-{1:05d}".format(share_class_label, start_num + i)
+            for i in range(num_certificates)
+        )
+    return _("CERT-{0}-{1:05d} to CERT-{0}-{2:05d} ({3} certificates)").format(
+        share_class_label, start_num, start_num + num_certificates - 1, num_certificates
+    )
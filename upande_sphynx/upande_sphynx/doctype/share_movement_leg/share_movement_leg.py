@@ -0,0 +1,146 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+#
+# One signed row per holder per submitted Share Movement: +number_of_shares
+# for to_shareholder, -number_of_shares for from_shareholder. Written on
+# Share Movement submit, removed on cancel (see ShareMovement.on_submit /
+# on_cancel), and backfilled for historical movements by
+# upande_sphynx.patches.v1_0.backfill_share_movement_legs.
+#
+# Reports used to derive these legs on the fly by joining Share Movement to
+# an unfiltered UNION of every movement's to- and from-holders, scanning the
+# whole table twice regardless of filters. Reading legs instead is a single
+# range over the (company, shareholder, share_class, transaction_date) index.
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now
+
+LEG_FIELDS = (
+	"name",
+	"creation",
+	"modified",
+	"owner",
+	"modified_by",
+	"docstatus",
+	"idx",
+	"share_movement",
+	"company",
+	"shareholder",
+	"share_class",
+	"transaction_date",
+	"movement_type",
+	"qty",
+	"transaction_currency",
+	"total_amount",
+	"total_amount_base_currency",
+)
+
+
+class ShareMovementLeg(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Share Movement Leg", ["company", "shareholder", "share_class", "transaction_date"])
+	frappe.db.add_index("Share Movement Leg", ["company", "share_class", "transaction_date"])
+	frappe.db.add_index("Share Movement Leg", ["shareholder", "share_class", "transaction_date"])
+	# Date-window scans across every holder and class (cap table diff).
+	frappe.db.add_index("Share Movement Leg", ["company", "transaction_date"])
+
+
+def get_legs(sm):
+	"""Return (shareholder, signed qty, leg suffix) for a Share Movement.
+
+	A movement whose from_shareholder is the same as its to_shareholder only
+	gets the one positive leg — matching how the Shareholder Balance report
+	has always treated that case."""
+	legs = [(sm.to_shareholder, sm.number_of_shares, "IN")]
+	if sm.from_shareholder and sm.from_shareholder != sm.to_shareholder:
+		legs.append((sm.from_shareholder, -sm.number_of_shares, "OUT"))
+	return legs
+
+
+def make_legs(sm_list):
+	"""Insert the legs for one or more submitted Share Movements in a single
+	bulk insert, then refresh the running balance of every (company,
+	shareholder, share_class) they touch."""
+	if not isinstance(sm_list, list | tuple):
+		sm_list = [sm_list]
+
+	timestamp = now()
+	user = frappe.session.user
+	values = []
+	partitions = set()
+
+	for sm in sm_list:
+		for shareholder, qty, suffix in get_legs(sm):
+			values.append((
+				f"{sm.name}-{suffix}",
+				timestamp,
+				timestamp,
+				user,
+				user,
+				0,
+				0,
+				sm.name,
+				sm.company,
+				shareholder,
+				sm.share_class,
+				sm.transaction_date,
+				sm.movement_type,
+				qty,
+				sm.transaction_currency,
+				sm.total_amount,
+				sm.total_amount_base_currency,
+			))
+			partitions.add((sm.company, shareholder, sm.share_class))
+
+	if not values:
+		return
+
+	frappe.db.bulk_insert("Share Movement Leg", LEG_FIELDS, values, ignore_duplicates=True)
+
+	for company, shareholder, share_class in partitions:
+		update_running_balance(company, shareholder, share_class)
+
+
+def remove_legs(sm):
+	"""Delete a cancelled Share Movement's legs and re-derive the running
+	balances they were part of."""
+	frappe.db.delete("Share Movement Leg", {"share_movement": sm.name})
+
+	for shareholder, _qty, _suffix in get_legs(sm):
+		update_running_balance(sm.company, shareholder, sm.share_class)
+
+
+def update_running_balance(company=None, shareholder=None, share_class=None):
+	"""Recompute `balance_after` for one (company, shareholder, share_class)
+	partition — or every partition, if none is given (used by the backfill
+	patch). A back-dated movement shifts the balance of every later leg in
+	its partition, so the whole partition is re-derived in one statement
+	rather than patched row by row."""
+	conditions = []
+	values = {}
+	for fieldname, value in (("company", company), ("shareholder", shareholder), ("share_class", share_class)):
+		if value:
+			conditions.append(f"{fieldname} = %({fieldname})s")
+			values[fieldname] = value
+
+	frappe.db.sql(
+		"""
+		UPDATE `tabShare Movement Leg` leg
+		JOIN (
+			SELECT
+				name,
+				SUM(qty) OVER (
+					PARTITION BY company, shareholder, share_class
+					ORDER BY transaction_date, share_movement
+				) AS running_balance
+			FROM `tabShare Movement Leg`
+			{where}
+		) r ON r.name = leg.name
+		SET leg.balance_after = r.running_balance
+		""".format(where=("WHERE " + " AND ".join(conditions)) if conditions else ""),
+		values,
+	)
@@ -52,6 +52,30 @@ frappe.query_reports["Accounts Payable Aging"] = {
 			fieldtype: "Link",
 			options:   "Supplier Group",
 		},
+		{
+			fieldname: "report_view",
+			label:     __("View"),
+			fieldtype: "Select",
+			options:   "Invoice\nSupplier Summary",
+			default:   "Invoice",
+		},
+		{
+			fieldname: "range",
+			label:     __("Ageing Range"),
+			fieldtype: "Data",
+			default:   "30, 60, 90, 120",
+			description: __("Comma-separated bucket upper bounds, in days past due"),
+		},
+		{
+			// Set by a Capital Report Run's "Open Report" button.
+			fieldname: "capital_report_run",
+			label:     __("Saved Run"),
+			fieldtype: "Link",
+			options:   "Capital Report Run",
+			get_query: () => ({
+				filters: { report_name: "Accounts Payable Aging", status: "Completed" },
+			}),
+		},
 	],
 
 	// ── Row formatter ─────────────────────────────────────────────────────────
@@ -59,11 +83,8 @@ frappe.query_reports["Accounts Payable Aging"] = {
 		if (!data) return default_formatter(value, row, column, data);
 
 		// ── Currency columns: symbol + 2 d.p., never raw float ────────────────
-		const currency_cols = [
-			"outstanding_amount",
-			"range1", "range2", "range3", "range4", "range5",
-		];
-		if (currency_cols.includes(column.fieldname)) {
+		// Bucket columns are range1..rangeN — N depends on the Ageing Range filter.
+		if (column.fieldname === "outstanding_amount" || is_bucket_field(column.fieldname)) {
 			const num = flt(value);
 			if (num === 0) return `<span class="ap-zero">—</span>`;
 			const symbol = get_currency_symbol(data.currency);
@@ -74,6 +95,12 @@ frappe.query_reports["Accounts Payable Aging"] = {
 			return `<span class="ap-num">${symbol}${formatted}</span>`;
 		}
 
+		// ── Supplier Summary: invoice count drills down into that supplier ─────
+		if (column.fieldname === "invoice_count" && data.supplier) {
+			return `<a class="ap-drill-down" data-supplier="${encodeURIComponent(data.supplier)}"
+						title="${__("Show this supplier's invoices")}">${cint(value)}</a>`;
+		}
+
 		// ── Status badge ───────────────────────────────────────────────────────
 		if (column.fieldname === "status") {
 			if (value === "Overdue") {
@@ -110,13 +137,14 @@ frappe.query_reports["Accounts Payable Aging"] = {
 	get_chart_data: function (columns, result) {
 		if (!result || !result.length) return;
 
-		const fields  = ["range1", "range2", "range3", "range4", "range5"];
-		const labels  = ["0–30", "31–60", "61–90", "91–120", "121+"];
-		const totals  = [0, 0, 0, 0, 0];
+		const bucket_cols = columns.filter((c) => is_bucket_field(c.fieldname));
+		const fields  = bucket_cols.map((c) => c.fieldname);
+		const labels  = bucket_cols.map((c) => c.label);
+		const totals  = fields.map(() => 0);
 		let currency  = "";
 
 		result.forEach((row) => {
-			if (!row.invoice_no) return;                  // skip blank / total rows
+			if (!row.invoice_no && !row.supplier) return; // skip blank / total rows
 			if (!currency && row.currency) currency = row.currency;
 			fields.forEach((f, i) => { totals[i] += flt(row[f]); });
 		});
@@ -133,7 +161,8 @@ frappe.query_reports["Accounts Payable Aging"] = {
 			},
 			type:   "bar",
 			// Gradient from green (current) to deep purple (very overdue)
-			colors: ["#27ae60", "#f39c12", "#e67e22", "#e74c3c", "#8e44ad"],
+			colors: BUCKET_COLORS.slice(0, Math.max(fields.length - 1, 0))
+				.concat(BUCKET_COLORS[BUCKET_COLORS.length - 1]),
 			barOptions: { stacked: false, spaceRatio: 0.35 },
 			height: 260,
 			axisOptions: { xIsSeries: true },
@@ -152,6 +181,37 @@ frappe.query_reports["Accounts Payable Aging"] = {
 	// ── On load ───────────────────────────────────────────────────────────────
 	onload: function (report) {
 		inject_ap_styles();
+
+		// Invoices for one supplier are only fetched when asked for: switch to
+		// the Invoice view filtered to that supplier.
+		$(report.page.wrapper).on("click", ".ap-drill-down", function (e) {
+			e.preventDefault();
+			const supplier = decodeURIComponent($(this).attr("data-supplier"));
+			report.set_filter_value({ report_view: "Invoice", party: [supplier] });
+		});
+
+		// Long date ranges are generated in the background (Capital Report
+		// Run); refresh once the run finishes. A failed run is not retried
+		// here: refreshing would only show its error again.
+		frappe.realtime.off("capital_report_run");
+		frappe.realtime.on("capital_report_run", (run) => {
+			if (run.report_name !== report.report_name) return;
+			if (run.status === "Completed") {
+				frappe.hide_progress();
+				report.refresh();
+			} else if (run.status === "Failed") {
+				frappe.hide_progress();
+				frappe.msgprint({
+					title: __("Report Generation Failed"),
+					indicator: "red",
+					message: __("Background generation failed. See {0} to retry.", [
+						`<a href="/app/capital-report-run/${run.name}">${run.name}</a>`,
+					]),
+				});
+			} else {
+				frappe.show_progress(__("Generating report"), run.progress || 0, 100);
+			}
+		});
 	},
 
 	after_datatable_render: function () {
@@ -159,6 +219,13 @@ frappe.query_reports["Accounts Payable Aging"] = {
 	},
 };
 
+// ── Ageing buckets ────────────────────────────────────────────────────────────
+const BUCKET_COLORS = ["#27ae60", "#f39c12", "#e67e22", "#e74c3c", "#c0392b", "#a93226", "#8e44ad"];
+
+function is_bucket_field(fieldname) {
+	return /^range\d+$/.test(fieldname || "");
+}
+
 // ── Currency symbol lookup ─────────────────────────────────────────────────────
 // Three-tier: boot object → frappe helper → hardcoded map → code fallback
 const SYMBOL_FALLBACK = {
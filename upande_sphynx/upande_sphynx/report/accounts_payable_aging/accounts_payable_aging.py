@@ -5,12 +5,37 @@
 
 import frappe
 from frappe import _
-from frappe.utils import flt, getdate, nowdate, date_diff
+from frappe.utils import cint, cstr, getdate, nowdate
+
+from upande_sphynx import slow_query
+from upande_sphynx.report_cache import get_cached_report
+from upande_sphynx.upande_sphynx.doctype.capital_report_run.capital_report_run import (
+    QUERY_PROGRESS,
+    RUN_FILTER,
+    get_background_result,
+    get_saved_run_result,
+    set_progress,
+    should_run_in_background,
+)
+
+# Ageing bucket upper bounds, in days past due. Overridable per run via the
+# "Ageing Range" filter (comma-separated, e.g. "15, 30, 45").
+DEFAULT_AGING_RANGE = "30, 60, 90, 120"
+
+# Suppliers per query when a large Supplier(s) filter is given, so the
+# party IN list stays a reasonable size.
+PARTY_CHUNK_SIZE = 500
+
+INVOICE_VIEW = "Invoice"
+SUPPLIER_SUMMARY_VIEW = "Supplier Summary"
 
 
 def execute(filters=None):
     filters = frappe._dict(filters or {})
 
+    if filters.get(RUN_FILTER):
+        return get_saved_run_result(filters.get(RUN_FILTER), "Accounts Payable Aging")
+
     if not filters.from_date:
         filters.from_date = frappe.defaults.get_user_default("year_start_date") or "2000-01-01"
     if not filters.to_date:
@@ -19,13 +44,124 @@ def execute(filters=None):
     if getdate(filters.from_date) > getdate(filters.to_date):
         frappe.throw(_("From Date cannot be after To Date"))
 
-    columns = get_columns()
-    data    = get_data(filters)
-    return columns, data
+    filters.aging_boundaries = get_aging_boundaries(filters.get("range"))
+
+    if should_run_in_background(filters, filters.from_date, filters.to_date):
+        return get_background_result("Accounts Payable Aging", filters, get_columns(filters))
+
+    return get_cached_report("Accounts Payable Aging", filters, lambda: (get_columns(filters), get_data(filters)))
+
+
+# ── Ageing buckets ────────────────────────────────────────────────────────────
+def get_aging_boundaries(value=None):
+    """Parse the "Ageing Range" filter ("30, 60, 90, 120") into a sorted list
+    of distinct positive day counts — one bucket per bound plus a final
+    open-ended one."""
+    boundaries = sorted({cint(part) for part in cstr(value or DEFAULT_AGING_RANGE).split(",") if cint(part) > 0})
+    if not boundaries:
+        frappe.throw(_("Ageing Range must be a comma-separated list of positive day counts, e.g. {0}").format(
+            DEFAULT_AGING_RANGE))
+    return boundaries
+
+
+def get_bucket_labels(boundaries):
+    """["0-30", "31-60", ..., "121+"] for the given bucket upper bounds."""
+    labels = []
+    lower = 0
+    for upper in boundaries:
+        labels.append(f"{lower}-{upper}")
+        lower = upper + 1
+    labels.append(f"{lower}+")
+    return labels
+
+
+def get_bucket_conditions(boundaries, age_expr):
+    """One SQL condition per bucket, in the same order as get_bucket_labels.
+    Not-yet-due amounts (negative age) fall into the first bucket."""
+    conditions = []
+    lower = None
+    for upper in boundaries:
+        if lower is None:
+            conditions.append(f"{age_expr} <= {upper}")
+        else:
+            conditions.append(f"{age_expr} > {lower} AND {age_expr} <= {upper}")
+        lower = upper
+    conditions.append(f"{age_expr} > {lower}")
+    return conditions
+
+
+def get_bucket_select(boundaries, age_expr, amount_expr):
+    """SELECT-list fragment assigning each row's amount to range1..rangeN,
+    plus its bucket label as aging_bucket."""
+    conditions = get_bucket_conditions(boundaries, age_expr)
+    labels = get_bucket_labels(boundaries)
+
+    columns = [
+        f"CASE WHEN {condition} THEN {amount_expr} ELSE 0 END AS range{i}"
+        for i, condition in enumerate(conditions, start=1)
+    ]
+    label_case = " ".join(
+        f"WHEN {condition} THEN {frappe.db.escape(label)}" for condition, label in zip(conditions, labels, strict=True)
+    )
+    columns.append(f"CASE {label_case} END AS aging_bucket")
+    return ",\n            ".join(columns)
 
 
 # ── Columns ───────────────────────────────────────────────────────────────────
-def get_columns():
+def get_columns(filters):
+    columns = get_summary_columns() if is_summary_view(filters) else get_invoice_columns()
+
+    for i, label in enumerate(get_bucket_labels(filters.aging_boundaries), start=1):
+        columns.append({
+            "label":     label,
+            "fieldname": f"range{i}",
+            "fieldtype": "Currency",
+            "options":   "currency",
+            "width":     120,
+        })
+
+    return columns
+
+
+def get_summary_columns():
+    return [
+        {
+            "label":     _("Supplier Group"),
+            "fieldname": "supplier_group",
+            "fieldtype": "Link",
+            "options":   "Supplier Group",
+            "width":     150,
+        },
+        {
+            "label":     _("Supplier"),
+            "fieldname": "supplier",
+            "fieldtype": "Link",
+            "options":   "Supplier",
+            "width":     190,
+        },
+        {
+            "label":     _("Invoices"),
+            "fieldname": "invoice_count",
+            "fieldtype": "Int",
+            "width":     90,
+        },
+        {
+            "label":     _("Outstanding"),
+            "fieldname": "outstanding_amount",
+            "fieldtype": "Currency",
+            "options":   "currency",
+            "width":     170,
+        },
+        {
+            "label":     _("Oldest (Days)"),
+            "fieldname": "age_days",
+            "fieldtype": "Int",
+            "width":     100,
+        },
+    ]
+
+
+def get_invoice_columns():
     return [
         {
             "label":     _("Supplier"),
@@ -81,194 +217,149 @@ def get_columns():
         #     "fieldtype": "Data",
         #     "width":     105,
         # },
-        {
-            "label":     _("0-30"),
-            "fieldname": "range1",
-            "fieldtype": "Currency",
-            "options":   "currency",
-            "width":     120,
-        },
-        {
-            "label":     _("31-60"),
-            "fieldname": "range2",
-            "fieldtype": "Currency",
-            "options":   "currency",
-            "width":     120,
-        },
-        {
-            "label":     _("61-90"),
-            "fieldname": "range3",
-            "fieldtype": "Currency",
-            "options":   "currency",
-            "width":     120,
-        },
-        {
-            "label":     _("91-120"),
-            "fieldname": "range4",
-            "fieldtype": "Currency",
-            "options":   "currency",
-            "width":     120,
-        },
-        {
-            "label":     _("121+"),
-            "fieldname": "range5",
-            "fieldtype": "Currency",
-            "options":   "currency",
-            "width":     120,
-        },
     ]
 
 
 # ── Data ──────────────────────────────────────────────────────────────────────
 def get_data(filters):
-    from_date    = getdate(filters.from_date)
-    to_date      = getdate(filters.to_date)
-    age_ref_date = to_date
+    """Outstanding Purchase Invoices as of to_date, aged and bucketed in one
+    query against the Payment Ledger.
 
-    # ── Step 1: fetch all submitted Purchase Invoices in the date range ───────
-    inv_conditions = [
-        "pi.docstatus = 1",
-        "pi.posting_date BETWEEN %(from_date)s AND %(to_date)s",
-    ]
-    inv_values = {
-        "from_date": from_date,
-        "to_date":   to_date,
-    }
+    Payment Ledger Entry rows for a payable carry a signed amount against
+    the invoice they settle (positive for the invoice itself, negative for
+    payments, debit notes and reconciliations against it — and delinked
+    once cancelled), so summing them per against_voucher_no up to to_date
+    is the invoice's outstanding on that date. The old version summed only
+    the invoice's own GL Entries, passed every invoice name in the range as
+    one IN list, and aged/bucketed each row in Python.
+    """
+    party = filters.get("party")
+    if isinstance(party, str):
+        party = [party]
+    party = sorted({p for p in (party or []) if p})
 
-    if filters.get("company"):
-        inv_conditions.append("pi.company = %(company)s")
-        inv_values["company"] = filters.company
+    fetch = get_supplier_summary if is_summary_view(filters) else get_outstanding_invoices
 
-    if filters.get("party_account"):
-        inv_conditions.append("pi.credit_to = %(party_account)s")
-        inv_values["party_account"] = filters.party_account
+    if len(party) <= PARTY_CHUNK_SIZE:
+        data = fetch(filters, party)
+        set_progress(QUERY_PROGRESS)
+        return data
 
-    if filters.get("supplier_group"):
-        inv_conditions.append("sup.supplier_group = %(supplier_group)s")
-        inv_values["supplier_group"] = filters.supplier_group
+    # Chunks are taken from the sorted party list and each chunk's rows come
+    # back ordered by supplier, so concatenating them keeps the overall order.
+    data = []
+    for i in range(0, len(party), PARTY_CHUNK_SIZE):
+        data.extend(fetch(filters, party[i:i + PARTY_CHUNK_SIZE]))
+        set_progress(QUERY_PROGRESS * min(i + PARTY_CHUNK_SIZE, len(party)) // len(party))
+    return data
 
-    party = filters.get("party")
-    if isinstance(party, list):
-        party = [p for p in party if p]
-    if party:
-        if isinstance(party, list) and len(party) == 1:
-            inv_conditions.append("pi.supplier = %(supplier_single)s")
-            inv_values["supplier_single"] = party[0]
-        elif isinstance(party, list):
-            inv_conditions.append("pi.supplier IN %(party)s")
-            inv_values["party"] = tuple(party)
-        else:
-            inv_conditions.append("pi.supplier = %(party)s")
-            inv_values["party"] = party
 
-    invoices = frappe.db.sql(
-        """
+def is_summary_view(filters):
+    return filters.get("report_view") == SUPPLIER_SUMMARY_VIEW
+
+
+def get_outstanding_invoices(filters, parties=None):
+    query, values = get_outstanding_invoices_query(filters, parties)
+    return slow_query.sql(query + " ORDER BY pi.supplier, pi.posting_date", values, as_dict=True)
+
+
+def get_supplier_summary(filters, parties=None):
+    """Bucket totals per supplier, grouped in SQL over the same per-invoice
+    query the invoice view uses — the result set is one row per supplier
+    (and currency) however many invoices are outstanding. Invoices for a
+    single supplier are loaded on demand by re-running the report in the
+    Invoice view with that supplier selected (see the report's JS)."""
+    query, values = get_outstanding_invoices_query(filters, parties)
+    bucket_totals = ",\n            ".join(
+        f"SUM(inv.range{i}) AS range{i}" for i in range(1, len(filters.aging_boundaries) + 2)
+    )
+
+    return slow_query.sql(
+        f"""
+        SELECT
+            inv.supplier,
+            sup.supplier_group,
+            inv.currency,
+            COUNT(*)                    AS invoice_count,
+            SUM(inv.outstanding_amount) AS outstanding_amount,
+            MAX(inv.age_days)           AS age_days,
+            {bucket_totals}
+        FROM ({query}) inv
+        LEFT JOIN `tabSupplier` sup ON sup.name = inv.supplier
+        GROUP BY inv.supplier, sup.supplier_group, inv.currency
+        ORDER BY inv.supplier, inv.currency
+        """,
+        values,
+        as_dict=True,
+    )
+
+
+def get_outstanding_invoices_query(filters, parties=None):
+    conditions, values = get_invoice_conditions(filters, parties)
+    age_expr = "DATEDIFF(%(to_date)s, IFNULL(pi.due_date, pi.posting_date))"
+
+    query = """
         SELECT
-            pi.name          AS invoice_no,
             pi.supplier,
+            pi.name                                    AS invoice_no,
             pi.posting_date,
-            pi.due_date,
-            pi.currency,
-            pi.grand_total
+            IFNULL(pi.due_date, pi.posting_date)       AS due_date,
+            MAX(ple.account_currency)                  AS currency,
+            pi.grand_total,
+            -SUM(CASE WHEN ple.voucher_no != ple.against_voucher_no
+                THEN ple.amount_in_account_currency ELSE 0 END) AS paid_amount,
+            SUM(ple.amount_in_account_currency)        AS outstanding_amount,
+            CASE WHEN {age} > 0 THEN 'Overdue' ELSE 'Current' END AS status,
+            GREATEST({age}, 0)                         AS age_days,
+            {buckets}
         FROM
-            `tabPurchase Invoice` pi
-            LEFT JOIN `tabSupplier` sup ON sup.name = pi.supplier
+            `tabPayment Ledger Entry` ple
+            INNER JOIN `tabPurchase Invoice` pi ON pi.name = ple.against_voucher_no
+            {supplier_join}
         WHERE
             {where}
-        ORDER BY
-            pi.supplier, pi.posting_date
-        """.format(where=" AND ".join(inv_conditions)),
-        inv_values,
-        as_dict=True,
+        GROUP BY
+            pi.name, pi.supplier, pi.posting_date, pi.due_date, pi.grand_total
+        HAVING
+            outstanding_amount > 0.005
+    """.format(
+        age=age_expr,
+        buckets=get_bucket_select(filters.aging_boundaries, age_expr, "SUM(ple.amount_in_account_currency)"),
+        supplier_join="LEFT JOIN `tabSupplier` sup ON sup.name = pi.supplier" if filters.get("supplier_group") else "",
+        where=" AND ".join(conditions),
     )
+    return query, values
 
-    if not invoices:
-        return []
 
-    voucher_nos = [inv.invoice_no for inv in invoices]
+def get_invoice_conditions(filters, parties=None):
+    conditions = [
+        "ple.party_type = 'Supplier'",
+        "ple.account_type = 'Payable'",
+        "ple.against_voucher_type = 'Purchase Invoice'",
+        "ple.delinked = 0",
+        "ple.posting_date <= %(to_date)s",
+        "pi.docstatus = 1",
+        "pi.posting_date BETWEEN %(from_date)s AND %(to_date)s",
+    ]
+    values = {
+        "from_date": getdate(filters.from_date),
+        "to_date":   getdate(filters.to_date),
+    }
 
-    # ── Step 2: reconstruct outstanding as of to_date from GL Entry ───────────
-    # For each voucher, sum credits (= invoice postings) and debits
-    # (= payments/credit notes) that occurred on or before to_date.
-    # outstanding_as_of_to_date = credit_total - debit_total
-    gl_rows = frappe.db.sql(
-        """
-        SELECT
-            gle.voucher_no,
-            SUM(CASE WHEN gle.credit_in_account_currency > 0
-                THEN gle.credit_in_account_currency ELSE 0 END) AS total_credit,
-            SUM(CASE WHEN gle.debit_in_account_currency  > 0
-                THEN gle.debit_in_account_currency  ELSE 0 END) AS total_debit
-        FROM `tabGL Entry` gle
-        INNER JOIN `tabAccount` acc ON acc.name = gle.account
-        WHERE
-            gle.voucher_no   IN %(voucher_nos)s
-            AND gle.party_type = 'Supplier'
-            AND gle.is_cancelled = 0
-            AND acc.account_type = 'Payable'
-            AND gle.posting_date <= %(to_date)s
-        GROUP BY gle.voucher_no
-        """,
-        {
-            "voucher_nos": tuple(voucher_nos),
-            "to_date":     to_date,
-        },
-        as_dict=True,
-    )
+    if filters.get("company"):
+        conditions.append("ple.company = %(company)s")
+        values["company"] = filters.company
 
-    # Build a lookup: voucher_no -> outstanding as of to_date
-    gl_map = {}
-    for row in gl_rows:
-        credit = flt(row.total_credit)
-        debit  = flt(row.total_debit)
-        gl_map[row.voucher_no] = {
-            "outstanding": credit - debit,
-            "paid":        debit,
-        }
-
-    # ── Step 3: build report rows ─────────────────────────────────────────────
-    data = []
-    for inv in invoices:
-        gl = gl_map.get(inv.invoice_no, {})
-        out_amt  = flt(gl.get("outstanding", inv.grand_total))
-        paid_amt = flt(gl.get("paid", 0))
-
-        # Skip invoices that were fully settled on or before to_date
-        if out_amt <= 0.005:
-            continue
-
-        due_date = getdate(inv.due_date or inv.posting_date)
-        age_days = date_diff(age_ref_date, due_date)
-        status   = "Overdue" if age_days > 0 else "Current"
-
-        if age_days <= 30:
-            bucket = "0-30"
-        elif age_days <= 60:
-            bucket = "31-60"
-        elif age_days <= 90:
-            bucket = "61-90"
-        elif age_days <= 120:
-            bucket = "91-120"
-        else:
-            bucket = "121+"
-
-        data.append({
-            "supplier":           inv.supplier,
-            "invoice_no":         inv.invoice_no,
-            "posting_date":       inv.posting_date,
-            "due_date":           due_date,
-            "currency":           inv.currency,
-            "grand_total":        flt(inv.grand_total),
-            "paid_amount":        paid_amt,
-            "outstanding_amount": out_amt,
-            "status":             status,
-            "age_days":           max(age_days, 0),
-            "aging_bucket":       bucket,
-            "range1":             out_amt if age_days <= 30        else 0,
-            "range2":             out_amt if 30  < age_days <= 60  else 0,
-            "range3":             out_amt if 60  < age_days <= 90  else 0,
-            "range4":             out_amt if 90  < age_days <= 120 else 0,
-            "range5":             out_amt if age_days > 120        else 0,
-        })
+    if filters.get("party_account"):
+        conditions.append("ple.account = %(party_account)s")
+        values["party_account"] = filters.party_account
 
-    return data
+    if filters.get("supplier_group"):
+        conditions.append("sup.supplier_group = %(supplier_group)s")
+        values["supplier_group"] = filters.supplier_group
+
+    if parties:
+        conditions.append("ple.party IN %(parties)s")
+        values["parties"] = tuple(parties)
+
+    return conditions, values
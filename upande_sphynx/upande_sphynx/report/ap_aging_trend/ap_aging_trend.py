@@ -0,0 +1,157 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, formatdate, getdate, nowdate
+
+# Snapshots taken on different days may use different bucket bounds (see
+# RANGE_CONFIG_KEY in ap_aging_snapshot), so columns are keyed on the bucket's
+# position rather than its label.
+
+
+def execute(filters=None):
+    filters = frappe._dict(filters or {})
+
+    if not filters.to_date:
+        filters.to_date = nowdate()
+    if not filters.from_date:
+        filters.from_date = add_days(filters.to_date, -90)
+
+    if getdate(filters.from_date) > getdate(filters.to_date):
+        frappe.throw(_("From Date cannot be after To Date"))
+
+    rows = get_snapshot_rows(filters)
+    columns = get_columns(rows)
+    data = get_data(rows)
+    chart = get_chart(columns, data)
+
+    message = None
+    if data and not chart and len({row.currency for row in data}) > 1:
+        message = _("The chart is shown for one currency at a time. Select a Currency to see it.")
+    return columns, data, message, chart
+
+
+def get_snapshot_rows(filters):
+    """Bucket totals per snapshot date, straight from AP Aging Snapshot —
+    nothing here touches the ledger."""
+    conditions = ["snapshot_date BETWEEN %(from_date)s AND %(to_date)s"]
+    values = {
+        "from_date": getdate(filters.from_date),
+        "to_date":   getdate(filters.to_date),
+    }
+
+    for fieldname in ("company", "supplier", "currency"):
+        if filters.get(fieldname):
+            conditions.append(f"{fieldname} = %({fieldname})s")
+            values[fieldname] = filters.get(fieldname)
+
+    return frappe.db.sql(
+        """
+        SELECT
+            snapshot_date,
+            currency,
+            bucket_index,
+            MAX(bucket)             AS bucket,
+            SUM(outstanding_amount) AS outstanding_amount,
+            SUM(invoice_count)      AS invoice_count
+        FROM `tabAP Aging Snapshot`
+        WHERE {where}
+        GROUP BY snapshot_date, currency, bucket_index
+        ORDER BY snapshot_date, currency, bucket_index
+        """.format(where=" AND ".join(conditions)),
+        values,
+        as_dict=True,
+    )
+
+
+def get_columns(rows):
+    columns = [
+        {
+            "label":     _("Snapshot Date"),
+            "fieldname": "snapshot_date",
+            "fieldtype": "Date",
+            "width":     120,
+        },
+        {
+            "label":     _("Currency"),
+            "fieldname": "currency",
+            "fieldtype": "Link",
+            "options":   "Currency",
+            "width":     80,
+        },
+        {
+            "label":     _("Invoices"),
+            "fieldname": "invoice_count",
+            "fieldtype": "Int",
+            "width":     90,
+        },
+        {
+            "label":     _("Outstanding"),
+            "fieldname": "outstanding_amount",
+            "fieldtype": "Currency",
+            "options":   "currency",
+            "width":     150,
+        },
+    ]
+
+    # Label each bucket column with the most recent label seen for it.
+    labels = {}
+    for row in rows:
+        labels[row.bucket_index] = row.bucket
+
+    for index in sorted(labels):
+        columns.append({
+            "label":     labels[index],
+            "fieldname": f"range{index}",
+            "fieldtype": "Currency",
+            "options":   "currency",
+            "width":     120,
+        })
+
+    return columns
+
+
+def get_data(rows):
+    data = {}
+    for row in rows:
+        key = (row.snapshot_date, row.currency)
+        if key not in data:
+            data[key] = frappe._dict({
+                "snapshot_date":      row.snapshot_date,
+                "currency":           row.currency,
+                "invoice_count":      0,
+                "outstanding_amount": 0,
+            })
+        entry = data[key]
+        entry[f"range{row.bucket_index}"] = row.outstanding_amount
+        entry.invoice_count += row.invoice_count
+        entry.outstanding_amount += row.outstanding_amount
+
+    return list(data.values())
+
+
+def get_chart(columns, data):
+    bucket_columns = [c for c in columns if c["fieldname"].startswith("range")]
+    # Amounts in different currencies can't be added up, so the chart is
+    # only drawn when the rows are all in one currency.
+    if not data or not bucket_columns or len({row.currency for row in data}) > 1:
+        return None
+
+    dates = sorted({row.snapshot_date for row in data})
+    totals = {d: {c["fieldname"]: 0 for c in bucket_columns} for d in dates}
+    for row in data:
+        for c in bucket_columns:
+            totals[row.snapshot_date][c["fieldname"]] += row.get(c["fieldname"]) or 0
+
+    return {
+        "data": {
+            "labels": [formatdate(d) for d in dates],
+            "datasets": [
+                {"name": c["label"], "values": [totals[d][c["fieldname"]] for d in dates]}
+                for c in bucket_columns
+            ],
+        },
+        "type": "line",
+        "fieldtype": "Currency",
+    }
@@ -0,0 +1,52 @@
+// Copyright (c) 2026, Jeniffer and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Cap Table Diff"] = {
+	"filters": [
+		{
+			"fieldname": "company",
+			"label": __("Company"),
+			"fieldtype": "Link",
+			"options": "Company",
+			"reqd": 1,
+			"default": frappe.defaults.get_user_default("Company")
+		},
+		{
+			"fieldname": "from_date",
+			"label": __("From Date"),
+			"fieldtype": "Date",
+			"reqd": 1,
+			"default": frappe.datetime.add_months(frappe.datetime.get_today(), -3)
+		},
+		{
+			"fieldname": "to_date",
+			"label": __("To Date"),
+			"fieldtype": "Date",
+			"reqd": 1,
+			"default": frappe.datetime.get_today()
+		},
+		{
+			"fieldname": "share_class",
+			"label": __("Share Class"),
+			"fieldtype": "Link",
+			"options": "Share Type"
+		},
+		{
+			"fieldname": "changes_only",
+			"label": __("Changes Only"),
+			"fieldtype": "Check",
+			"default": 1
+		}
+	],
+
+	formatter: function (value, row, column, data, default_formatter) {
+		value = default_formatter(value, row, column, data);
+		if (column.fieldname === "status" && data) {
+			const color = { New: "green", Exited: "red", Changed: "blue" }[data.status];
+			if (color) {
+				value = `<span style="color: var(--${color}-600)">${value}</span>`;
+			}
+		}
+		return value;
+	}
+};
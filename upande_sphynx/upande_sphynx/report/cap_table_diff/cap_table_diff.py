@@ -0,0 +1,55 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import add_months, getdate, nowdate
+
+from upande_sphynx.api.capital_management import get_cap_table_diff
+
+
+def execute(filters=None):
+    filters = frappe._dict(filters or {})
+    if not filters.company:
+        frappe.throw(_("Company is required"))
+
+    filters.to_date = getdate(filters.to_date or nowdate())
+    filters.from_date = getdate(filters.from_date or add_months(filters.to_date, -3))
+
+    diff = get_cap_table_diff(filters.company, filters.from_date, filters.to_date, filters.share_class)
+    data = diff["rows"]
+    if filters.changes_only:
+        data = [row for row in data if row.status != "Unchanged"]
+
+    return get_columns(), data, None, None, get_summary(diff)
+
+
+def get_columns():
+    return [
+        {"label": _("Shareholder"), "fieldname": "shareholder", "fieldtype": "Link", "options": "Shareholder", "width": 160},
+        {"label": _("Shareholder Name"), "fieldname": "shareholder_name", "fieldtype": "Data", "width": 180},
+        {"label": _("Change"), "fieldname": "status", "fieldtype": "Data", "width": 90},
+        {"label": _("Opening Shares"), "fieldname": "opening_shares", "fieldtype": "Float", "precision": 0, "width": 130},
+        {"label": _("Closing Shares"), "fieldname": "closing_shares", "fieldtype": "Float", "precision": 0, "width": 130},
+        {"label": _("Change in Shares"), "fieldname": "change_shares", "fieldtype": "Float", "precision": 0, "width": 130},
+        {"label": _("Opening %"), "fieldname": "opening_ownership", "fieldtype": "Percent", "width": 100},
+        {"label": _("Closing %"), "fieldname": "closing_ownership", "fieldtype": "Percent", "width": 100},
+        {"label": _("Change in %"), "fieldname": "change_ownership", "fieldtype": "Percent", "width": 100},
+        {"label": _("New Investment"), "fieldname": "new_investment", "fieldtype": "Currency", "width": 140},
+    ]
+
+
+def get_summary(diff):
+    counts = {}
+    for row in diff["rows"]:
+        counts[row.status] = counts.get(row.status, 0) + 1
+
+    return [
+        {"label": _("Shares at {0}").format(frappe.format(diff["from_date"], "Date")),
+         "value": diff["opening_shares"], "datatype": "Float"},
+        {"label": _("Shares at {0}").format(frappe.format(diff["to_date"], "Date")),
+         "value": diff["closing_shares"], "datatype": "Float"},
+        {"label": _("New Holders"), "value": counts.get("New", 0), "indicator": "Green", "datatype": "Int"},
+        {"label": _("Exits"), "value": counts.get("Exited", 0), "indicator": "Red", "datatype": "Int"},
+        {"label": _("Changed"), "value": counts.get("Changed", 0), "indicator": "Blue", "datatype": "Int"},
+    ]
@@ -0,0 +1,27 @@
+// Copyright (c) 2026, Jeniffer and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Capital Endpoint Latency"] = {
+	"filters": [
+		{
+			"fieldname": "hours",
+			"label": __("Last N Hours"),
+			"fieldtype": "Int",
+			"default": 24,
+			"description": __("0 for every stored call. At most the last 1000 calls per endpoint are kept.")
+		},
+		{
+			"fieldname": "endpoint",
+			"label": __("Endpoint Contains"),
+			"fieldtype": "Data"
+		}
+	],
+
+	onload: function (report) {
+		report.page.add_inner_button(__("Clear Samples"), () => {
+			frappe.confirm(__("Drop every recorded sample?"), () => {
+				frappe.call("upande_sphynx.instrumentation.clear_samples").then(() => report.refresh());
+			});
+		});
+	}
+};
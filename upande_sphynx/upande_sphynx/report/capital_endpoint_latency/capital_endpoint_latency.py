@@ -0,0 +1,100 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+
+import time
+from datetime import datetime, timezone
+
+import frappe
+from frappe import _
+from frappe.utils import cint, convert_utc_to_system_timezone, flt
+
+from upande_sphynx.instrumentation import get_endpoints, get_samples
+
+
+def execute(filters=None):
+    filters = frappe._dict(filters or {})
+    frappe.only_for("System Manager")
+
+    data = get_data(filters)
+    message = None
+    if not frappe.conf.get("capital_instrumentation_enabled"):
+        message = _("Instrumentation is off. Set capital_instrumentation_enabled in site config to record new calls.")
+    return get_columns(), data, message, get_chart(data)
+
+
+def get_columns():
+    return [
+        {"label": _("Endpoint"), "fieldname": "endpoint", "fieldtype": "Data", "width": 380},
+        {"label": _("Calls"), "fieldname": "calls", "fieldtype": "Int", "width": 80},
+        {"label": _("p50 (ms)"), "fieldname": "p50", "fieldtype": "Float", "precision": 1, "width": 100},
+        {"label": _("p95 (ms)"), "fieldname": "p95", "fieldtype": "Float", "precision": 1, "width": 100},
+        {"label": _("p99 (ms)"), "fieldname": "p99", "fieldtype": "Float", "precision": 1, "width": 100},
+        {"label": _("Max (ms)"), "fieldname": "max_ms", "fieldtype": "Float", "precision": 1, "width": 100},
+        {"label": _("Avg Queries"), "fieldname": "avg_queries", "fieldtype": "Float", "precision": 1, "width": 110},
+        {"label": _("Max Queries"), "fieldname": "max_queries", "fieldtype": "Int", "width": 110},
+        {"label": _("Avg Rows"), "fieldname": "avg_rows", "fieldtype": "Float", "precision": 1, "width": 100},
+        {"label": _("Avg Commits"), "fieldname": "avg_commits", "fieldtype": "Float", "precision": 2, "width": 110},
+        {"label": _("Last Call"), "fieldname": "last_call", "fieldtype": "Datetime", "width": 160},
+    ]
+
+
+def get_data(filters):
+    """One row per endpoint, from its most recent samples (at most
+    SAMPLE_LIMIT) within the last `hours`."""
+    since = time.time() - cint(filters.hours) * 3600 if cint(filters.hours) else 0
+    data = []
+
+    for endpoint in get_endpoints():
+        if filters.endpoint and filters.endpoint.lower() not in endpoint.lower():
+            continue
+
+        samples = [s for s in get_samples(endpoint) if s["at"] >= since]
+        if not samples:
+            continue
+
+        timings = sorted(s["ms"] for s in samples)
+        calls = len(samples)
+        data.append({
+            "endpoint": endpoint,
+            "calls": calls,
+            "p50": percentile(timings, 50),
+            "p95": percentile(timings, 95),
+            "p99": percentile(timings, 99),
+            "max_ms": timings[-1],
+            "avg_queries": flt(sum(s["queries"] for s in samples) / calls),
+            "max_queries": max(s["queries"] for s in samples),
+            "avg_rows": flt(sum(s["rows"] for s in samples) / calls),
+            "avg_commits": flt(sum(s["commits"] for s in samples) / calls),
+            "last_call": to_system_datetime(max(s["at"] for s in samples)),
+        })
+
+    return sorted(data, key=lambda row: row["p95"], reverse=True)
+
+
+def to_system_datetime(timestamp):
+    utc = datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+    return convert_utc_to_system_timezone(utc).replace(tzinfo=None)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, -(-len(values) * p // 100) - 1)
+    return values[int(index)]
+
+
+def get_chart(data):
+    top = data[:10]
+    if not top:
+        return None
+
+    return {
+        "data": {
+            "labels": [row["endpoint"].rsplit(".", 1)[-1] for row in top],
+            "datasets": [
+                {"name": _("p50 (ms)"), "values": [row["p50"] for row in top]},
+                {"name": _("p95 (ms)"), "values": [row["p95"] for row in top]},
+                {"name": _("p99 (ms)"), "values": [row["p99"] for row in top]},
+            ],
+        },
+        "type": "bar",
+    }
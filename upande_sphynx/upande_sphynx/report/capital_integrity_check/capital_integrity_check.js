@@ -0,0 +1,63 @@
+// Copyright (c) 2026, Jeniffer and contributors
+// For license information, please see license.txt
+
+const INTEGRITY_MODULE = "upande_sphynx.upande_sphynx.doctype.capital_integrity_issue.capital_integrity_issue";
+
+frappe.query_reports["Capital Integrity Check"] = {
+	"filters": [
+		{
+			"fieldname": "company",
+			"label": __("Company"),
+			"fieldtype": "Link",
+			"options": "Company",
+			"default": frappe.defaults.get_user_default("Company")
+		},
+		{
+			"fieldname": "check_name",
+			"label": __("Check"),
+			"fieldtype": "Select",
+			"options": "\nShareholder Totals\nCLN Totals\nDangling References\nMissing References"
+		},
+		{
+			"fieldname": "status",
+			"label": __("Status"),
+			"fieldtype": "Select",
+			"options": "\nOpen\nRepaired",
+			"default": "Open"
+		}
+	],
+
+	onload: function (report) {
+		const run = (repair) => {
+			frappe.call({
+				method: INTEGRITY_MODULE + ".run_integrity_check",
+				args: { company: report.get_filter_value("company"), repair: repair },
+				callback: (r) => {
+					if (r.exc) return;
+					frappe.show_alert({
+						message: __("Integrity check queued as {0} jobs. Refresh when they finish.", [r.message.jobs]),
+						indicator: "blue",
+					});
+				},
+			});
+		};
+
+		report.page.add_inner_button(__("Run Check"), () => run(0));
+		report.page.add_inner_button(__("Run and Repair"), () => {
+			frappe.confirm(__("Re-run every check and write the expected values back?"), () => run(1));
+		});
+		report.page.add_inner_button(__("Repair Open Issues"), () => {
+			frappe.confirm(__("Write the expected value back for every open issue?"), () => {
+				frappe.call({
+					method: INTEGRITY_MODULE + ".repair_open_issues",
+					args: { company: report.get_filter_value("company") },
+					callback: (r) => {
+						if (r.exc) return;
+						frappe.show_alert({ message: __("{0} issues repaired", [r.message]), indicator: "green" });
+						report.refresh();
+					},
+				});
+			});
+		});
+	}
+};
@@ -0,0 +1,52 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+
+
+def execute(filters=None):
+    filters = frappe._dict(filters or {})
+
+    data = get_data(filters)
+    return get_columns(), data, None, None, get_summary(data)
+
+
+def get_columns():
+    return [
+        {"label": _("Check"), "fieldname": "check_name", "fieldtype": "Data", "width": 170},
+        {"label": _("Document Type"), "fieldname": "reference_doctype", "fieldtype": "Link", "options": "DocType", "width": 170},
+        {"label": _("Document"), "fieldname": "reference_name", "fieldtype": "Dynamic Link", "options": "reference_doctype", "width": 180},
+        {"label": _("Field"), "fieldname": "fieldname", "fieldtype": "Data", "width": 200},
+        {"label": _("Stored"), "fieldname": "stored_value", "fieldtype": "Data", "width": 150},
+        {"label": _("Expected"), "fieldname": "expected_value", "fieldtype": "Data", "width": 150},
+        {"label": _("Status"), "fieldname": "status", "fieldtype": "Data", "width": 90},
+        {"label": _("Company"), "fieldname": "company", "fieldtype": "Link", "options": "Company", "width": 150},
+    ]
+
+
+def get_data(filters):
+    """Issues stored by the last run_integrity_check."""
+    conditions = {}
+    for fieldname in ("company", "check_name", "status"):
+        if filters.get(fieldname):
+            conditions[fieldname] = filters.get(fieldname)
+
+    return frappe.get_all(
+        "Capital Integrity Issue",
+        filters=conditions,
+        fields=["check_name", "reference_doctype", "reference_name", "fieldname",
+                "stored_value", "expected_value", "status", "company"],
+        order_by="check_name, reference_doctype, reference_name",
+    )
+
+
+def get_summary(data):
+    counts = {}
+    for row in data:
+        counts[row.check_name] = counts.get(row.check_name, 0) + 1
+
+    return [
+        {"label": check_name, "value": count, "indicator": "Red" if count else "Green", "datatype": "Int"}
+        for check_name, count in sorted(counts.items())
+    ]
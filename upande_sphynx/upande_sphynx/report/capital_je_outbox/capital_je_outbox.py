@@ -0,0 +1,71 @@
+# Copyright (c) 2026, Jeniffer and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import now_datetime, time_diff_in_seconds
+
+from upande_sphynx.upande_sphynx.doctype.capital_je_posting.capital_je_posting import get_outbox_metrics
+
+UNPOSTED_STATUSES = ("Pending", "Processing", "Failed", "Dead")
+
+
+def execute(filters=None):
+    filters = frappe._dict(filters or {})
+
+    metrics = get_outbox_metrics(filters.company)
+    return get_columns(), get_data(filters), None, None, get_summary(metrics)
+
+
+def get_columns():
+    return [
+        {"label": _("Posting"), "fieldname": "name", "fieldtype": "Link", "options": "Capital JE Posting", "width": 160},
+        {"label": _("Status"), "fieldname": "status", "fieldtype": "Data", "width": 100},
+        {"label": _("Document Type"), "fieldname": "reference_doctype", "fieldtype": "Link", "options": "DocType", "width": 140},
+        {"label": _("Document"), "fieldname": "reference_name", "fieldtype": "Dynamic Link", "options": "reference_doctype", "width": 160},
+        {"label": _("Company"), "fieldname": "company", "fieldtype": "Link", "options": "Company", "width": 150},
+        {"label": _("Queued"), "fieldname": "creation", "fieldtype": "Datetime", "width": 160},
+        {"label": _("Age"), "fieldname": "age", "fieldtype": "Duration", "width": 120},
+        {"label": _("Attempts"), "fieldname": "attempts", "fieldtype": "Int", "width": 90},
+        {"label": _("Next Attempt"), "fieldname": "next_attempt_at", "fieldtype": "Datetime", "width": 160},
+        {"label": _("Last Error"), "fieldname": "last_error", "fieldtype": "Data", "width": 300},
+    ]
+
+
+def get_data(filters):
+    """Every posting not yet through, oldest first."""
+    conditions = {"status": ("in", UNPOSTED_STATUSES)}
+    if filters.company:
+        conditions["company"] = filters.company
+
+    now = now_datetime()
+    data = frappe.get_all(
+        "Capital JE Posting",
+        filters=conditions,
+        fields=["name", "status", "reference_doctype", "reference_name", "company", "creation",
+                "attempts", "next_attempt_at", "last_error"],
+        order_by="creation",
+    )
+    for row in data:
+        row.age = time_diff_in_seconds(now, row.creation)
+        # The last line of the traceback is the exception itself.
+        lines = [line for line in (row.last_error or "").splitlines() if line.strip()]
+        row.last_error = lines[-1].strip() if lines else ""
+    return data
+
+
+def get_summary(metrics):
+    indicators = {"Pending": "Blue", "Processing": "Orange", "Failed": "Orange", "Dead": "Red"}
+    summary = [
+        {"label": _(status), "value": count, "indicator": indicators[status] if count else "Green", "datatype": "Int"}
+        for status, count in metrics["depth"].items()
+    ]
+    latency = metrics["latency_seconds"]
+    summary += [
+        {"label": _("Oldest Unposted"), "value": metrics["oldest_unposted_seconds"], "datatype": "Duration"},
+        {"label": _("Posted (24h)"), "value": metrics["posted_last_24h"], "datatype": "Int"},
+        {"label": _("p50 Latency (24h)"), "value": latency["p50"], "datatype": "Duration"},
+        {"label": _("p95 Latency (24h)"), "value": latency["p95"], "datatype": "Duration"},
+        {"label": _("Max Latency (24h)"), "value": latency["max"], "datatype": "Duration"},
+    ]
+    return summary
@@ -2,13 +2,13 @@ import frappe
 from frappe import _
 from frappe.utils import fmt_money
 
+from upande_sphynx.account_cache import get_account_meta, get_account_meta_map
+from upande_sphynx.report_cache import get_cached_report
+
+
 def execute(filters=None):
-    if not filters:
-        filters = {}
-    
-    columns = get_columns()
-    data = get_data(filters)
-    return columns, data
+    filters = frappe._dict(filters or {})
+    return get_cached_report("Share Movement Report", filters, lambda: (get_columns(), get_data(filters)))
 
 
 def get_columns():
@@ -34,7 +34,7 @@ def format_account(acc):
     """Return account as 'number - name' if available."""
     if not acc:
         return ''
-    acc_info = frappe.db.get_value('GL Account', acc, ['account_number', 'account_name'], as_dict=True)
+    acc_info = get_account_meta(acc)
     if acc_info:
         if acc_info.account_number:
             return f"{acc_info.account_number} - {acc_info.account_name}"
@@ -60,12 +60,18 @@ def get_data(filters):
             st.no_of_shares,
             st.custom_convertible_loan_amount AS amount,
             st.custom_journal_entry,
+            je.voucher_type AS je_subtype,
             st.docstatus
         FROM `tabShare Transfer` st
+        LEFT JOIN `tabJournal Entry` je ON je.name = st.custom_journal_entry
         WHERE st.docstatus IN (0, 1)
         ORDER BY st.to_shareholder, st.date DESC
     """, as_dict=1)
 
+    # Warm the account cache for every account formatted below, so
+    # format_account never goes to the database row by row.
+    get_account_meta_map([st.asset_account for st in share_transfers] + [st.equity_or_liability_account for st in share_transfers])
+
     for st in share_transfers:
         status_text = 'Draft' if st.docstatus == 0 else 'Submitted'
 
@@ -83,9 +89,7 @@ def get_data(filters):
         credit_account_name = format_account(st.equity_or_liability_account)
 
         # If there's a linked journal, show it in remarks
-        je_subtype = None
-        if st.custom_journal_entry:
-            je_subtype = frappe.db.get_value("Journal Entry", st.custom_journal_entry, "voucher_type")
+        je_subtype = st.je_subtype
 
         remarks = f"{voucher_subtype} of {st.no_of_shares} shares"
         if st.custom_journal_entry:
@@ -132,6 +136,8 @@ def get_data(filters):
         ORDER BY jea.party, je.posting_date DESC
     """, as_dict=1)
 
+    get_account_meta_map([je.account for je in journal_entries] + [je.against_account for je in journal_entries])
+
     for je in journal_entries:
         status_text = 'Draft' if je.docstatus == 0 else 'Submitted'
         debit_account_name = format_account(je.account if je.debit > 0 else je.against_account)
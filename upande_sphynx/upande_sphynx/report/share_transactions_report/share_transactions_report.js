@@ -40,6 +40,41 @@ frappe.query_reports["Share Transactions Report"] = {
             "label": __("Movement Type"),
             "fieldtype": "Select",
             "options": "\nEquity Capital Injection\nShare Purchase\nLoan Equity Injection\nShare Transfer\nShare Buyback\nBonus Issue\nRights Issue\nShare Split\nShare Consolidation"
+        },
+        {
+            // Set by a Capital Report Run's "Open Report" button.
+            "fieldname": "capital_report_run",
+            "label": __("Saved Run"),
+            "fieldtype": "Link",
+            "options": "Capital Report Run",
+            "get_query": () => ({
+                filters: { report_name: "Share Transactions Report", status: "Completed" }
+            })
         }
-    ]
+    ],
+
+    "onload": function(report) {
+        // Long date ranges are generated in the background (Capital Report
+        // Run); refresh once the run finishes. A failed run is not retried
+        // here: refreshing would only show its error again.
+        frappe.realtime.off("capital_report_run");
+        frappe.realtime.on("capital_report_run", (run) => {
+            if (run.report_name !== report.report_name) return;
+            if (run.status === "Completed") {
+                frappe.hide_progress();
+                report.refresh();
+            } else if (run.status === "Failed") {
+                frappe.hide_progress();
+                frappe.msgprint({
+                    title: __("Report Generation Failed"),
+                    indicator: "red",
+                    message: __("Background generation failed. See {0} to retry.", [
+                        `<a href="/app/capital-report-run/${run.name}">${run.name}</a>`,
+                    ]),
+                });
+            } else {
+                frappe.show_progress(__("Generating report"), run.progress || 0, 100);
+            }
+        });
+    }
 };
@@ -3,17 +3,46 @@
 
 import frappe
 from frappe import _
-from frappe.utils import flt
+
+from upande_sphynx import slow_query
+from upande_sphynx.report_cache import get_cached_report
+from upande_sphynx.upande_sphynx.doctype.capital_report_run.capital_report_run import (
+    QUERY_PROGRESS,
+    RUN_FILTER,
+    get_background_result,
+    get_saved_run_result,
+    set_progress,
+    should_run_in_background,
+)
 
 
 # -----------------------------
 # REPORT ENTRY POINT
 # -----------------------------
 def execute(filters=None):
-    filters = filters or {}
-    columns = get_columns()
-    data = get_data(filters)
-    return columns, data
+    filters = frappe._dict(filters or {})
+
+    if filters.get(RUN_FILTER):
+        return get_saved_run_result(filters.get(RUN_FILTER), "Share Transactions Report")
+
+    # With no From Date the report covers everything since the company's
+    # first movement, so that is the period weighed against the threshold.
+    from_date = filters.from_date or get_first_transaction_date(filters.company)
+    if should_run_in_background(filters, from_date, filters.to_date or frappe.utils.nowdate()):
+        return get_background_result("Share Transactions Report", filters, get_columns())
+
+    return get_cached_report("Share Transactions Report", filters, lambda: (get_columns(), get_data(filters)))
+
+
+def get_first_transaction_date(company=None):
+    return frappe.db.sql(
+        """
+        SELECT MIN(transaction_date)
+        FROM `tabShare Movement`
+        WHERE docstatus = 1 {company_condition}
+        """.format(company_condition="AND company = %(company)s" if company else ""),
+        {"company": company},
+    )[0][0]
 
 
 # -----------------------------
@@ -45,40 +74,95 @@ def get_columns():
 # CORE DATA FUNCTION
 # -----------------------------
 def get_data(filters):
+    """One query, no Python-side state.
+
+    Cumulative shares per (shareholder, share class) and the running class
+    total come from window functions over every submitted movement in the
+    company, so a row's Cumulative Shares / Ownership % are the real position
+    as of that movement even when the shareholder/date/class/movement type
+    filters hide earlier rows. Those filters are applied on the outer query,
+    after the windows have been evaluated.
+    """
 
     cond = build_conditions(filters)
 
     sql = f"""
+        WITH sm_windowed AS (
+            SELECT
+                x.*,
+                SUM(x.shares_in - x.shares_out) OVER (
+                    PARTITION BY x.company, x.shareholder, x.share_class
+                    ORDER BY x.transaction_date, x.reference
+                ) AS cumulative_shares,
+                SUM(x.class_delta) OVER (
+                    PARTITION BY x.company, x.share_class
+                    ORDER BY x.transaction_date, x.reference
+                ) AS class_total
+            FROM (
+                SELECT
+                    sm.name AS reference,
+                    sm.company,
+                    sm.transaction_date,
+                    sm.to_shareholder AS shareholder,
+                    sm.movement_type,
+                    sm.share_class,
+                    CASE
+                        WHEN sm.movement_type IN (
+                            'Equity Capital Injection', 'Share Subscription', 'Share Purchase',
+                            'Loan Equity Injection', 'Bonus Issue', 'Rights Issue'
+                        ) THEN sm.number_of_shares ELSE 0 END AS shares_in,
+                    CASE
+                        WHEN sm.movement_type IN ('Share Transfer', 'Share Buyback')
+                        AND sm.from_shareholder = sm.to_shareholder
+                        THEN sm.number_of_shares ELSE 0 END AS shares_out,
+                    CASE
+                        WHEN sm.movement_type IN (
+                            'Equity Capital Injection', 'Share Subscription', 'Share Purchase',
+                            'Loan Equity Injection', 'Bonus Issue', 'Rights Issue'
+                        ) THEN sm.number_of_shares
+                        WHEN sm.movement_type IN ('Share Transfer', 'Share Buyback')
+                        THEN -sm.number_of_shares
+                        ELSE 0 END AS class_delta,
+                    sm.price_per_share,
+                    sm.exchange_rate,
+                    sm.total_amount,
+                    sm.transaction_currency,
+                    sm.source_document_type,
+                    sm.source_document_name,
+                    sm.status
+                FROM `tabShare Movement` sm
+                WHERE sm.docstatus = 1 {cond['scope']}
+            ) x
+        )
+
         -- SHARE MOVEMENTS
-        SELECT 
-            sm.transaction_date,
-            sm.to_shareholder AS shareholder,
+        SELECT
+            m.transaction_date,
+            m.shareholder,
             sh.title,
             'Share Movement' AS transaction_type,
-            sm.movement_type,
-            sm.share_class,
-            CASE 
-                WHEN sm.movement_type IN (
-                    'Equity Capital Injection', 'Share Subscription', 'Share Purchase',
-                    'Loan Equity Injection', 'Bonus Issue', 'Rights Issue'
-                ) THEN sm.number_of_shares ELSE 0 END AS shares_in,
-            CASE 
-                WHEN sm.movement_type IN ('Share Transfer', 'Share Buyback')
-                AND sm.from_shareholder = sm.to_shareholder
-                THEN sm.number_of_shares ELSE 0 END AS shares_out,
-            sm.price_per_share,
-            sm.exchange_rate,
-            sm.total_amount AS amount,
-            sm.transaction_currency AS currency,
-            sm.source_document_type,
-            sm.source_document_name,
-            sm.status,
-            sm.name AS reference,
+            m.movement_type,
+            m.share_class,
+            m.shares_in,
+            m.shares_out,
+            m.price_per_share,
+            m.exchange_rate,
+            m.total_amount AS amount,
+            m.transaction_currency AS currency,
+            m.cumulative_shares,
+            CASE WHEN m.class_total > 0
+                THEN m.cumulative_shares / m.class_total * 100 ELSE 0 END AS ownership_percentage,
+            CASE WHEN m.source_document_type IS NOT NULL AND m.source_document_type != ''
+                AND m.source_document_name IS NOT NULL AND m.source_document_name != ''
+                THEN CONCAT(m.source_document_type, ': ', m.source_document_name)
+                ELSE '' END AS source_document,
+            m.status,
+            m.reference,
             'Share Movement' AS reference_doctype,
-            sm.company
-        FROM `tabShare Movement` sm
-        LEFT JOIN `tabShareholder` sh ON sm.to_shareholder = sh.name
-        WHERE sm.docstatus = 1 {cond['sm']}
+            m.company
+        FROM sm_windowed m
+        LEFT JOIN `tabShareholder` sh ON m.shareholder = sh.name
+        WHERE 1 = 1 {cond['sm']}
 
         UNION ALL
 
@@ -96,8 +180,9 @@ def get_data(filters):
             cln.exchange_rate,
             cln.principal_amount AS amount,
             cln.loan_currency AS currency,
-            'Convertible Loan Note' AS source_document_type,
-            cln.name AS source_document_name,
+            0 AS cumulative_shares,
+            0 AS ownership_percentage,
+            CONCAT('Convertible Loan Note: ', cln.name) AS source_document,
             cln.status,
             cln.name AS reference,
             'Convertible Loan Note' AS reference_doctype,
@@ -110,112 +195,47 @@ def get_data(filters):
         ORDER BY transaction_date DESC, shareholder
     """
 
-    movements = frappe.db.sql(sql, filters, as_dict=1)
-
-    # Process cumulative share holdings
-    return process_cumulative(movements, filters)
+    data = slow_query.sql(sql, filters, as_dict=1)
+    set_progress(QUERY_PROGRESS)
+    return data
 
 
 # -----------------------------
 # BUILD CONDITIONS SAFELY
 # -----------------------------
 def build_conditions(filters):
+    """`scope` limits which movements feed the cumulative windows (company
+    only — anything narrower would break running totals); `sm` filters the
+    windowed rows that are actually shown."""
 
+    scope = []
     sm = []
     cln = []
 
     if filters.get("company"):
-        sm.append("AND sm.company = %(company)s")
+        scope.append("AND sm.company = %(company)s")
         cln.append("AND cln.company = %(company)s")
 
     if filters.get("shareholder"):
-        sm.append("AND sm.to_shareholder = %(shareholder)s")
+        sm.append("AND m.shareholder = %(shareholder)s")
         cln.append("AND cln.lender = %(shareholder)s")
 
     if filters.get("share_class"):
-        sm.append("AND sm.share_class = %(share_class)s")
+        sm.append("AND m.share_class = %(share_class)s")
 
     if filters.get("from_date"):
-        sm.append("AND sm.transaction_date >= %(from_date)s")
+        sm.append("AND m.transaction_date >= %(from_date)s")
         cln.append("AND cln.issue_date >= %(from_date)s")
 
     if filters.get("to_date"):
-        sm.append("AND sm.transaction_date <= %(to_date)s")
+        sm.append("AND m.transaction_date <= %(to_date)s")
         cln.append("AND cln.issue_date <= %(to_date)s")
 
     if filters.get("movement_type"):
-        sm.append("AND sm.movement_type = %(movement_type)s")
+        sm.append("AND m.movement_type = %(movement_type)s")
 
     return {
+        "scope": " " + " ".join(scope) if scope else "",
         "sm": " " + " ".join(sm) if sm else "",
         "cln": " " + " ".join(cln) if cln else "",
     }
-
-
-# -----------------------------
-# PROCESS CUMULATIVE HOLDINGS
-# -----------------------------
-def process_cumulative(movements, filters):
-
-    holdings = {}  # shareholder+class → shares
-    totals = get_total_shares(filters)
-
-    processed = []
-
-    for row in movements:
-
-        key = f"{row.shareholder}_{row.share_class}"
-
-        if key not in holdings:
-            holdings[key] = 0
-
-        # Net movement
-        net = row.shares_in - row.shares_out
-        holdings[key] += net
-        row.cumulative_shares = holdings[key]
-
-        # Ownership %
-        if row.share_class and totals.get(row.share_class):
-            row.ownership_percentage = (holdings[key] / totals[row.share_class]) * 100
-        else:
-            row.ownership_percentage = 0
-
-        # Source Document
-        if row.source_document_type and row.source_document_name:
-            row.source_document = f"{row.source_document_type}: {row.source_document_name}"
-        else:
-            row.source_document = ""
-
-        processed.append(row)
-
-    return processed
-
-
-# -----------------------------
-# TOTAL SHARES BY CLASS
-# -----------------------------
-def get_total_shares(filters):
-
-    where = "WHERE sm.docstatus = 1"
-    if filters.get("company"):
-        where += " AND sm.company = %(company)s"
-
-    sql = f"""
-        SELECT 
-            share_class,
-            SUM(CASE 
-                WHEN movement_type IN (
-                    'Equity Capital Injection', 'Share Subscription', 'Share Purchase',
-                    'Loan Equity Injection', 'Bonus Issue', 'Rights Issue'
-                ) THEN number_of_shares
-                WHEN movement_type IN ('Share Transfer', 'Share Buyback')
-                THEN -number_of_shares
-                ELSE 0 END
-            ) AS total
-        FROM `tabShare Movement` sm
-        {where}
-        GROUP BY share_class
-    """
-
-    rows = frappe.db.sql(sql, filters, as_dict=True)
-    return {r.share_class: flt(r.total) for r in rows}
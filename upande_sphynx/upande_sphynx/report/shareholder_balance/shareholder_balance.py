@@ -6,14 +6,17 @@
 # from Share Transfer alone — it never reflects shares issued via Share
 # Agreement -> Share Movement or converted from a Convertible Loan Note,
 # which are this app's primary equity-issuance paths. This report is
-# computed directly from submitted Share Movements instead, and — unlike
-# the standard report's unused "date" filter — actually honors "as on
-# date".
+# computed from submitted Share Movements instead (via their signed
+# Share Movement Leg rows), and — unlike the standard report's unused
+# "date" filter — actually honors "as on date".
 
 import frappe
 from frappe import _
 from frappe.utils import today
 
+from upande_sphynx import slow_query
+from upande_sphynx.report_cache import get_cached_report
+
 
 def execute(filters=None):
 	filters = frappe._dict(filters or {})
@@ -23,9 +26,7 @@ def execute(filters=None):
 
 	filters.as_on_date = filters.as_on_date or today()
 
-	columns = get_columns()
-	data = get_data(filters)
-	return columns, data
+	return get_cached_report("Shareholder Balance", filters, lambda: (get_columns(), get_data(filters)))
 
 
 def get_columns():
@@ -41,51 +42,36 @@ def get_columns():
 
 
 def get_data(filters):
-	base_conditions = ["sm.company = %(company)s", "sm.docstatus = 1", "sm.transaction_date <= %(as_on_date)s"]
-	if filters.share_class:
-		base_conditions.append("sm.share_class = %(share_class)s")
+	conditions = ["leg.company = %(company)s", "leg.transaction_date <= %(as_on_date)s"]
 	if filters.shareholder:
-		base_conditions.append("holders.holder = %(shareholder)s")
+		conditions.append("leg.shareholder = %(shareholder)s")
+	if filters.share_class:
+		conditions.append("leg.share_class = %(share_class)s")
 
-	# signed_qty is the per-row delta from this holder's point of view: positive
-	# when shares moved to them, negative when they gave shares up — regardless
-	# of whether that direction came from to_shareholder/from_shareholder or
-	# from a movement recorded with a negative number_of_shares. Deriving it
-	# once here (rather than re-deriving acquired/given-up separately from
-	# to_shareholder/from_shareholder) is what keeps a negative-quantity "out"
-	# movement from being silently absorbed into "Shares Acquired" instead of
-	# showing up under "Shares Given Up".
+	# Each Share Movement Leg already carries the signed per-holder delta:
+	# positive when shares moved to the holder, negative when they gave
+	# shares up — regardless of whether that direction came from
+	# to_shareholder/from_shareholder or from a movement recorded with a
+	# negative number_of_shares. Splitting acquired/given-up on that sign
+	# (rather than re-deriving it from to_shareholder/from_shareholder) is
+	# what keeps a negative-quantity "out" movement from being silently
+	# absorbed into "Shares Acquired" instead of showing up under "Shares
+	# Given Up". Legs only exist for submitted movements, so there's no
+	# docstatus condition here.
 	query = """
 		SELECT
-			holder AS shareholder,
-			share_class,
-			SUM(CASE WHEN signed_qty > 0 THEN signed_qty ELSE 0 END) AS shares_acquired,
-			SUM(CASE WHEN signed_qty < 0 THEN -signed_qty ELSE 0 END) AS shares_given_up,
-			SUM(signed_qty) AS current_holding,
-			SUM(CASE WHEN signed_qty > 0 AND movement_type != 'Share Buyback' THEN total_amount ELSE 0 END) AS total_investment,
-			MAX(transaction_currency) AS currency
-		FROM (
-			SELECT
-				sm.share_class AS share_class,
-				sm.movement_type AS movement_type,
-				sm.transaction_currency AS transaction_currency,
-				sm.total_amount AS total_amount,
-				holders.holder AS holder,
-				CASE WHEN holders.holder = sm.to_shareholder THEN sm.number_of_shares ELSE -sm.number_of_shares END AS signed_qty
-			FROM `tabShare Movement` sm
-			JOIN (
-				SELECT name, to_shareholder AS holder FROM `tabShare Movement`
-				UNION
-				SELECT name, from_shareholder AS holder FROM `tabShare Movement` WHERE from_shareholder IS NOT NULL AND from_shareholder != ''
-			) holders ON holders.name = sm.name
-			WHERE {conditions}
-		) x
-		GROUP BY holder, share_class
+			leg.shareholder,
+			leg.share_class,
+			SUM(CASE WHEN leg.qty > 0 THEN leg.qty ELSE 0 END) AS shares_acquired,
+			SUM(CASE WHEN leg.qty < 0 THEN -leg.qty ELSE 0 END) AS shares_given_up,
+			SUM(leg.qty) AS current_holding,
+			SUM(CASE WHEN leg.qty > 0 AND leg.movement_type != 'Share Buyback' THEN leg.total_amount ELSE 0 END) AS total_investment,
+			MAX(leg.transaction_currency) AS currency
+		FROM `tabShare Movement Leg` leg
+		WHERE {conditions}
+		GROUP BY leg.shareholder, leg.share_class
 		HAVING current_holding != 0
+		ORDER BY leg.share_class, current_holding DESC
 	"""
 
-	return frappe.db.sql(
-		query.format(conditions=" AND ".join(base_conditions)) + " ORDER BY share_class, current_holding DESC",
-		filters,
-		as_dict=True,
-	)
+	return slow_query.sql(query.format(conditions=" AND ".join(conditions)), filters, as_dict=True)